@@ -10,7 +10,7 @@
 
 
 from enum import IntEnum
-from enum import Enum
+import time
 import midi
 import device
 import plugins
@@ -22,149 +22,7 @@ import channels
 import transport
 
 
-class CC(IntEnum):
-    CHANNEL = 34
-    PLUGIN = 35
-    ARRANGER = 36
-    MIXER = 37
-    BROWSER = 38
-    FILE_SAVE = 40
-    SETTINGS = 41
-    ENCODER_PUSH = 7
-    ENCODER_TURN = 8
-    ENCODER_UP = 30
-    ENCODER_RIGHT = 31
-    ENCODER_DOWN = 32
-    ENCODER_LEFT = 33
-    ENCODER_VOLUME = 44
-    ENCODER_SWING = 45
-    ENCODER_TEMPO = 47
-    TOUCH_STRIP = 1
-    TOUCH_STRIP_PITCH = 49
-    TOUCH_STRIP_MOD = 50
-    TOUCH_STRIP_PERFORM = 51
-    TOUCH_STRIP_NOTES = 52
-    GROUP_A = 100
-    GROUP_B = 101
-    GROUP_C = 102
-    GROUP_D = 103
-    GROUP_E = 104
-    GROUP_F = 105
-    GROUP_G = 106
-    GROUP_H = 107
-    RESTART = 53
-    ERASE = 54
-    TAP = 55
-    PLAY = 57
-    FOLLOW = 56
-    REC = 58
-    STOP = 59
-    FIXED_VEL = 81
-    PAD_MODE = 80
-    KEYBOARD_MODE = 82
-    CHORDS_MODE = 84
-    STEP_MODE = 83
-    PATTERN = 86
-    SELECT = 90
-    SOLO = 91
-    MUTE = 92
-    PRESET_PREV = 22
-    PRESET_NEXT = 23
-    MIX_TRACK = 70
-    MIX_VOL = 71
-    MIX_PAN = 72
-    MIX_SS = 73
-    CHAN_SEL = 74
-    CHAN_VOL = 75
-    CHAN_PAN = 76
-    FIX_VEL = 77
-    SHIFT = 46
-
-
-class Pad(IntEnum):
-    UNDO = 0
-    REDO = 1
-    QUANTIZE = 4
-    QUANTIZE_HALF = 5
-    SEMI_DOWN = 12
-    SEMI_UP = 13
-    OCTAVE_DOWN = 14
-    OCTAVE_UP = 15
-
-
-class ControllerColor(IntEnum):
-    BLACK_0 = 0
-    BLACK_1 = 1
-    BLACK_2 = 2
-    BLACK_3 = 3
-    RED_0 = 4
-    RED_1 = 5
-    RED_2 = 6
-    RED_3 = 7
-    ORANGE_0 = 8
-    ORANGE_1 = 9
-    ORANGE_2 = 10
-    ORANGE_3 = 11
-    LIGHT_ORANGE_0 = 12
-    LIGHT_ORANGE_1 = 13
-    LIGHT_ORANGE_2 = 14
-    LIGHT_ORANGE_3 = 15
-    WARM_YELLOW_0 = 16
-    WARM_YELLOW_1 = 17
-    WARM_YELLOW_2 = 18
-    WARM_YELLOW_3 = 19
-    YELLOW_0 = 20
-    YELLOW_1 = 21
-    YELLOW_2 = 22
-    YELLOW_3 = 23
-    LIME_0 = 24
-    LIME_1 = 25
-    LIME_2 = 26
-    LIME_3 = 27
-    GREEN_0 = 28
-    GREEN_1 = 29
-    GREEN_2 = 30
-    GREEN_3 = 31
-    MINT_0 = 32
-    MINT_1 = 33
-    MINT_2 = 34
-    MINT_3 = 35
-    CYAN_0 = 36
-    CYAN_1 = 37
-    CYAN_2 = 38
-    CYAN_3 = 39
-    TURQUOISE_0 = 40
-    TURQUOISE_1 = 41
-    TURQUOISE_2 = 42
-    TURQUOISE_3 = 43
-    BLUE_0 = 44
-    BLUE_1 = 45
-    BLUE_2 = 46
-    BLUE_3 = 47
-    PLUM_0 = 48
-    PLUM_1 = 49
-    PLUM_2 = 50
-    PLUM_3 = 51
-    VIOLET_0 = 52
-    VIOLET_1 = 53
-    VIOLET_2 = 54
-    VIOLET_3 = 55
-    PURPLE_0 = 56
-    PURPLE_1 = 57
-    PURPLE_2 = 58
-    PURPLE_3 = 59
-    MAGENTA_0 = 60
-    MAGENTA_1 = 61
-    MAGENTA_2 = 62
-    MAGENTA_3 = 63
-    FUCHSIA_0 = 64
-    FUCHSIA_1 = 65
-    FUCHSIA_2 = 66
-    FUCHSIA_3 = 67
-    WHITE_0 = 68
-    WHITE_1 = 69
-    WHITE_2 = 70
-    WHITE_3 = 71
+_PAD_VALUES = frozenset((0, 1, 4, 5, 12, 13, 14, 15))
 
 
 class PluginColor(IntEnum):
@@ -177,117 +35,418 @@ class ChannelColor(IntEnum):
     HIGHLIGHTED = 70
 
 
-class PadMode(IntEnum):
-    OMNI = 0
-    KEYBOARD = 1
-    CHORDS = 2
-    STEP = 3
-
-
-class PadModeColor(IntEnum):
-    OMNI = 10
-    KEYBOARD = 46
-    CHORDS = 6
-    STEP = 58
-
-
-class FourDEncoderMode(IntEnum):
-    JOG = 0
-    VOLUME = 1
-    SWING = 2
-    TEMPO = 3
-
+_PAD_GROUP_MEMBERS = {
+    100: 100,
+    101: 101,
+    102: 102,
+    103: 103,
+    104: 104,
+    105: 105,
+    106: 106,
+    107: 107,
+}
+
+
+class LedBuffer:
+
+    def __init__(self, sysex_frames=False):
+        slots = 2304
+        self.sysex_frames = sysex_frames
+        self._shadow = bytearray([255]) * slots
+        self._pending = bytearray([255]) * slots
+        self._dirty = []
+        self._frame = bytearray()
+        self._owned = {}
+        self._held = {}
+        self.sent = 0
+        self.suppressed = 0
+        self.echoes = 0
+
+    def set_cc(self, control, value, channel=0):
+        if 0 <= value <= 127:
+            self._stage(channel * 144 + control, value)
+        else:
+            self._send(midi.MIDI_CONTROLCHANGE, channel, control, value)
 
-class TouchStripMode(IntEnum):
-    TRANSPORT = 0
-    PITCH = 1
-    MOD = 2
-    PERFORM = 3
-    NOTES = 4
+    def set_note(self, note, velocity, channel=0):
+        if 0 <= note < 16 and 0 <= velocity <= 127:
+            self._stage(channel * 144 + 128 + note, velocity)
+        else:
+            self._send(midi.MIDI_NOTEON, channel, note, velocity)
+
+    def forget_cc(self, control, channel=0):
+        self._shadow[channel * 144 + control] = 255
+
+    def touch_cc(self, control, value, channel=0):
+        slot = channel * 144 + control
+        self._shadow[slot] = value
+        self._owned[slot] = time.perf_counter_ns() + 300000000
+
+    def forget_note(self, note, channel=0):
+        if 0 <= note < 16:
+            slot = channel * 144 + 128 + note
+            self._shadow[slot] = 255
+
+    def invalidate(self):
+        shadow = self._shadow
+        shadow[:] = bytes([255]) * len(shadow)
+        self._owned.clear()
+        self._held.clear()
+
+    def flush(self):
+        owned = self._owned
+        if owned:
+            self._release(owned)
+        shadow, pending = (self._shadow, self._pending)
+        frame, size = (self._frame, 5)
+        if self.sysex_frames and (not frame):
+            frame = self._frame = bytearray(6918)
+            frame[:size] = bytes((240, 0, 33, 9, 127))
+        for slot in self._dirty:
+            value = pending[slot]
+            pending[slot] = 255
+            if slot in owned:
+                self._held[slot] = value
+                self.echoes += 1
+                continue
+            if shadow[slot] == value:
+                self.suppressed += 1
+                continue
+            shadow[slot] = value
+            channel, index = divmod(slot, 144)
+            if self.sysex_frames:
+                if index < 128:
+                    frame[size] = channel
+                else:
+                    frame[size] = 16 | channel
+                    index -= 128
+                frame[size + 1] = index
+                frame[size + 2] = value
+                size += 3
+            elif index < 128:
+                self._send(midi.MIDI_CONTROLCHANGE, channel, index, value)
+            else:
+                self._send(midi.MIDI_NOTEON, channel, index - 128, value)
+        self._dirty.clear()
+        if size > 5:
+            self._send_frame(size)
+
+    def _release(self, owned):
+        now = time.perf_counter_ns()
+        for slot, until in list(owned.items()):
+            if now < until:
+                continue
+            del owned[slot]
+            value = self._held.pop(slot, 255)
+            if value != 255 and self._pending[slot] == 255:
+                self._stage(slot, value)
+
+    def _stage(self, slot, value):
+        pending = self._pending
+        if pending[slot] == 255:
+            self._dirty.append(slot)
+        else:
+            self.suppressed += 1
+        pending[slot] = value
+
+    def _send(self, status, channel, data1, data2):
+        device.midiOutMsg(status, channel, data1, data2)
+        self.sent += 1
+
+    def _send_frame(self, size):
+        frame = self._frame
+        if size == 8:
+            kind, index, value = frame[size - 3 : size]
+            status = midi.MIDI_NOTEON if kind & 16 else midi.MIDI_CONTROLCHANGE
+            self._send(status, kind & 15, index, value)
+            return
+        frame[size] = 247
+        device.midiOutSysex(bytes(frame[: size + 1]))
+        self.sent += 1
 
 
-class PadGroup(IntEnum):
-    A = 100
-    B = 101
-    C = 102
-    D = 103
-    E = 104
-    F = 105
-    G = 106
-    H = 107
+led_buffer = LedBuffer()
 
 
-def _get_channel_color(channel: int, highlighted: bool) -> int:
+def _get_channel_color(channel, highlighted):
     color = PluginColor if plugins.isValid(channel) else ChannelColor
     return color.HIGHLIGHTED.value if highlighted else color.DEFAULT.value
 
 
-def _midi_out_msg_note_on(note: int, velocity: int, channel: int = 0) -> None:
-    device.midiOutMsg(midi.MIDI_NOTEON, channel, note, velocity)
+def _has_mod_param(channel):
+    return plugins.isValid(channel) and 0 < plugins.getParamCount(channel)
+
+
+def _midi_out_msg_note_on(note, velocity, channel=0):
+    led_buffer.set_note(note, velocity, channel)
 
 
-def _midi_out_msg_control_change(control: int, value: int, channel: int = 0) -> None:
-    device.midiOutMsg(midi.MIDI_CONTROLCHANGE, channel, control, value)
+def _midi_out_msg_control_change(control, value, channel=0):
+    led_buffer.set_cc(control, value, channel)
 
 
-def _on_off(condition: bool) -> int:
+def _on_off(condition):
     return 127 if condition else 0
 
 
-def _percent_to_bipolar(percent: int) -> float:
+def _percent_to_bipolar(percent):
     return percent / 50.0 - 1.0
 
 
-def _bipolar_to_percent(bipolar: float) -> int:
+def _bipolar_to_percent(bipolar):
     return round((bipolar + 1.0) * 50)
 
 
-def _is_enum_value(enum_cls: type[Enum], value: object) -> bool:
-    try:
-        enum_cls(value)
-        return True
-    except ValueError:
-        return False
+def _clamp_note(note):
+    return min(max(note, 0), 127)
+
+
+def _compile_scale(scale, offset):
+    return tuple(((_clamp_note(note + offset),) for note in scale))
+
+
+def _compile_chord_set(chord_set, offset):
+    chords = []
+    start = 0
+    while start < len(chord_set):
+        end = start + 1 + chord_set[start]
+        chords.append(
+            tuple(
+                dict.fromkeys(
+                    (_clamp_note(note + offset) for note in chord_set[start + 1 : end])
+                )
+            )
+        )
+        start = end
+    return tuple(chords)
 
 
-def _get_grid(page: int) -> range:
-    lower_step = page * 16
-    return range(lower_step, lower_step + 16)
+class RefreshScheduler:
+
+    def __init__(self, syncs):
+        self._syncs = syncs
+        self._pending = 0
+        self._refreshes = 0
+        self.merged = 0
+        self.drain_time = 0
+
+    def schedule(self, mask):
+        self._pending |= mask
+        self._refreshes += 1
+
+    def drain(self, budget=4000000):
+        if not self._pending:
+            return
+        start = time.perf_counter_ns()
+        for flag, sync in self._syncs:
+            if not self._pending & flag:
+                continue
+            self._pending &= ~flag
+            sync()
+            if time.perf_counter_ns() - start > budget:
+                break
+        self.drain_time = time.perf_counter_ns() - start
+        self.merged, self._refreshes = (self._refreshes, 0)
+
+
+class KnobCoalescer:
+
+    def __init__(self, knobs, window=40000000):
+        self._setters = [None] * 128
+        for cc_num, setter in knobs:
+            self._setters[cc_num] = setter
+        self._pending = {}
+        self._window = window
+        self._since = 0
+        self.received = 0
+        self.applied = 0
+
+    def push(self, cc_num, target, cc_val):
+        now = time.perf_counter_ns()
+        if not self._pending:
+            self._since = now
+        self._pending[cc_num, target] = cc_val
+        self.received += 1
+        if now - self._since >= self._window:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = (self._pending, {})
+        for (cc_num, target), cc_val in pending.items():
+            self._setters[cc_num](target, cc_val)
+        self.applied += len(pending)
+
+
+class EncoderAccelerator:
+
+    def __init__(
+        self,
+        turn,
+        curves=(
+            (1, 1, 2, 2, 3, 3, 4, 4, 6),
+            (1, 1, 1, 2, 2, 2, 3),
+            (1, 1, 1, 2),
+            (1, 1, 2, 2, 3, 3, 4),
+        ),
+        window=40000000,
+    ):
+        self._turn = turn
+        self._curves = curves
+        self._window = window
+        self._mode = 0
+        self._detents = 0
+        self._since = 0
+        self.received = 0
+        self.applied = 0
+
+    def push(self, mode, detents):
+        if self._detents and mode != self._mode:
+            self.flush()
+        now = time.perf_counter_ns()
+        if not self._detents:
+            self._since = now
+        self._mode = mode
+        self._detents += detents
+        self.received += 1
+        if now - self._since >= self._window:
+            self.flush()
+
+    def flush(self):
+        detents = self._detents
+        if not detents:
+            return
+        self._detents = 0
+        curve = self._curves[self._mode]
+        gain = curve[min(abs(detents), len(curve)) - 1]
+        self._turn(self._mode, detents * gain)
+        self.applied += 1
+
+
+class Scrubber:
+
+    def __init__(self, seek):
+        self._seek = seek
+        self._position = 0.0
+        self._pending = False
+        self._last = -1
+        self._direction = 0
+        self._moved = 0
+        self._idle_ticks = 0
+        self._wait = 0
+        self.received = 0
+        self.seeks = 0
+
+    def touch(self, cc_val):
+        self.received += 1
+        self._idle_ticks = 0
+        last = self._last
+        if last < 0:
+            self._position = min(cc_val / 100, 1.0)
+            self._pending = True
+            self._direction = 0
+            self._moved = 0
+        else:
+            delta = cc_val - last
+            if abs(delta) <= 2 and delta * self._direction <= 0:
+                return
+            self._moved += delta
+            self._direction = 1 if delta > 0 else -1
+        self._last = cc_val
+
+    def tick(self):
+        self._slide()
+        if self._last >= 0:
+            self._idle_ticks += 1
+            if self._idle_ticks >= 5:
+                self._last = -1
+        if self._wait:
+            self._wait -= 1
+        if self._pending and (not self._wait):
+            self.flush()
+
+    def flush(self):
+        self._slide()
+        if not self._pending:
+            return
+        self._pending = False
+        self._seek(self._position)
+        self._wait = 2
+        self.seeks += 1
+
+    def _slide(self):
+        moved = self._moved
+        if not moved:
+            return
+        self._moved = 0
+        gain = (0.25, 0.5, 1.0)[min(abs(moved), 3) - 1]
+        self._position = min(max(self._position + moved * gain / 100, 0.0), 1.0)
+        self._pending = True
+
+
+class ModStreamer:
+
+    def __init__(self, set_value):
+        self._set = set_value
+        self._target = -1
+        self._value = -1
+        self._pending = False
+        self._touched = False
+        self._direction = 0
+        self._written = (-1, -1)
+        self._idle_ticks = 0
+        self._wait = 0
+        self.received = 0
+        self.writes = 0
+
+    def touch(self, target, cc_val):
+        self.received += 1
+        self._idle_ticks = 0
+        if target != self._target or not self._touched:
+            self._target = target
+            self._touched = True
+            self._direction = 0
+        elif 0 < cc_val < 100:
+            delta = cc_val - self._value
+            if abs(delta) <= 2 and delta * self._direction <= 0:
+                return
+            self._direction = 1 if delta > 0 else -1
+        self._value = cc_val
+        self._pending = True
+
+    def sync(self, target, cc_val):
+        self._written = (target, cc_val)
+
+    def tick(self):
+        if self._touched:
+            self._idle_ticks += 1
+            if self._idle_ticks >= 5:
+                self._touched = False
+        if self._wait:
+            self._wait -= 1
+        if self._wait or not self._pending:
+            return
+        self._pending = False
+        pending = (self._target, self._value)
+        if pending == self._written:
+            return
+        self._written = pending
+        self._set(*pending)
+        self._wait = 1
+        self.writes += 1
+
+
+_CASES_GET_WINDOW_ID = {
+    34: midi.widChannelRack,
+    36: midi.widPlaylist,
+    37: midi.widMixer,
+}
+_CASES_TOGGLE_ENCODER_MODE = {44: 1, 45: 2, 47: 3}
+_CASES_TOGGLE_TOUCH_STRIP_MODE = {49: 1, 50: 2, 51: 3, 52: 4}
 
 
 class Controller:
-    _pad_mode: PadMode
-    "Current pad mode. See PadMode Enum"
-    _pad_mode_color: PadModeColor
-    "Current pad mode color. See PadModeColor Enum"
-    _encoder_mode: FourDEncoderMode
-    "Current 4D encoder mode. See FourDEncoderMode Enum"
-    _touch_strip_mode: TouchStripMode
-    "Current touch strip mode. See TouchStripMode Enum"
-    _active_group: PadGroup
-    "Current selected group (A-H)"
-    _selected_channel: int
-    "Currently selected channel index"
-    _channel_page: int
-    "Current channel page (0-15) for OMNI mode pad display"
-    _step_page: int
-    "Current step sequence page (0-15) for STEP mode pad display"
-    _semi_offset: int
-    "Current semitone offset"
-    _scale_index: int
-    "Current scale index for keyboard mode (0-7)"
-    _chordset_index: int
-    "Current chord set index for chords mode (0-7)"
-    _fixed_velocity: int
-    "Fixed velocity value for pads when fixed velocity mode is enabled"
-    _is_fixed_velocity: bool
-    "Indicates whether fixed velocity mode is enabled"
-    _shifting: bool
-    "Indicates whether the shift button is currently pressed"
-    _is_selecting_pattern: bool
-    "Indicates whether the user is currently selecting a pattern"
-    _is_selecting_channel: bool
-    "Indicates whether the user is currently selecting a channel"
 
     def __init__(self):
         self._pad_mode = 0
@@ -298,16 +457,51 @@ class Controller:
         self._selected_channel = 0
         self._channel_page = 0
         self._step_page = 0
+        self._grid_bits = 0
+        self._grid_pages = 0
         self._semi_offset = 0
         self._scale_index = 0
         self._chordset_index = 0
+        self._voice_channels = [-1] * 16
+        self._voice_notes = [()] * 16
+        self._keyboard_notes = ()
+        self._keyboard_notes_key = (-1, 0)
+        self._chord_notes = ()
+        self._chord_notes_key = (-1, 0)
         self._fixed_velocity = 100
         self._is_fixed_velocity = False
         self._shifting = False
         self._is_selecting_pattern = False
         self._is_selecting_channel = False
-
-    def on_init(self) -> None:
+        self._scheduler = RefreshScheduler(
+            (
+                (1, self._sync_selected_channel),
+                (2, self._sync_channel_controls),
+                (4, self._sync_channel_pads),
+                (8, self._sync_groups),
+                (16, self._sync_mixer_controls),
+                (32, self._sync_cc_led_states),
+                (64, self._sync_rec_led),
+                (128, self._sync_touch_strip),
+            )
+        )
+        self._knobs = KnobCoalescer(
+            (
+                (71, self._set_mix_vol),
+                (72, self._set_mix_pan),
+                (73, self._set_mix_ss),
+                (75, self._set_chan_vol),
+                (76, self._set_chan_pan),
+            )
+        )
+        self._encoder = EncoderAccelerator(self._turn_encoder)
+        self._scrubber = Scrubber(transport.setSongPos)
+        self._mod = ModStreamer(self._set_mod)
+        self._deferred_ccs = frozenset((71, 72, 73, 75, 76, 8, 1))
+        self._build_cc_handlers()
+
+    def on_init(self):
+        led_buffer.invalidate()
         self._init_led_states()
         self._sync_cc_led_states()
         self._sync_selected_channel()
@@ -317,10 +511,12 @@ class Controller:
         self._sync_song_position()
         self._sync_groups()
 
-    def on_de_init(self) -> None:
+    def on_de_init(self):
+        self._flush_inputs()
+        self._release_all_voices()
         self._deinit_led_states()
 
-    def on_refresh(self, flags: int) -> None:
+    def on_refresh(self, flags):
         channel_event = flags & midi.HW_ChannelEvent
         pattern_event = flags & midi.HW_Dirty_Patterns
         control_values_event = flags & midi.HW_Dirty_ControlValues
@@ -328,255 +524,366 @@ class Controller:
         mixer_display_event = flags & midi.HW_Dirty_Mixer_Display
         mixer_controls_event = flags & midi.HW_Dirty_Mixer_Controls
         leds_event = flags & midi.HW_Dirty_LEDs
+        if channel_event or pattern_event:
+            self._grid_pages = 0
+        sync = 0
         if channel_event:
-            self._sync_selected_channel()
-            self._sync_channel_controls()
-            self._sync_channel_pads()
-            self._sync_groups()
+            sync |= 15
+            if self._touch_strip_mode == 2:
+                sync |= 128
         elif mixer_sel_event or mixer_display_event or mixer_controls_event:
-            self._sync_mixer_controls()
+            sync |= 16
         elif leds_event:
-            self._sync_cc_led_states()
+            sync |= 32
             if self._touch_strip_mode == 0:
-                self._sync_song_position()
+                sync |= 128
             if not self._is_selecting_pattern:
-                self._sync_channel_pads()
+                sync |= 4
         if mixer_controls_event and leds_event:
-            _midi_out_msg_control_change(58, _on_off(transport.isRecording()))
+            sync |= 64
         if pattern_event:
-            self._sync_channel_pads()
+            sync |= 4
         if control_values_event:
-            if self._touch_strip_mode == 1:
-                self._sync_touch_strip_value(self._touch_strip_mode)
-            self._sync_channel_controls()
-
-    def on_control_change(self, msg) -> None:
+            if self._touch_strip_mode in (1, 2):
+                sync |= 128
+            sync |= 2
+        if sync:
+            self._scheduler.schedule(sync)
+
+    def on_idle(self):
+        self._knobs.flush()
+        self._encoder.flush()
+        self._scrubber.tick()
+        self._mod.tick()
+        self._scheduler.drain()
+
+    def on_control_change(self, msg):
         cc_num, cc_val = (msg.controlNum, msg.controlVal)
-        match cc_num:
-            case 34 | 36 | 37 | 38:
-                match cc_num:
-                    case 34:
-                        wid = midi.widChannelRack
-                    case 36:
-                        wid = midi.widPlaylist
-                    case 37:
-                        wid = midi.widMixer
-                    case 38:
-                        wid = midi.widBrowser
-                    case _:
-                        return
-                is_visible = ui.getVisible(wid)
-                if self._shifting:
-                    if not is_visible:
-                        ui.showWindow(wid)
-                    ui.setFocused(wid)
-                elif is_visible:
-                    ui.hideWindow(wid)
-                else:
-                    ui.showWindow(wid)
-                is_visible = ui.getVisible(wid)
-                _midi_out_msg_control_change(cc_num, _on_off(is_visible))
-            case 35:
-                channels.showCSForm(self._selected_channel, -1)
-            case 40:
-                transport.globalTransport(midi.FPT_Save, 1)
-            case 41:
-                transport.globalTransport(midi.FPT_F10, 1)
-            case 7:
-                ui.enter()
-            case 8:
-                is_clockwise = cc_val == 65
-                multiplier = 1 if is_clockwise else -1
-                track_number = mixer.trackNumber()
-                match self._encoder_mode:
-                    case 0:
-                        ui.jog(1 * multiplier)
-                    case 1:
-                        if ui.getFocused(midi.widMixer):
-                            target_vol = (
-                                mixer.getTrackVolume(track_number)
-                                + 0.012125 * multiplier
-                            )
-                            if 0.0 < target_vol < 1.0:
-                                mixer.setTrackVolume(track_number, target_vol)
-                        elif ui.getFocused(midi.widChannelRack):
-                            channels.setChannelVolume(
-                                self._selected_channel,
-                                channels.getChannelVolume(self._selected_channel)
-                                + 0.03125 * multiplier,
-                            )
-                    case 2:
-                        swing = general.processRECEvent(
-                            midi.REC_MainShuffle, 0, midi.REC_GetValue
-                        )
-                        target_swing = swing + 1 * multiplier
-                        if 0 <= target_swing <= 128:
-                            general.processRECEvent(
-                                midi.REC_MainShuffle,
-                                target_swing,
-                                midi.REC_UpdateControl | midi.REC_Control,
-                            )
-                    case 3:
-                        transport.globalTransport(midi.FPT_TempoJog, 10 * multiplier)
-            case 30:
-                ui.up()
-            case 31:
-                ui.right()
-            case 32:
-                ui.down()
-            case 33:
-                ui.left()
-            case 44 | 45 | 47:
-                self._toggle_encoder_mode(cc_num)
+        led_buffer.forget_cc(cc_num, msg.midiChan)
+        if cc_num not in self._deferred_ccs:
+            self._flush_inputs()
+        handlers = self._shift_cc_handlers if self._shifting else self._cc_handlers
+        handler = handlers[cc_num]
+        if handler is None or handler(cc_num, cc_val) is False:
+            return
+        msg.handled = True
+
+    def _flush_inputs(self):
+        self._knobs.flush()
+        self._encoder.flush()
+        self._scrubber.flush()
+
+    def _build_cc_handlers(self):
+        handlers = [None] * 128
+        for cc_nums, handler in (
+            ((34, 36, 37, 38), self._on_toggle_window),
+            ((35,), self._on_plugin),
+            ((40,), self._on_file_save),
+            ((41,), self._on_settings),
+            ((7,), self._on_encoder_push),
+            ((8,), self._on_encoder_turn),
+            ((30,), self._on_encoder_up),
+            ((31,), self._on_encoder_right),
+            ((32,), self._on_encoder_down),
+            ((33,), self._on_encoder_left),
+            ((44, 45, 47), self._on_encoder_mode),
+            ((1,), self._on_touch_strip),
+            ((49, 50, 51, 52), self._on_touch_strip_mode),
+            (tuple(range(100, 108)), self._on_group),
+            ((53,), self._on_restart),
+            ((54,), self._on_erase),
+            ((55,), self._on_tap),
+            ((56,), self._on_follow),
+            ((57,), self._on_play),
+            ((59,), self._on_stop),
+            ((58,), self._on_rec),
+            ((81,), self._on_fixed_vel),
+            ((80, 82, 84, 83), self._on_pad_mode),
+            ((86,), self._on_pattern),
+            ((90,), self._on_select),
+            ((91,), self._on_solo),
+            ((92,), self._on_mute),
+            ((22, 23), self._on_preset),
+            ((70,), self._on_mix_track),
+            ((71, 72, 73), self._on_mix_knob),
+            ((74,), self._on_chan_sel),
+            ((75, 76), self._on_chan_knob),
+            ((77,), self._on_fix_vel),
+            ((46,), self._on_shift),
+        ):
+            for cc_num in cc_nums:
+                handlers[cc_num] = handler
+        self._cc_handlers = handlers
+        shift_handlers = list(handlers)
+        for cc_num in (34, 36, 37, 38):
+            shift_handlers[cc_num] = self._on_focus_window
+        shift_handlers[53] = self._on_loop
+        shift_handlers[55] = self._on_metronome
+        shift_handlers[58] = self._on_count_in
+        shift_handlers[59] = self._on_panic
+        self._shift_cc_handlers = shift_handlers
+
+    def _on_toggle_window(self, cc_num, cc_val):
+        wid = self._get_window_id(cc_num)
+        if ui.getVisible(wid):
+            ui.hideWindow(wid)
+        else:
+            ui.showWindow(wid)
+        _midi_out_msg_control_change(cc_num, _on_off(ui.getVisible(wid)))
+
+    def _on_focus_window(self, cc_num, cc_val):
+        wid = self._get_window_id(cc_num)
+        if not ui.getVisible(wid):
+            ui.showWindow(wid)
+        ui.setFocused(wid)
+        _midi_out_msg_control_change(cc_num, _on_off(ui.getVisible(wid)))
+
+    def _on_plugin(self, cc_num, cc_val):
+        channels.showCSForm(self._selected_channel, -1)
+
+    def _on_file_save(self, cc_num, cc_val):
+        transport.globalTransport(midi.FPT_Save, 1)
+
+    def _on_settings(self, cc_num, cc_val):
+        transport.globalTransport(midi.FPT_F10, 1)
+
+    def _on_encoder_push(self, cc_num, cc_val):
+        ui.enter()
+
+    def _on_encoder_turn(self, cc_num, cc_val):
+        is_clockwise = cc_val == 65
+        self._encoder.push(self._encoder_mode, 1 if is_clockwise else -1)
+
+    def _turn_encoder(self, mode, steps):
+        match mode:
+            case 0:
+                ui.jog(steps)
             case 1:
-                match self._touch_strip_mode:
-                    case 0:
-                        transport.setSongPos(cc_val / 100)
-                        _midi_out_msg_control_change(1, cc_val)
-                    case 1:
-                        channels.setChannelPitch(
-                            self._selected_channel, _percent_to_bipolar(cc_val)
-                        )
-                    case 2:
-                        pass
-                    case 3:
-                        pass
-                    case 4:
-                        pass
-            case 49 | 50 | 51 | 52:
-                self._toggle_touch_strip_mode(cc_num)
-                self._sync_touch_strip_value(self._touch_strip_mode)
-            case 100 | 101 | 102 | 103 | 104 | 105 | 106 | 107:
-                page_idx = cc_num - 100
-                match self._pad_mode:
-                    case 0:
-                        self._channel_page = page_idx
-                    case 1:
-                        self._scale_index = page_idx
-                    case 2:
-                        self._chordset_index = page_idx
-                    case 3:
-                        self._step_page = page_idx
-                    case _:
-                        return
-                self._active_group = PadGroup(cc_num)
-                self._sync_groups()
-                self._sync_channel_pads()
-            case 53 if self._shifting:
-                transport.setLoopMode()
-            case 53:
-                transport.stop()
-                transport.start()
-            case 54:
-                ui.delete()
-            case 55 if self._shifting:
-                transport.globalTransport(midi.FPT_Metronome, 1)
-            case 55:
-                transport.globalTransport(midi.FPT_TapTempo, 1)
-            case 56:
-                ui.snapOnOff()
-            case 57:
-                transport.start()
-            case 59:
-                transport.stop()
-            case 58 if self._shifting:
-                transport.globalTransport(midi.FPT_CountDown, 1)
-            case 58:
-                transport.record()
-            case 81:
-                self._is_fixed_velocity = bool(cc_val)
-            case 80 | 82 | 84 | 83:
-                for cc in (80, 82, 84, 83):
-                    _midi_out_msg_control_change(cc, 127 if cc == cc_num else 0)
-                active_group = 100
-                match cc_num:
-                    case 80:
-                        self._pad_mode = 0
-                        self._pad_mode_color = 10
-                        active_group += self._channel_page
-                    case 82:
-                        self._pad_mode = 1
-                        self._pad_mode_color = 46
-                        active_group += self._scale_index
-                    case 84:
-                        self._pad_mode = 2
-                        self._pad_mode_color = 6
-                        active_group += self._chordset_index
-                    case 83:
-                        self._pad_mode = 3
-                        self._pad_mode_color = 58
-                        active_group += self._step_page
-                    case _:
-                        pass
-                self._active_group = PadGroup(active_group)
-                self._sync_groups()
-                self._sync_channel_pads()
-            case 86:
-                self._is_selecting_pattern = bool(cc_val)
-                self._sync_channel_pads()
-            case 90:
-                self._is_selecting_channel = bool(cc_val)
-                self._sync_channel_pads()
-            case 91:
-                if ui.getFocused(midi.widChannelRack):
-                    channels.soloChannel(self._selected_channel)
-                elif ui.getFocused(midi.widMixer):
-                    if self._shifting:
-                        mixer.soloTrack(
-                            mixer.trackNumber(), -1, midi.fxSoloModeWithSourceTracks
-                        )
-                    else:
-                        mixer.soloTrack(
-                            mixer.trackNumber(), -1, midi.fxSoloModeWithDestTracks
-                        )
-            case 92:
-                if ui.getFocused(midi.widChannelRack):
-                    channels.muteChannel(self._selected_channel)
-                elif ui.getFocused(midi.widMixer):
-                    mixer.muteTrack(mixer.trackNumber())
-            case 22 | 23 if cc_val:
-                if not plugins.isValid(self._selected_channel):
-                    return
-                if cc_num == 23:
-                    plugins.nextPreset(self._selected_channel)
-                else:
-                    plugins.prevPreset(self._selected_channel)
-            case 70:
-                mixer.setTrackNumber(cc_val)
-            case 71:
-                mixer.setTrackVolume(mixer.trackNumber(), cc_val / 125)
-            case 72:
-                mixer.setTrackPan(mixer.trackNumber(), _percent_to_bipolar(cc_val))
-            case 73:
-                mixer.setTrackStereoSep(
-                    mixer.trackNumber(), _percent_to_bipolar(cc_val)
+                if ui.getFocused(midi.widMixer):
+                    track_number = mixer.trackNumber()
+                    volume = mixer.getTrackVolume(track_number)
+                    target_vol = volume + 0.012125 * steps
+                    target_vol = min(max(target_vol, 0.0), 1.0)
+                    if target_vol != volume:
+                        mixer.setTrackVolume(track_number, target_vol)
+                elif ui.getFocused(midi.widChannelRack):
+                    channels.setChannelVolume(
+                        self._selected_channel,
+                        channels.getChannelVolume(self._selected_channel)
+                        + 0.03125 * steps,
+                    )
+            case 2:
+                swing = general.processRECEvent(
+                    midi.REC_MainShuffle, 0, midi.REC_GetValue
                 )
-            case 74:
-                if cc_val < channels.channelCount():
-                    channels.selectOneChannel(cc_val)
-                else:
-                    _midi_out_msg_control_change(74, self._selected_channel)
-            case 75:
-                channels.setChannelVolume(self._selected_channel, cc_val / 100)
-            case 76:
-                channels.setChannelPan(
+                target_swing = min(max(swing + 1 * steps, 0), 128)
+                if target_swing != swing:
+                    general.processRECEvent(
+                        midi.REC_MainShuffle,
+                        target_swing,
+                        midi.REC_UpdateControl | midi.REC_Control,
+                    )
+            case 3:
+                transport.globalTransport(midi.FPT_TempoJog, 10 * steps)
+
+    def _on_encoder_up(self, cc_num, cc_val):
+        ui.up()
+
+    def _on_encoder_right(self, cc_num, cc_val):
+        ui.right()
+
+    def _on_encoder_down(self, cc_num, cc_val):
+        ui.down()
+
+    def _on_encoder_left(self, cc_num, cc_val):
+        ui.left()
+
+    def _on_encoder_mode(self, cc_num, cc_val):
+        self._toggle_encoder_mode(cc_num)
+
+    def _on_touch_strip(self, cc_num, cc_val):
+        match self._touch_strip_mode:
+            case 0:
+                led_buffer.touch_cc(cc_num, cc_val)
+                self._scrubber.touch(cc_val)
+            case 1:
+                channels.setChannelPitch(
                     self._selected_channel, _percent_to_bipolar(cc_val)
                 )
-            case 77:
-                self._fixed_velocity = cc_val
-            case 46:
-                self._shifting = bool(cc_val)
-                self._sync_channel_pads()
+            case 2:
+                led_buffer.touch_cc(cc_num, cc_val)
+                self._mod.touch(self._selected_channel, cc_val)
+
+    def _set_mod(self, channel, cc_val):
+        if _has_mod_param(channel):
+            plugins.setParamValue(min(cc_val / 100, 1.0), 0, channel)
+
+    def _on_touch_strip_mode(self, cc_num, cc_val):
+        self._toggle_touch_strip_mode(cc_num)
+        self._sync_touch_strip_value(self._touch_strip_mode)
+
+    def _on_group(self, cc_num, cc_val):
+        page_idx = cc_num - 100
+        match self._pad_mode:
+            case 0:
+                self._channel_page = page_idx
+            case 1:
+                self._scale_index = page_idx
+            case 2:
+                self._chordset_index = page_idx
+            case 3:
+                self._step_page = page_idx
             case _:
-                return
-        msg.handled = True
+                return False
+        self._active_group = _PAD_GROUP_MEMBERS[cc_num]
+        self._sync_groups()
+        self._sync_channel_pads()
+
+    def _on_restart(self, cc_num, cc_val):
+        transport.stop()
+        transport.start()
+
+    def _on_loop(self, cc_num, cc_val):
+        transport.setLoopMode()
+
+    def _on_erase(self, cc_num, cc_val):
+        ui.delete()
+
+    def _on_tap(self, cc_num, cc_val):
+        transport.globalTransport(midi.FPT_TapTempo, 1)
+
+    def _on_metronome(self, cc_num, cc_val):
+        transport.globalTransport(midi.FPT_Metronome, 1)
+
+    def _on_follow(self, cc_num, cc_val):
+        ui.snapOnOff()
+
+    def _on_play(self, cc_num, cc_val):
+        transport.start()
+
+    def _on_stop(self, cc_num, cc_val):
+        transport.stop()
+
+    def _on_panic(self, cc_num, cc_val):
+        transport.stop()
+        self._release_all_voices()
+
+    def _on_rec(self, cc_num, cc_val):
+        transport.record()
+
+    def _on_count_in(self, cc_num, cc_val):
+        transport.globalTransport(midi.FPT_CountDown, 1)
+
+    def _on_fixed_vel(self, cc_num, cc_val):
+        self._is_fixed_velocity = bool(cc_val)
+
+    def _on_pad_mode(self, cc_num, cc_val):
+        for cc in (80, 82, 84, 83):
+            _midi_out_msg_control_change(cc, 127 if cc == cc_num else 0)
+        active_group = 100
+        match cc_num:
+            case 80:
+                self._pad_mode = 0
+                self._pad_mode_color = 10
+                active_group += self._channel_page
+            case 82:
+                self._pad_mode = 1
+                self._pad_mode_color = 46
+                active_group += self._scale_index
+            case 84:
+                self._pad_mode = 2
+                self._pad_mode_color = 6
+                active_group += self._chordset_index
+            case 83:
+                self._pad_mode = 3
+                self._pad_mode_color = 58
+                active_group += self._step_page
+        self._active_group = _PAD_GROUP_MEMBERS[active_group]
+        self._sync_groups()
+        self._sync_channel_pads()
+
+    def _on_pattern(self, cc_num, cc_val):
+        self._is_selecting_pattern = bool(cc_val)
+        self._sync_channel_pads()
+
+    def _on_select(self, cc_num, cc_val):
+        self._is_selecting_channel = bool(cc_val)
+        self._sync_channel_pads()
+
+    def _on_solo(self, cc_num, cc_val):
+        if ui.getFocused(midi.widChannelRack):
+            channels.soloChannel(self._selected_channel)
+        elif ui.getFocused(midi.widMixer):
+            if self._shifting:
+                mixer.soloTrack(
+                    mixer.trackNumber(), -1, midi.fxSoloModeWithSourceTracks
+                )
+            else:
+                mixer.soloTrack(mixer.trackNumber(), -1, midi.fxSoloModeWithDestTracks)
+
+    def _on_mute(self, cc_num, cc_val):
+        if ui.getFocused(midi.widChannelRack):
+            channels.muteChannel(self._selected_channel)
+        elif ui.getFocused(midi.widMixer):
+            mixer.muteTrack(mixer.trackNumber())
+
+    def _on_preset(self, cc_num, cc_val):
+        if not cc_val or not plugins.isValid(self._selected_channel):
+            return False
+        if cc_num == 23:
+            plugins.nextPreset(self._selected_channel)
+        else:
+            plugins.prevPreset(self._selected_channel)
+
+    def _on_mix_track(self, cc_num, cc_val):
+        mixer.setTrackNumber(cc_val)
+
+    def _on_mix_knob(self, cc_num, cc_val):
+        led_buffer.touch_cc(cc_num, cc_val)
+        self._knobs.push(cc_num, mixer.trackNumber(), cc_val)
+
+    def _set_mix_vol(self, track, cc_val):
+        mixer.setTrackVolume(track, cc_val / 125)
 
-    def on_note_on(self, msg) -> None:
+    def _set_mix_pan(self, track, cc_val):
+        mixer.setTrackPan(track, _percent_to_bipolar(cc_val))
+
+    def _set_mix_ss(self, track, cc_val):
+        mixer.setTrackStereoSep(track, _percent_to_bipolar(cc_val))
+
+    def _on_chan_sel(self, cc_num, cc_val):
+        if cc_val < channels.channelCount():
+            channels.selectOneChannel(cc_val)
+        else:
+            _midi_out_msg_control_change(74, self._selected_channel)
+
+    def _on_chan_knob(self, cc_num, cc_val):
+        led_buffer.touch_cc(cc_num, cc_val)
+        self._knobs.push(cc_num, self._selected_channel, cc_val)
+
+    def _set_chan_vol(self, channel, cc_val):
+        channels.setChannelVolume(channel, cc_val / 100)
+
+    def _set_chan_pan(self, channel, cc_val):
+        channels.setChannelPan(channel, _percent_to_bipolar(cc_val))
+
+    def _on_fix_vel(self, cc_num, cc_val):
+        self._fixed_velocity = cc_val
+
+    def _on_shift(self, cc_num, cc_val):
+        self._shifting = bool(cc_val)
+        self._sync_channel_pads()
+
+    def on_note_on(self, msg):
         note_num, note_vel = (msg.note, msg.velocity)
+        led_buffer.forget_note(note_num, msg.midiChan)
+        if not note_vel:
+            self._release_voices(note_num)
         if self._shifting:
             self._handle_shift_note_on(note_num, note_vel)
         if self._is_selecting_pattern and note_vel:
             patterns.jumpToPattern(note_num + 1)
+            self._grid_pages = 0
             self._sync_channel_pads()
         if self._is_selecting_channel and note_vel:
             chan_idx = note_num + self._channel_page * 16
@@ -588,7 +895,7 @@ class Controller:
         self._handle_note_on(note_num, note_vel)
         msg.handled = True
 
-    def _handle_shift_note_on(self, note_num: int, note_vel: int) -> None:
+    def _handle_shift_note_on(self, note_num, note_vel):
         if not note_vel:
             _midi_out_msg_note_on(note_num, 68)
             match note_num:
@@ -600,246 +907,91 @@ class Controller:
                     channels.quickQuantize(self._selected_channel)
                 case 5:
                     channels.quickQuantize(self._selected_channel, 1)
-                case 12 if self._semi_offset > 12 * -5:
+                case 12 if self._semi_offset > -60:
                     self._semi_offset -= 1
-                case 13 if self._semi_offset < 12 * 5:
+                case 13 if self._semi_offset < 60:
                     self._semi_offset += 1
-                case 14 if self._semi_offset > 12 * -5:
+                case 14 if self._semi_offset > -60:
                     self._semi_offset -= 12
-                case 15 if self._semi_offset < 12 * 5:
+                case 15 if self._semi_offset < 60:
                     self._semi_offset += 12
-                case _:
-                    pass
         else:
             _midi_out_msg_note_on(note_num, 70)
 
-    def _handle_note_on(self, note_num: int, note_vel: int) -> None:
+    def _handle_note_on(self, note_num, note_vel):
+        velocity = self._fixed_velocity if self._is_fixed_velocity else note_vel
         match self._pad_mode:
             case 0:
-                real_note = 48 + self._get_semi_offset()
                 chan_idx = note_num + self._channel_page * 16
                 if chan_idx >= channels.channelCount():
                     return
                 if note_vel:
-                    channels.midiNoteOn(
-                        chan_idx,
-                        real_note,
-                        self._fixed_velocity if self._is_fixed_velocity else note_vel,
-                    )
-                else:
-                    channels.midiNoteOn(chan_idx, real_note, 0)
+                    real_note = _clamp_note(48 + self._get_semi_offset())
+                    self._start_voices(note_num, chan_idx, (real_note,), velocity)
                 _midi_out_msg_note_on(
                     note_num, _get_channel_color(chan_idx, bool(note_vel))
                 )
             case 1:
-                real_note = [
-                    [36, 38, 44, 46, 37, 40, 45, 41, 47, 42, 39, 43, 48, 49, 50, 55],
-                    [48, 50, 51, 53, 55, 56, 58, 60, 62, 63, 65, 67, 68, 70, 72, 74],
-                    [48, 50, 52, 53, 55, 57, 59, 60, 62, 64, 65, 67, 69, 71, 72, 74],
-                    [37, 36, 42, 82, 40, 38, 46, 44, 48, 47, 45, 43, 49, 55, 51, 53],
-                    [48, 49, 50, 51, 52, 53, 54, 55, 56, 57, 58, 59, 60, 61, 62, 63],
-                    [48, 49, 52, 53, 55, 56, 59, 60, 61, 64, 65, 67, 68, 71, 72, 73],
-                    [48, 49, 50, 51, 52, 53, 54, 55, 56, 57, 58, 59, 60, 61, 62, 63],
-                    [48, 49, 50, 51, 52, 53, 54, 55, 56, 57, 58, 59, 60, 61, 62, 63],
-                ][self._scale_index][note_num] + self._get_semi_offset()
                 if note_vel:
-                    channels.midiNoteOn(
+                    self._start_voices(
+                        note_num,
                         self._selected_channel,
-                        real_note,
-                        self._fixed_velocity if self._is_fixed_velocity else note_vel,
+                        self._get_keyboard_notes()[note_num],
+                        velocity,
                     )
                     _midi_out_msg_note_on(note_num, 46)
                 else:
-                    channels.midiNoteOn(self._selected_channel, real_note, 0)
                     _midi_out_msg_note_on(note_num, 0)
             case 2:
-                chord_notes = [
-                    [
-                        [36, 48, 51, 55],
-                        [39, 48, 51, 55],
-                        [41, 36, 53, 56],
-                        [31, 47, 50, 55],
-                        [32, 48, 51, 55],
-                        [39, 46, 51, 55],
-                        [31, 46, 50, 55],
-                        [34, 46, 50, 53],
-                        [29, 45, 48, 53],
-                        [32, 48, 53, 56],
-                        [31, 48, 51, 55],
-                        [31, 47, 50, 55],
-                        [29, 38, 53, 56],
-                        [38, 50, 53, 58],
-                        [38, 48, 50, 55],
-                        [36, 48, 53, 55],
-                    ],
-                    [
-                        [36, 43, 48, 51],
-                        [35, 43, 47, 51],
-                        [34, 43, 48, 51],
-                        [31, 47, 50, 55],
-                        [32, 48, 51, 55],
-                        [39, 46, 51, 55],
-                        [31, 46, 50, 55],
-                        [34, 46, 50, 53],
-                        [29, 45, 48, 53],
-                        [32, 48, 53, 56],
-                        [31, 48, 51, 55],
-                        [31, 47, 50, 55],
-                        [36, 48, 51, 55],
-                        [29, 38, 53, 56],
-                        [34, 38, 53, 58],
-                        [34, 38, 50, 55],
-                    ],
-                    [
-                        [36, 43, 48, 50, 55],
-                        [36, 43, 46, 50, 53],
-                        [38, 45, 48, 50, 53],
-                        [38, 57, 48, 52, 55],
-                        [40, 43, 48, 50, 55],
-                        [38, 43, 46, 50, 53],
-                        [33, 45, 48, 50, 53],
-                        [33, 45, 48, 52, 55],
-                        [39, 51, 54, 58],
-                        [39, 49, 53, 56],
-                        [37, 49, 53, 56],
-                        [39, 53, 56, 61],
-                        [37, 53, 56, 61],
-                        [36, 51, 56, 60],
-                        [36, 51, 55, 58],
-                        [34, 38, 55, 58],
-                    ],
-                    [
-                        [25, 38, 43, 46],
-                        [29, 36, 41, 45],
-                        [31, 38, 43, 46],
-                        [34, 41, 46, 50],
-                        [26, 33, 38, 41],
-                        [24, 31, 36, 39],
-                        [29, 36, 41, 45],
-                        [31, 38, 43, 46],
-                        [36, 48, 51, 55],
-                        [36, 48, 51, 55],
-                        [36, 48, 51, 55],
-                        [36, 48, 51, 55],
-                        [36, 48, 51, 55],
-                        [36, 48, 51, 55],
-                        [36, 48, 51, 55],
-                        [36, 48, 51, 55],
-                    ],
-                    [
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                    ],
-                    [
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                    ],
-                    [
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                    ],
-                    [
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                    ],
-                ][self._chordset_index][note_num]
-                for note in chord_notes:
-                    real_note = note + self._get_semi_offset()
-                    if note_vel:
-                        channels.midiNoteOn(
-                            self._selected_channel,
-                            real_note,
-                            (
-                                self._fixed_velocity
-                                if self._is_fixed_velocity
-                                else note_vel
-                            ),
-                        )
-                        _midi_out_msg_note_on(note_num, 6)
-                    else:
-                        channels.midiNoteOn(self._selected_channel, real_note, 0)
-                        _midi_out_msg_note_on(note_num, 0)
+                if note_vel:
+                    self._start_voices(
+                        note_num,
+                        self._selected_channel,
+                        self._get_chord_notes()[note_num],
+                        velocity,
+                    )
+                    _midi_out_msg_note_on(note_num, 6)
+                else:
+                    _midi_out_msg_note_on(note_num, 0)
             case 3 if note_vel:
-                chan_idx = note_num + self._step_page * 16
-                selected_channel = self._selected_channel
-                channels.setGridBit(
-                    selected_channel,
-                    chan_idx,
-                    not channels.getGridBit(selected_channel, chan_idx),
-                )
-            case _:
-                pass
+                is_set = self._get_grid_page(self._step_page) >> note_num & 1
+                step = note_num + self._step_page * 16
+                channels.setGridBit(self._selected_channel, step, not is_set)
+                self._grid_bits ^= 1 << step
+
+    def _start_voices(self, pad, channel, notes, velocity):
+        self._release_voices(pad)
+        for note in notes:
+            channels.midiNoteOn(channel, note, velocity)
+        self._voice_channels[pad] = channel
+        self._voice_notes[pad] = notes
+
+    def _release_voices(self, pad):
+        channel = self._voice_channels[pad]
+        if channel < 0:
+            return
+        for note in self._voice_notes[pad]:
+            channels.midiNoteOn(channel, note, 0)
+        self._voice_channels[pad] = -1
+
+    def _release_all_voices(self):
+        for pad in (0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15):
+            self._release_voices(pad)
 
-    def _init_led_states(self) -> None:
+    def _init_led_states(self):
         self._deinit_led_states()
         _midi_out_msg_control_change(100, self._pad_mode_color)
         _midi_out_msg_control_change(80, 127)
         _midi_out_msg_control_change(77, 100)
 
     @staticmethod
-    def _deinit_led_states() -> None:
+    def _deinit_led_states():
         for cc in range(128):
             _midi_out_msg_control_change(cc, 0)
-        for note in range(16):
+        for note in (0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15):
             _midi_out_msg_note_on(note, 0)
 
-    def _sync_cc_led_states(self) -> None:
+    def _sync_cc_led_states(self):
         _midi_out_msg_control_change(34, _on_off(ui.getVisible(midi.widChannelRack)))
         _midi_out_msg_control_change(36, _on_off(ui.getVisible(midi.widPlaylist)))
         _midi_out_msg_control_change(37, _on_off(ui.getVisible(midi.widMixer)))
@@ -851,21 +1003,27 @@ class Controller:
         _midi_out_msg_control_change(58, _on_off(transport.isRecording()))
         _midi_out_msg_control_change(59, _on_off(not transport.isPlaying()))
 
-    def _sync_selected_channel(self) -> None:
-        self._selected_channel = channels.selectedChannel()
+    def _sync_rec_led(self):
+        _midi_out_msg_control_change(58, _on_off(transport.isRecording()))
+
+    def _sync_selected_channel(self):
+        selected_channel = channels.selectedChannel()
+        if selected_channel != self._selected_channel:
+            self._grid_pages = 0
+        self._selected_channel = selected_channel
 
-    def _toggle_selected_channel_highlight(self) -> None:
+    def _toggle_selected_channel_highlight(self):
         _midi_out_msg_note_on(
             self._selected_channel - self._channel_page * 16,
             _get_channel_color(self._selected_channel, self._is_selecting_channel),
         )
 
-    def _sync_channel_pads(self) -> None:
-        for note in range(16):
+    def _sync_channel_pads(self):
+        for note in (0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15):
             _midi_out_msg_note_on(note, 0)
         if self._shifting:
-            for note in range(16):
-                if _is_enum_value(Pad, note):
+            for note in (0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15):
+                if note in _PAD_VALUES:
                     _midi_out_msg_note_on(note, 68)
         elif self._is_selecting_pattern:
             for pattern in range(patterns.patternCount()):
@@ -882,12 +1040,11 @@ class Controller:
                 _midi_out_msg_note_on(idx, _get_channel_color(channel, False))
             self._toggle_selected_channel_highlight()
         elif self._pad_mode == 3:
-            for idx, gb in enumerate(_get_grid(self._step_page)):
-                _midi_out_msg_note_on(
-                    idx, 58 if channels.getGridBit(self._selected_channel, gb) else 0
-                )
+            page = self._get_grid_page(self._step_page)
+            for note in (0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15):
+                _midi_out_msg_note_on(note, 58 if page >> note & 1 else 0)
 
-    def _sync_channel_controls(self) -> None:
+    def _sync_channel_controls(self):
         _midi_out_msg_control_change(74, self._selected_channel)
         _midi_out_msg_control_change(
             75, round(channels.getChannelVolume(self._selected_channel) * 100)
@@ -903,7 +1060,7 @@ class Controller:
         )
 
     @staticmethod
-    def _sync_mixer_controls() -> None:
+    def _sync_mixer_controls():
         track_number = mixer.trackNumber()
         _midi_out_msg_control_change(70, track_number)
         _midi_out_msg_control_change(
@@ -918,16 +1075,12 @@ class Controller:
         _midi_out_msg_control_change(91, _on_off(mixer.isTrackSolo(track_number)))
         _midi_out_msg_control_change(92, _on_off(mixer.isTrackMuted(track_number)))
 
-    def _toggle_encoder_mode(self, cc: int) -> None:
-        match cc:
-            case 44:
-                mode = 1
-            case 45:
-                mode = 2
-            case 47:
-                mode = 3
-            case _:
-                mode = 0
+    @staticmethod
+    def _get_window_id(cc):
+        return _CASES_GET_WINDOW_ID.get(cc, midi.widBrowser)
+
+    def _toggle_encoder_mode(self, cc):
+        mode = _CASES_TOGGLE_ENCODER_MODE.get(cc, 0)
         mode = mode if self._encoder_mode != mode else 0
         for cc_num in (44, 45, 47):
             _midi_out_msg_control_change(
@@ -935,18 +1088,8 @@ class Controller:
             )
         self._encoder_mode = mode
 
-    def _toggle_touch_strip_mode(self, cc: int) -> None:
-        match cc:
-            case 49:
-                mode = 1
-            case 50:
-                mode = 2
-            case 51:
-                mode = 3
-            case 52:
-                mode = 4
-            case _:
-                mode = 0
+    def _toggle_touch_strip_mode(self, cc):
+        mode = _CASES_TOGGLE_TOUCH_STRIP_MODE.get(cc, 0)
         mode = mode if self._touch_strip_mode != mode else 0
         for cc_num in (49, 50, 51, 52):
             _midi_out_msg_control_change(
@@ -954,7 +1097,7 @@ class Controller:
             )
         self._touch_strip_mode = mode
 
-    def _sync_touch_strip_value(self, mode: TouchStripMode) -> None:
+    def _sync_touch_strip_value(self, mode):
         match mode:
             case 0:
                 self._sync_song_position()
@@ -966,218 +1109,105 @@ class Controller:
                     ),
                 )
             case 2:
-                pass
-            case 3:
-                pass
-            case 4:
-                pass
+                channel = self._selected_channel
+                if _has_mod_param(channel):
+                    value = round(plugins.getParamValue(0, channel) * 100)
+                    self._mod.sync(channel, value)
+                    _midi_out_msg_control_change(1, value)
+
+    def _sync_touch_strip(self):
+        self._sync_touch_strip_value(self._touch_strip_mode)
 
-    def _sync_song_position(self) -> None:
+    def _sync_song_position(self):
         _midi_out_msg_control_change(1, int(transport.getSongPos() * 100))
 
-    def _sync_groups(self) -> None:
-        for idx, cc in enumerate(range(100, 107 + 1)):
+    def _sync_groups(self):
+        for idx, cc in enumerate((100, 101, 102, 103, 104, 105, 106, 107)):
             if cc == self._active_group:
                 color = self._pad_mode_color
             elif self._pad_mode == 0 and channels.channelCount() > idx * 16:
-                color = 10 - 2
-            elif self._pad_mode == 3 and any(
-                (
-                    channels.getGridBit(self._selected_channel, gb)
-                    for gb in _get_grid(idx)
-                )
-            ):
-                color = 58 - 2
-            elif (
-                self._pad_mode == 1
-                and [
-                    [36, 38, 44, 46, 37, 40, 45, 41, 47, 42, 39, 43, 48, 49, 50, 55],
-                    [48, 50, 51, 53, 55, 56, 58, 60, 62, 63, 65, 67, 68, 70, 72, 74],
-                    [48, 50, 52, 53, 55, 57, 59, 60, 62, 64, 65, 67, 69, 71, 72, 74],
-                    [37, 36, 42, 82, 40, 38, 46, 44, 48, 47, 45, 43, 49, 55, 51, 53],
-                    [48, 49, 50, 51, 52, 53, 54, 55, 56, 57, 58, 59, 60, 61, 62, 63],
-                    [48, 49, 52, 53, 55, 56, 59, 60, 61, 64, 65, 67, 68, 71, 72, 73],
-                    [48, 49, 50, 51, 52, 53, 54, 55, 56, 57, 58, 59, 60, 61, 62, 63],
-                    [48, 49, 50, 51, 52, 53, 54, 55, 56, 57, 58, 59, 60, 61, 62, 63],
-                ][idx]
-            ):
-                color = 46 - 2
-            elif (
-                self._pad_mode == 2
-                and [
-                    [
-                        [36, 48, 51, 55],
-                        [39, 48, 51, 55],
-                        [41, 36, 53, 56],
-                        [31, 47, 50, 55],
-                        [32, 48, 51, 55],
-                        [39, 46, 51, 55],
-                        [31, 46, 50, 55],
-                        [34, 46, 50, 53],
-                        [29, 45, 48, 53],
-                        [32, 48, 53, 56],
-                        [31, 48, 51, 55],
-                        [31, 47, 50, 55],
-                        [29, 38, 53, 56],
-                        [38, 50, 53, 58],
-                        [38, 48, 50, 55],
-                        [36, 48, 53, 55],
-                    ],
-                    [
-                        [36, 43, 48, 51],
-                        [35, 43, 47, 51],
-                        [34, 43, 48, 51],
-                        [31, 47, 50, 55],
-                        [32, 48, 51, 55],
-                        [39, 46, 51, 55],
-                        [31, 46, 50, 55],
-                        [34, 46, 50, 53],
-                        [29, 45, 48, 53],
-                        [32, 48, 53, 56],
-                        [31, 48, 51, 55],
-                        [31, 47, 50, 55],
-                        [36, 48, 51, 55],
-                        [29, 38, 53, 56],
-                        [34, 38, 53, 58],
-                        [34, 38, 50, 55],
-                    ],
-                    [
-                        [36, 43, 48, 50, 55],
-                        [36, 43, 46, 50, 53],
-                        [38, 45, 48, 50, 53],
-                        [38, 57, 48, 52, 55],
-                        [40, 43, 48, 50, 55],
-                        [38, 43, 46, 50, 53],
-                        [33, 45, 48, 50, 53],
-                        [33, 45, 48, 52, 55],
-                        [39, 51, 54, 58],
-                        [39, 49, 53, 56],
-                        [37, 49, 53, 56],
-                        [39, 53, 56, 61],
-                        [37, 53, 56, 61],
-                        [36, 51, 56, 60],
-                        [36, 51, 55, 58],
-                        [34, 38, 55, 58],
-                    ],
-                    [
-                        [25, 38, 43, 46],
-                        [29, 36, 41, 45],
-                        [31, 38, 43, 46],
-                        [34, 41, 46, 50],
-                        [26, 33, 38, 41],
-                        [24, 31, 36, 39],
-                        [29, 36, 41, 45],
-                        [31, 38, 43, 46],
-                        [36, 48, 51, 55],
-                        [36, 48, 51, 55],
-                        [36, 48, 51, 55],
-                        [36, 48, 51, 55],
-                        [36, 48, 51, 55],
-                        [36, 48, 51, 55],
-                        [36, 48, 51, 55],
-                        [36, 48, 51, 55],
-                    ],
-                    [
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                    ],
-                    [
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                    ],
-                    [
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                    ],
-                    [
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                        [36, 48, 52, 55],
-                    ],
-                ][idx]
-            ):
-                color = 6 - 2
+                color = 8
+            elif self._pad_mode == 3 and self._get_grid_page(idx):
+                color = 56
+            elif self._pad_mode == 1:
+                color = 44
+            elif self._pad_mode == 2:
+                color = 4
             else:
                 color = 0
             _midi_out_msg_control_change(cc, color)
 
-    def _get_semi_offset(self) -> int:
+    def _get_grid_page(self, page):
+        lower_step = page * 16
+        if not self._grid_pages >> page & 1:
+            bits = 0
+            for note in (0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15):
+                if channels.getGridBit(self._selected_channel, lower_step + note):
+                    bits |= 1 << note
+            self._grid_bits &= ~(65535 << lower_step)
+            self._grid_bits |= bits << lower_step
+            self._grid_pages |= 1 << page
+        return self._grid_bits >> lower_step & 65535
+
+    def _get_keyboard_notes(self):
+        scale_index, semi_offset = self._keyboard_notes_key
+        if scale_index != self._scale_index or semi_offset != self._semi_offset:
+            start = self._scale_index * 16
+            self._keyboard_notes = _compile_scale(
+                b"$&,.%(-)/*'+0127023578:<>?ACDFHJ024579;<>@ACEGHJ%$*R(&.,0/-+17350123456789:;<=>?014578;<=@ACDGHI0123456789:;<=>?0123456789:;<=>?"[
+                    start : start + 16
+                ],
+                self._get_semi_offset(),
+            )
+            self._keyboard_notes_key = (self._scale_index, self._semi_offset)
+        return self._keyboard_notes
+
+    def _get_chord_notes(self):
+        chordset_index, semi_offset = self._chord_notes_key
+        if chordset_index != self._chordset_index or semi_offset != self._semi_offset:
+            start = (0, 80, 160, 248, 328, 408, 488, 568, 648)[self._chordset_index]
+            end = (0, 80, 160, 248, 328, 408, 488, 568, 648)[self._chordset_index + 1]
+            self._chord_notes = _compile_chord_set(
+                b"\x04$037\x04'037\x04)$58\x04\x1f/27\x04 037\x04'.37\x04\x1f.27\x04\".25\x04\x1d-05\x04 058\x04\x1f037\x04\x1f/27\x04\x1d&58\x04&25:\x04&027\x04$057\x04$+03\x04#+/3\x04\"+03\x04\x1f/27\x04 037\x04'.37\x04\x1f.27\x04\".25\x04\x1d-05\x04 058\x04\x1f037\x04\x1f/27\x04$037\x04\x1d&58\x04\"&5:\x04\"&27\x05$+027\x05$+.25\x05&-025\x05&9047\x05(+027\x05&+.25\x05!-025\x05!-047\x04'36:\x04'158\x04%158\x04'58=\x04%58=\x04$38<\x04$37:\x04\"&7:\x04\x19&+.\x04\x1d$)-\x04\x1f&+.\x04\").2\x04\x1a!&)\x04\x18\x1f$'\x04\x1d$)-\x04\x1f&+.\x04$037\x04$037\x04$037\x04$037\x04$037\x04$037\x04$037\x04$037\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047\x04$047"[
+                    start:end
+                ],
+                self._get_semi_offset(),
+            )
+            self._chord_notes_key = (self._chordset_index, self._semi_offset)
+        return self._chord_notes
+
+    def _get_semi_offset(self):
         return self._semi_offset + 12
 
 
 controller = Controller()
 
 
-def OnInit() -> None:
+def OnInit():
     controller.on_init()
+    led_buffer.flush()
 
 
-def OnDeInit() -> None:
+def OnDeInit():
     controller.on_de_init()
+    led_buffer.flush()
 
 
-def OnRefresh(flags: int) -> None:
+def OnRefresh(flags):
     controller.on_refresh(flags)
+    led_buffer.flush()
+
+
+def OnIdle():
+    controller.on_idle()
+    led_buffer.flush()
 
 
-def OnControlChange(msg) -> None:
+def OnControlChange(msg):
     controller.on_control_change(msg)
+    led_buffer.flush()
 
 
-def OnNoteOn(msg) -> None:
+def OnNoteOn(msg):
     controller.on_note_on(msg)
+    led_buffer.flush()
@@ -0,0 +1,958 @@
+"""
+Static worst case of the FL API calls and messages of every entry point.
+
+Builds a call graph over the modules of `src/`, starting from the `Controller`
+methods behind every FL Studio callback: a row for every CC handler (and SHIFT
+handler), `OnNoteOn`, `OnInit`, `OnDeInit`, `OnRefresh` and `OnIdle`, which
+runs every sync of the refresh scheduler. The dispatch tables, and the
+callables stored by the coalescers (e.g. the knob setters), are read from a
+`Controller` created against the simulated FL Studio API (`scripts/flsim`),
+the costs from the syntax trees.
+
+Costs are upper bounds: branches count their most expensive side, and loops
+their body times their bound. Bounds of `NOTES_COUNT`, `CC_COUNT`,
+`channels.channelCount()` and `patterns.patternCount()` are kept as symbols,
+and evaluated for the project size given on the command line, as are the
+loops over other values (`len(...)`). Every LED write counts as the message
+the flush may send for it.
+
+Results can be saved as JSON (`-o`) and compared against a saved run
+(`--baseline`), exiting with an error when an entry point got more expensive
+or started scaling with another bound. `--max-calls` and `--max-messages`
+fail on any entry point above a fixed budget. Both also fail when an entry
+point makes calls that couldn't be resolved, as its costs would be too low.
+"""
+
+import argparse
+import ast
+import json
+import operator
+import subprocess
+import sys
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Collection,
+    Dict,
+    FrozenSet,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from flsim import MODULES, ROOT, SRC, FLSim, import_src
+
+type Term = Tuple[str, ...]
+"""Product of symbolic bounds, `()` for the constant term"""
+
+type Poly = Dict[Term, int]
+"""Sum of terms with their coefficients, all symbols and coefficients are positive"""
+
+FL_MODULES = frozenset(cls.name for cls in MODULES)
+
+FL_CLASSES = {cls.__qualname__: cls.name for cls in MODULES}
+"""FL API module of every class of the simulated API, e.g. `transport` of `Transport`"""
+
+# messages sent to the device, SysEx frames count as a single message
+OUTPUT_CALLS = ("device.midiOutMsg", "device.midiOutSysex")
+
+SYMBOLS = ("NOTES_COUNT", "CC_COUNT")
+"""Constants kept as symbols in loop bounds"""
+
+COUNT_CALLS = ("channels.channelCount", "patterns.patternCount")
+"""FL API calls whose results are kept as symbols in loop bounds"""
+
+ENUM_BASES = ("Enum", "IntEnum", "IntFlag")
+
+OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.FloorDiv: operator.floordiv,
+    ast.LShift: operator.lshift,
+    ast.BitOr: operator.or_,
+}
+
+UNKNOWN: Any = object()
+"""Value of an expression that isn't a constant"""
+
+
+def _add(a: Poly, b: Poly) -> Poly:
+    result = dict(a)
+    for term, coefficient in b.items():
+        result[term] = result.get(term, 0) + coefficient
+    return result
+
+
+def _mul(a: Poly, b: Poly) -> Poly:
+    result: Poly = {}
+    for term_a, coefficient_a in a.items():
+        for term_b, coefficient_b in b.items():
+            term = tuple(sorted(term_a + term_b))
+            result[term] = result.get(term, 0) + coefficient_a * coefficient_b
+    return result
+
+
+def _max(a: Poly, b: Poly) -> Poly:
+    """Upper bound of both, term by term"""
+
+    return {term: max(a.get(term, 0), b.get(term, 0)) for term in a.keys() | b.keys()}
+
+
+def _evaluate(poly: Poly, values: Dict[str, int], default: int) -> int:
+    total = 0
+    for term, coefficient in poly.items():
+        for symbol in term:
+            coefficient *= values.get(symbol, default)
+        total += coefficient
+    return total
+
+
+def _format(poly: Poly) -> str:
+    if not poly:
+        return "0"
+    terms = sorted(poly.items(), key=lambda item: (-len(item[0]), item[0]))
+    parts = []
+    for term, coefficient in terms:
+        factors = ([str(coefficient)] if coefficient != 1 or not term else []) + [*term]
+        parts.append("*".join(factors))
+    return " + ".join(parts)
+
+
+@dataclass
+class Cost:
+    """Worst case FL API calls and messages sent"""
+
+    api: Poly = field(default_factory=dict)
+    out: Poly = field(default_factory=dict)
+    calls: Dict[str, Poly] = field(default_factory=dict)
+    """Worst case of every FL API function on its own"""
+
+    unresolved: FrozenSet[str] = frozenset()
+    """Calls that couldn't be resolved, as `function: callee`, counted as free"""
+
+    @classmethod
+    def api_call(cls, name: str) -> "Cost":
+        one: Poly = {(): 1}
+        return cls(one, one if name in OUTPUT_CALLS else {}, {name: one})
+
+    def __add__(self, other: "Cost") -> "Cost":
+        calls = dict(self.calls)
+        for name, poly in other.calls.items():
+            calls[name] = _add(calls.get(name, {}), poly)
+        return Cost(
+            _add(self.api, other.api),
+            _add(self.out, other.out),
+            calls,
+            self.unresolved | other.unresolved,
+        )
+
+    def __mul__(self, bound: Poly) -> "Cost":
+        return Cost(
+            _mul(self.api, bound),
+            _mul(self.out, bound),
+            {name: _mul(poly, bound) for name, poly in self.calls.items()},
+            self.unresolved,
+        )
+
+    def max(self, other: "Cost") -> "Cost":
+        calls = dict(self.calls)
+        for name, poly in other.calls.items():
+            calls[name] = _max(calls.get(name, {}), poly)
+        return Cost(
+            _max(self.api, other.api),
+            _max(self.out, other.out),
+            calls,
+            self.unresolved | other.unresolved,
+        )
+
+
+class CostAnalyzer:
+    """Call graph and worst case costs of the functions and methods of `src/`"""
+
+    def __init__(self, src: Path) -> None:
+        self.functions: Dict[str, ast.FunctionDef] = {}
+        """Functions and methods by qualified name"""
+
+        self.classes: Set[str] = set()
+        self.attributes: Dict[str, Dict[str, str]] = defaultdict(dict)
+        """Annotated or constructed class of the attributes of every class"""
+
+        self.instances: Dict[str, str] = {}
+        """Class of the module-level instances, e.g. `led_buffer`"""
+
+        self.live: Dict[str, object] = {}
+        """Instances of a live `Controller`, by class, see `_live_instances`"""
+
+        self.dynamic: Dict[str, Set[str]] = defaultdict(set)
+        """Calls which can't be resolved, by calling function"""
+
+        self.recursive: Set[str] = set()
+        self._constants: Dict[str, ast.expr] = {}
+        self._costs: Dict[str, Cost] = {}
+        self._stack: List[str] = []
+
+        for path in sorted(src.glob("*.py")):
+            self._load(ast.parse(path.read_text(encoding="utf-8"), path.name))
+
+    def _load(self, tree: ast.Module) -> None:
+        for stmt in tree.body:
+            if isinstance(stmt, ast.FunctionDef):
+                self.functions[stmt.name] = stmt
+            elif isinstance(stmt, ast.ClassDef):
+                self._load_class(stmt)
+            elif (
+                isinstance(stmt, ast.Assign)
+                and len(stmt.targets) == 1
+                and isinstance(stmt.targets[0], ast.Name)
+            ):
+                name, value = stmt.targets[0].id, stmt.value
+                if isinstance(value, ast.Call) and isinstance(value.func, ast.Name):
+                    self.instances[name] = value.func.id
+                else:
+                    self._constants[name] = value
+
+    def _load_class(self, node: ast.ClassDef) -> None:
+        self.classes.add(node.name)
+        bases = {base.id for base in node.bases if isinstance(base, ast.Name)}
+        attributes = self.attributes[node.name]
+        for member in node.body:
+            if isinstance(member, ast.FunctionDef):
+                self.functions[f"{node.name}.{member.name}"] = member
+                if member.name == "__init__":
+                    for stmt in ast.walk(member):
+                        self._load_attribute(stmt, attributes)
+            elif isinstance(member, ast.AnnAssign) and isinstance(
+                member.target, ast.Name
+            ):
+                attributes[member.target.id] = ast.unparse(member.annotation)
+            elif (
+                bases & set(ENUM_BASES)
+                and isinstance(member, ast.Assign)
+                and isinstance(member.targets[0], ast.Name)
+            ):
+                self._constants[f"{node.name}.{member.targets[0].id}"] = member.value
+
+    @staticmethod
+    def _load_attribute(stmt: ast.AST, attributes: Dict[str, str]) -> None:
+        # `self.x = SomeClass(...)`
+        if (
+            isinstance(stmt, ast.Assign)
+            and len(stmt.targets) == 1
+            and isinstance(target := stmt.targets[0], ast.Attribute)
+            and isinstance(target.value, ast.Name)
+            and target.value.id == "self"
+            and isinstance(stmt.value, ast.Call)
+            and isinstance(stmt.value.func, ast.Name)
+        ):
+            attributes.setdefault(target.attr, stmt.value.func.id)
+
+    def constant(self, node: ast.expr, local_names: Collection[str] = ()) -> Any:
+        """Returns the value of a module-level constant expression, or `UNKNOWN`"""
+
+        if isinstance(node, ast.Constant):
+            return node.value
+        if isinstance(node, ast.Name):
+            if node.id in local_names or node.id not in self._constants:
+                return UNKNOWN
+            return self.constant(self._constants[node.id])
+        if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name):
+            member = self._constants.get(f"{node.value.id}.{node.attr}")
+            return UNKNOWN if member is None else self.constant(member)
+        if isinstance(node, ast.UnaryOp):
+            operand = self.constant(node.operand, local_names)
+            if operand is UNKNOWN:
+                return UNKNOWN
+            if isinstance(node.op, ast.USub):
+                return -operand
+            if isinstance(node.op, ast.Not):
+                return not operand
+            return UNKNOWN
+        if isinstance(node, ast.BinOp) and type(node.op) in OPERATORS:
+            left = self.constant(node.left, local_names)
+            right = self.constant(node.right, local_names)
+            if left is UNKNOWN or right is UNKNOWN:
+                return UNKNOWN
+            return OPERATORS[type(node.op)](left, right)
+        if isinstance(node, (ast.Tuple, ast.List)):
+            values = [self.constant(elt, local_names) for elt in node.elts]
+            return UNKNOWN if UNKNOWN in values else tuple(values)
+        return UNKNOWN
+
+    def method(self, cls: str, name: str) -> Optional[str]:
+        qualname = f"{cls}.{name}"
+        return qualname if qualname in self.functions else None
+
+    def callable_cost(self, target: Callable[..., Any]) -> Optional[Cost]:
+        """
+        Returns the worst case cost of a call of a live function or method,
+        None when it isn't a function of `src/` or of the FL API
+        """
+
+        owner, _, name = target.__qualname__.rpartition(".")
+        if getattr(target, "__module__", None) == "flsim.api" and owner in FL_CLASSES:
+            return Cost.api_call(f"{FL_CLASSES[owner]}.{name}")
+        if target.__qualname__ in self.functions:
+            return self.cost(target.__qualname__)
+        return None
+
+    def cost(self, qualname: str) -> Cost:
+        """Returns the worst case cost of a call of a function or method"""
+
+        cost = self._costs.get(qualname)
+        if cost is not None:
+            return cost
+        if qualname in self._stack:
+            self.recursive.add(qualname)
+            return Cost()
+
+        self._stack.append(qualname)
+        try:
+            cost = _FunctionCost(self, qualname).run()
+        finally:
+            self._stack.pop()
+        self._costs[qualname] = cost
+        return cost
+
+
+class _FunctionCost:
+    """Walks the body of a function, see `CostAnalyzer.cost`"""
+
+    def __init__(self, analyzer: CostAnalyzer, qualname: str) -> None:
+        self.analyzer = analyzer
+        self.qualname = qualname
+        self.node = analyzer.functions[qualname]
+        self.cls = qualname.rpartition(".")[0] or None
+        args = self.node.args
+        self.locals: Dict[str, Optional[ast.expr]] = {
+            arg.arg: None for arg in (*args.posonlyargs, *args.args, *args.kwonlyargs)
+        }
+        if args.vararg is not None:
+            self.locals[args.vararg.arg] = None
+        # arguments annotated `type[...]`, whose calls construct an instance
+        self._class_args = {
+            arg.arg
+            for arg in (*args.posonlyargs, *args.args, *args.kwonlyargs)
+            if isinstance(arg.annotation, ast.Subscript)
+            and ast.unparse(arg.annotation.value) == "type"
+        }
+        self._bounding: Set[str] = set()
+
+    def run(self) -> Cost:
+        return self.block(self.node.body)
+
+    def block(self, stmts: List[ast.stmt]) -> Cost:
+        cost = Cost()
+        for stmt in stmts:
+            cost = cost + self.stmt(stmt)
+        return cost
+
+    def stmt(self, node: ast.stmt) -> Cost:
+        if isinstance(node, ast.If):
+            test = self.analyzer.constant(node.test, set(self.locals))
+            if test is not UNKNOWN:
+                return self.block(node.body if test else node.orelse)
+            branches = self.block(node.body).max(self.block(node.orelse))
+            return self.expr(node.test) + branches
+        if isinstance(node, ast.Match):
+            cases = Cost()
+            for case in node.cases:
+                cases = cases.max(self.expr(case.guard) + self.block(case.body))
+            return self.expr(node.subject) + cases
+        if isinstance(node, ast.For):
+            self._assign(node.target, None)
+            counted = self._counted_break(node)
+            if counted is not None:
+                # the statements before the `break` run once more than the others
+                index, limit = counted
+                before = self.block(node.body[:index]) * _add(limit, {(): 1})
+                body = before + self.block(node.body[index + 1 :]) * limit
+            else:
+                body = self.block(node.body) * self.bound(node.iter)
+            return self.expr(node.iter) + body + self.block(node.orelse)
+        if isinstance(node, ast.While):
+            loop = self.expr(node.test) + self.block(node.body)
+            return self.expr(node.test) + loop * {(f"while@{node.lineno}",): 1}
+        if isinstance(node, ast.Try):
+            handlers = self.block(node.orelse)
+            for handler in node.handlers:
+                handlers = handlers.max(self.block(handler.body))
+            return self.block(node.body) + handlers + self.block(node.finalbody)
+        if isinstance(node, ast.With):
+            items = Cost()
+            for item in node.items:
+                items = items + self.expr(item.context_expr)
+            return items + self.block(node.body)
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            return Cost()
+        if isinstance(node, ast.Assign):
+            cost = self.expr(node.value)
+            for target in node.targets:
+                cost = cost + self._assign(target, node.value)
+            return cost
+
+        cost = Cost()
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.expr):
+                cost = cost + self.expr(child)
+        return cost
+
+    def _counted_break(self, node: ast.For) -> Optional[Tuple[int, Poly]]:
+        """
+        Returns the index of an `if i == limit: break` in the body of a loop
+        over a `range`, and the limit, when `i` counts the iterations from 0:
+        it's the loop variable of a `range(limit)`, or is assigned
+        `variable - start` in the body of a loop over `range(start, stop)`.
+        """
+
+        iterable, target = node.iter, node.target
+        if not (
+            isinstance(iterable, ast.Call)
+            and isinstance(iterable.func, ast.Name)
+            and iterable.func.id == "range"
+            and len(iterable.args) in (1, 2)
+            and isinstance(target, ast.Name)
+        ):
+            return None
+
+        counters = {target.id} if len(iterable.args) == 1 else set()
+        for index, stmt in enumerate(node.body):
+            if (
+                isinstance(stmt, ast.Assign)
+                and len(stmt.targets) == 1
+                and isinstance(stmt.targets[0], ast.Name)
+                and isinstance(value := stmt.value, ast.BinOp)
+                and isinstance(value.op, ast.Sub)
+                and isinstance(value.left, ast.Name)
+                and value.left.id == target.id
+                and len(iterable.args) == 2
+                and ast.dump(value.right) == ast.dump(iterable.args[0])
+            ):
+                counters.add(stmt.targets[0].id)
+            elif (
+                isinstance(stmt, ast.If)
+                and not stmt.orelse
+                and len(stmt.body) == 1
+                and isinstance(stmt.body[0], ast.Break)
+                and isinstance(test := stmt.test, ast.Compare)
+                and len(test.ops) == 1
+                and isinstance(test.ops[0], (ast.Eq, ast.GtE))
+                and isinstance(test.left, ast.Name)
+                and test.left.id in counters
+            ):
+                return index, self.count(test.comparators[0])
+        return None
+
+    def _assign(self, target: ast.expr, value: Optional[ast.expr]) -> Cost:
+        """Records the assigned locals and returns the cost of the target"""
+
+        if isinstance(target, ast.Name):
+            self.locals[target.id] = value
+            return Cost()
+        if isinstance(target, (ast.Tuple, ast.List)):
+            for elt in target.elts:
+                self._assign(elt, None)
+            return Cost()
+        return self.expr(target)
+
+    def expr(self, node: Optional[ast.expr]) -> Cost:
+        if node is None or isinstance(node, ast.Lambda):
+            return Cost()
+        if isinstance(node, ast.IfExp):
+            branches = self.expr(node.body).max(self.expr(node.orelse))
+            return self.expr(node.test) + branches
+        if isinstance(
+            node, (ast.ListComp, ast.SetComp, ast.GeneratorExp, ast.DictComp)
+        ):
+            return self._comprehension(node)
+
+        cost = Cost()
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.expr):
+                cost = cost + self.expr(child)
+        if isinstance(node, ast.Call):
+            cost = cost + self.call(node)
+        return cost
+
+    def _comprehension(
+        self, node: ast.ListComp | ast.SetComp | ast.GeneratorExp | ast.DictComp
+    ) -> Cost:
+        for generator in node.generators:
+            self._assign(generator.target, None)
+        if isinstance(node, ast.DictComp):
+            cost = self.expr(node.key) + self.expr(node.value)
+        else:
+            cost = self.expr(node.elt)
+        # the inner loops run for every iteration of the outer ones
+        for generator in reversed(node.generators):
+            for condition in generator.ifs:
+                cost = self.expr(condition) + cost
+            cost = self.expr(generator.iter) + cost * self.bound(generator.iter)
+        return cost
+
+    def call(self, node: ast.Call) -> Cost:
+        func = node.func
+        if isinstance(func, ast.Attribute):
+            owner = func.value
+            if (
+                isinstance(owner, ast.Name)
+                and owner.id in FL_MODULES
+                and owner.id not in self.locals
+            ):
+                return Cost.api_call(f"{owner.id}.{func.attr}")
+            cls = self._class_of(owner)
+            if cls is None:
+                return Cost()  # a method of a builtin type
+            method = self.analyzer.method(cls, func.attr)
+            if method is not None:
+                return self.analyzer.cost(method)
+            if func.attr in self.analyzer.attributes[cls]:
+                # a callable stored in an attribute
+                return self._dynamic(func)
+            return Cost()
+
+        if isinstance(func, ast.Name):
+            name = func.id
+            if name in self._class_args:
+                return Cost()  # constructs an enum member, like the other classes
+            if name in self.locals:
+                return self._dynamic(func)
+            if name in self.analyzer.functions:
+                return self.analyzer.cost(name)
+            if name in self.analyzer.classes:
+                init = self.analyzer.method(name, "__init__")
+                return Cost() if init is None else self.analyzer.cost(init)
+            return Cost()  # a builtin
+
+        return self._dynamic(func)
+
+    def _dynamic(self, func: ast.expr) -> Cost:
+        """
+        Returns the worst case cost of a call of a callable stored in a variable
+        or an attribute. The callables stored in an attribute of `self`, or in a
+        list of them (`self._setters[cc_num]`), are read from the live instance.
+        """
+
+        target = func.value if isinstance(func, ast.Subscript) else func
+        instance = self.analyzer.live.get(self.cls or "")
+        if (
+            instance is not None
+            and isinstance(target, ast.Attribute)
+            and isinstance(target.value, ast.Name)
+            and target.value.id == "self"
+        ):
+            value = getattr(instance, target.attr, None)
+            values = value if isinstance(value, (list, tuple)) else [value]
+            costs = [
+                self.analyzer.callable_cost(callee)
+                for callee in values
+                if callable(callee)
+            ]
+            if costs and None not in costs:
+                cost = Cost()
+                for callee_cost in costs:
+                    cost = cost.max(callee_cost)  # type: ignore[arg-type]
+                return cost
+
+        callee = ast.unparse(func)
+        self.analyzer.dynamic[self.qualname].add(callee)
+        return Cost(unresolved=frozenset({f"{self.qualname}: {callee}"}))
+
+    def _class_of(self, node: ast.expr) -> Optional[str]:
+        analyzer = self.analyzer
+        if isinstance(node, ast.Name):
+            if node.id == "self":
+                return self.cls
+            if node.id in self.locals:
+                return None
+            if node.id in analyzer.classes:
+                return node.id
+            cls = analyzer.instances.get(node.id)
+            return cls if cls in analyzer.classes else None
+        if isinstance(node, ast.Attribute):
+            owner = self._class_of(node.value)
+            if owner is None:
+                return None
+            cls = analyzer.attributes[owner].get(node.attr)
+            return cls if cls in analyzer.classes else None
+        return None
+
+    def bound(self, node: ast.expr) -> Poly:
+        """Returns the number of iterations over an iterable"""
+
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+            name, args = node.func.id, node.args
+            if name == "range" and args and not node.keywords:
+                if len(args) == 1:
+                    return self.count(args[0])
+                values = [self.analyzer.constant(arg, set(self.locals)) for arg in args]
+                if UNKNOWN not in values and not self._symbolic(args):
+                    return {(): len(range(*values))} if len(range(*values)) else {}
+                # the start is never negative in the script
+                return self.count(args[1])
+            if name in ("enumerate", "reversed", "sorted", "list", "tuple", "zip"):
+                if args:
+                    return self.bound(args[0])
+
+        if isinstance(node, (ast.Tuple, ast.List, ast.Set)) and not any(
+            isinstance(elt, ast.Starred) for elt in node.elts
+        ):
+            return {(): len(node.elts)} if node.elts else {}
+
+        value = self.analyzer.constant(node, set(self.locals))
+        if isinstance(value, tuple):
+            return {(): len(value)} if value else {}
+
+        if isinstance(node, ast.Name) and self._bounding_local(node.id):
+            try:
+                return self.bound(self.locals[node.id])  # type: ignore[arg-type]
+            finally:
+                self._bounding.discard(node.id)
+        return {(f"len({ast.unparse(node)})",): 1}
+
+    def count(self, node: ast.expr) -> Poly:
+        """Returns an upper bound of an integer expression"""
+
+        if isinstance(node, ast.Name):
+            if node.id in SYMBOLS and node.id not in self.locals:
+                return {(node.id,): 1}
+            if self._bounding_local(node.id):
+                try:
+                    return self.count(self.locals[node.id])  # type: ignore[arg-type]
+                finally:
+                    self._bounding.discard(node.id)
+
+        if isinstance(node, ast.Call):
+            func = node.func
+            if (
+                isinstance(func, ast.Attribute)
+                and isinstance(func.value, ast.Name)
+                and f"{func.value.id}.{func.attr}" in COUNT_CALLS
+            ):
+                return {(f"{func.attr}()",): 1}
+            if isinstance(func, ast.Name) and func.id == "len" and node.args:
+                return self.bound(node.args[0])
+            if isinstance(func, ast.Name) and func.id == "min" and node.args:
+                bounds = [self.count(arg) for arg in node.args]
+                # the bound with the fewest symbols, e.g. the constant one
+                return min(bounds, key=lambda poly: (max(map(len, poly), default=0)))
+
+        if isinstance(node, ast.BinOp):
+            if isinstance(node.op, ast.Add):
+                return _add(self.count(node.left), self.count(node.right))
+            if isinstance(node.op, ast.Mult):
+                return _mul(self.count(node.left), self.count(node.right))
+            if isinstance(node.op, (ast.Sub, ast.FloorDiv)):
+                value = self.analyzer.constant(node, set(self.locals))
+                if value is UNKNOWN:
+                    return self.count(node.left)
+
+        value = self.analyzer.constant(node, set(self.locals))
+        if isinstance(value, int):
+            return {(): value} if value > 0 else {}
+        return {(ast.unparse(node),): 1}
+
+    def _symbolic(self, nodes: List[ast.expr]) -> bool:
+        """Indicates whether the expressions use a constant kept as a symbol"""
+
+        return any(
+            isinstance(child, ast.Name)
+            and child.id in SYMBOLS
+            and child.id not in self.locals
+            for node in nodes
+            for child in ast.walk(node)
+        )
+
+    def _bounding_local(self, name: str) -> bool:
+        """Indicates whether a local has a known value, which isn't being bounded already"""
+
+        if self.locals.get(name) is None or name in self._bounding:
+            return False
+        self._bounding.add(name)
+        return True
+
+
+@dataclass
+class EntryPoint:
+    key: str
+    """FL Studio callback, and handler for control changes"""
+
+    controls: List[str]
+    """Names of the controls dispatched to the handler"""
+
+    functions: List[str]
+    """Qualified names of the functions run by the callback"""
+
+    dispatches: List[str] = field(default_factory=list)
+    """Unresolved calls of the first function, as `function: callee`, which run the others"""
+
+
+def _live_controller() -> Any:
+    """Returns a `Controller` created against the simulated API"""
+
+    FLSim().install()
+    return import_src("controller").Controller()
+
+
+def _live_instances(controller: Any, classes: Collection[str]) -> Dict[str, object]:
+    """Returns the controller and the instances of `src/` classes it holds, by class"""
+
+    instances: Dict[str, object] = {"Controller": controller}
+    for value in vars(controller).values():
+        cls = type(value).__name__
+        if cls in classes:
+            instances.setdefault(cls, value)
+    return instances
+
+
+def _entry_points(controller: Any) -> List[EntryPoint]:
+    """Reads the dispatch tables of a live `Controller`"""
+
+    CC = import_src("controls").CC
+
+    def name(cc: int) -> str:
+        return CC(cc).name if cc in CC._value2member_map_ else str(cc)
+
+    entries = [
+        EntryPoint("OnInit", [], ["Controller.on_init"]),
+        EntryPoint("OnDeInit", [], ["Controller.on_de_init"]),
+        EntryPoint("OnRefresh", [], ["Controller.on_refresh"]),
+        EntryPoint(
+            "OnIdle",
+            [],
+            ["Controller.on_idle"]
+            + [sync.__qualname__ for _, sync in controller._scheduler._syncs],
+            ["RefreshScheduler.drain: sync"],
+        ),
+        EntryPoint("OnNoteOn", [], ["Controller.on_note_on"]),
+    ]
+
+    layers = (
+        ("", controller._cc_handlers, [None] * len(controller._cc_handlers)),
+        ("SHIFT+", controller._shift_cc_handlers, controller._cc_handlers),
+    )
+    for prefix, handlers, unshifted in layers:
+        by_handler: Dict[str, EntryPoint] = {}
+        for cc, handler in enumerate(handlers):
+            if handler is None or handler == unshifted[cc]:
+                continue
+            qualname = handler.__qualname__
+            entry = by_handler.get(qualname)
+            if entry is None:
+                key = f"OnControlChange {prefix}{qualname.rpartition('.')[2]}"
+                functions = ["Controller.on_control_change", qualname]
+                dispatches = ["Controller.on_control_change: handler"]
+                entry = EntryPoint(key, [], functions, dispatches)
+                by_handler[qualname] = entry
+                entries.append(entry)
+            entry.controls.append(name(cc))
+    return entries
+
+
+def _commit() -> str:
+    return subprocess.run(
+        ["git", "rev-parse", "--short", "HEAD"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    ).stdout.strip()
+
+
+def _dump(poly: Poly) -> List[Tuple[List[str], int]]:
+    return [(list(term), coefficient) for term, coefficient in sorted(poly.items())]
+
+
+def _load(dumped: List[Tuple[List[str], int]]) -> Poly:
+    return {tuple(term): coefficient for term, coefficient in dumped}
+
+
+def _symbols(poly: Poly) -> Set[str]:
+    return {symbol for term in poly for symbol in term}
+
+
+def _compare(
+    results: Dict[str, Dict[str, Poly]],
+    baseline: Dict[str, Dict[str, Poly]],
+    values: Dict[str, int],
+    default: int,
+) -> List[str]:
+    """Returns a description of every entry point that got more expensive"""
+
+    regressions: List[str] = []
+    for key, costs in results.items():
+        before = baseline.get(key)
+        if before is None:
+            continue
+        for metric, poly in costs.items():
+            old, new = before[metric], poly
+            for symbol in sorted(_symbols(new) - _symbols(old)):
+                regressions.append(f"{key}: {metric} now scales with {symbol}")
+            if _evaluate(new, values, default) > _evaluate(old, values, default):
+                regressions.append(f"{key}: {metric} {_format(old)} -> {_format(new)}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "-c",
+        "--channels",
+        type=int,
+        default=1000,
+        help="Value of channelCount() (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-p",
+        "--patterns",
+        type=int,
+        default=999,
+        help="Value of patternCount() (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--loop-bound",
+        type=int,
+        default=16,
+        help="Iterations of the other loops (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        help="Also print the worst case of every FL API function, and the calls that "
+        "couldn't be resolved",
+    )
+    parser.add_argument(
+        "-o", "--output", type=Path, default=None, help="Write the results as JSON"
+    )
+    parser.add_argument(
+        "-b",
+        "--baseline",
+        type=Path,
+        default=None,
+        help="JSON results of an earlier run to compare against",
+    )
+    parser.add_argument(
+        "--max-calls",
+        type=int,
+        default=None,
+        help="Fail when an entry point can make more FL API calls",
+    )
+    parser.add_argument(
+        "--max-messages",
+        type=int,
+        default=None,
+        help="Fail when an entry point can send more messages",
+    )
+    args = parser.parse_args()
+
+    analyzer = CostAnalyzer(SRC)
+    values = {
+        "NOTES_COUNT": analyzer.constant(ast.Name("NOTES_COUNT")),
+        "CC_COUNT": analyzer.constant(ast.Name("CC_COUNT")),
+        "channelCount()": args.channels,
+        "patternCount()": args.patterns,
+    }
+
+    controller = _live_controller()
+    analyzer.live = _live_instances(controller, analyzer.classes)
+    rows: List[Tuple[EntryPoint, Cost]] = []
+    for entry in _entry_points(controller):
+        cost = Cost()
+        for function in entry.functions:
+            cost = cost + analyzer.cost(function)
+        rows.append((entry, cost))
+
+    def worst(cost: Cost) -> Tuple[int, int]:
+        return (
+            _evaluate(cost.api, values, args.loop_bound),
+            _evaluate(cost.out, values, args.loop_bound),
+        )
+
+    rows.sort(key=lambda row: worst(row[1]), reverse=True)
+
+    labels = [entry.key for entry, _ in rows]
+    for i, (entry, _) in enumerate(rows):
+        if entry.controls:
+            more = len(entry.controls) - 1
+            labels[i] += f" ({entry.controls[0]}{f' +{more}' if more else ''})"
+    width = max(map(len, labels)) + 2
+
+    print(f"{'entry point':<{width}}{'calls':>7}{'msgs':>7}  worst case FL API calls")
+    checked = (
+        args.baseline is not None
+        or args.max_calls is not None
+        or args.max_messages is not None
+    )
+    failures: List[str] = []
+    for label, (entry, cost) in zip(labels, rows):
+        calls, messages = worst(cost)
+        print(f"{label:<{width}}{calls:>7}{messages:>7}  {_format(cost.api)}")
+        if args.verbose:
+            for name, poly in sorted(
+                cost.calls.items(),
+                key=lambda item: -_evaluate(item[1], values, args.loop_bound),
+            ):
+                print(f"{'':<{width + 16}}{name}: {_format(poly)}")
+
+        if args.max_calls is not None and calls > args.max_calls:
+            failures.append(f"{entry.key}: {calls} calls over {args.max_calls}")
+        if args.max_messages is not None and messages > args.max_messages:
+            failures.append(
+                f"{entry.key}: {messages} messages over {args.max_messages}"
+            )
+        unresolved = cost.unresolved - set(entry.dispatches)
+        if checked and unresolved:
+            failures.append(f"{entry.key}: unresolved {', '.join(sorted(unresolved))}")
+
+    if args.verbose:
+        for qualname, callees in sorted(analyzer.dynamic.items()):
+            print(f"\nunresolved in {qualname}: {', '.join(sorted(callees))}")
+        for qualname in sorted(analyzer.recursive):
+            print(f"\nrecursive, counted once: {qualname}")
+
+    results = {
+        entry.key: {"api_calls": cost.api, "midi_out": cost.out} for entry, cost in rows
+    }
+    if args.output is not None:
+        meta = {
+            "commit": _commit(),
+            "channels": args.channels,
+            "patterns": args.patterns,
+            "loop_bound": args.loop_bound,
+        }
+        dumped = {
+            key: {metric: _dump(poly) for metric, poly in costs.items()}
+            for key, costs in results.items()
+        }
+        args.output.write_text(json.dumps({"meta": meta, "results": dumped}, indent=2))
+
+    if args.baseline is not None:
+        baseline = {
+            key: {metric: _load(poly) for metric, poly in costs.items()}
+            for key, costs in json.loads(args.baseline.read_text())["results"].items()
+        }
+        failures += _compare(results, baseline, values, args.loop_bound)
+
+    if failures:
+        print(
+            f"\nHOT SPOTS: {len(failures)} costs over budget, grown or unresolved",
+            file=sys.stderr,
+        )
+        for failure in failures:
+            print(f"  {failure}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.baseline is not None or args.max_calls or args.max_messages:
+        print("\nOK: no new hot spots")
+
+
+if __name__ == "__main__":
+    main()
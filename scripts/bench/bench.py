@@ -0,0 +1,484 @@
+"""
+Per-callback latency of the script entry points in realistic scenarios.
+
+Every scenario runs against the simulated FL Studio API for each project
+size. Wall time, FL API calls and MIDI messages sent are reported per entry
+point. Results can be saved as JSON (`-o`) and compared against a saved run
+(`--baseline`), exiting with an error on regression.
+
+The mixer and channel parameter writes of the knobs are counted too, to
+report how many of the knob values sent by the device reach FL Studio, and
+how many messages are sent back to the device for them.
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import types
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import midi
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from flsim import DIST, ROOT, FLSim, MidiMsg, import_src, load_dist
+
+CC = import_src("controls").CC
+
+type Event = Tuple[str, Any]
+"""Entry point name and its argument, or `None` for entry points without one"""
+
+CHANNEL_COUNTS = (16, 64, 256, 1000)
+
+# messages sent to the device, SysEx frames count as a single message
+OUTPUT_CALLS = ("device.midiOutMsg", "device.midiOutSysex")
+
+# entry points that are followed by the `OnRefresh` and `OnIdle` FL Studio sends afterwards
+INPUT_CALLBACKS = ("OnNoteOn", "OnControlChange")
+
+KNOBS = (CC.MIX_VOL, CC.MIX_PAN, CC.MIX_SS, CC.CHAN_VOL, CC.CHAN_PAN)
+
+# count increases per callback never taken as regressions, e.g. a value of a
+# knob applied a tick earlier by a slow run
+MIN_COUNT_DELTA = 0.01
+
+# FL Studio parameters written by the knobs, each one an undo step
+WRITE_CALLS = (
+    "mixer.setTrackVolume",
+    "mixer.setTrackPan",
+    "mixer.setTrackStereoSep",
+    "channels.setChannelVolume",
+    "channels.setChannelPan",
+)
+
+
+@dataclass
+class Scenario:
+    events: List[Event]
+    """Measured events"""
+
+    setup: List[Event] = field(default_factory=list)
+    """Events run once before the measured ones"""
+
+    inputs_per_tick: int = 1
+    """Input events FL Studio receives between two `OnIdle` ticks"""
+
+
+@dataclass
+class Stats:
+    samples: int
+    median_ns: float
+    p99_ns: float
+    api_calls: float
+    """Mean number of FL API calls per callback"""
+    midi_out: float
+    """Mean number of messages sent to the device per callback"""
+    writes: float
+    """Mean number of mixer and channel parameter writes per callback"""
+
+
+def _cc(control: int, value: int = 127) -> Event:
+    return ("OnControlChange", MidiMsg(midi.MIDI_CONTROLCHANGE, control, value))
+
+
+def _note(note: int, velocity: int) -> Event:
+    return ("OnNoteOn", MidiMsg(midi.MIDI_NOTEON, note, velocity))
+
+
+def _pad_roll() -> Scenario:
+    """16-pad finger drum roll in OMNI mode, every pad released after the next hit"""
+
+    events: List[Event] = []
+    for bar in range(4):
+        for pad in range(16):
+            events.append(_note(pad, 64 + (pad * 7 + bar * 13) % 64))
+            events.append(_note((pad - 1) % 16, 0))
+    return Scenario(events)
+
+
+def _chord_progression() -> Scenario:
+    """I-V-vi-IV progression in CHORDS mode, played legato"""
+
+    events: List[Event] = []
+    previous = None
+    for _ in range(8):
+        for pad in (0, 4, 5, 3):
+            events.append(_note(pad, 100))
+            if previous is not None:
+                events.append(_note(previous, 0))
+            previous = pad
+    events.append(_note(previous, 0))
+    return Scenario(events, setup=[_cc(CC.CHORDS_MODE)])
+
+
+def _sweep(control: int) -> List[Event]:
+    values = list(range(0, 128, 2)) + list(range(127, -1, -2))
+    return [_cc(control, value) for value in values]
+
+
+def _touch_strip_sweep() -> Scenario:
+    """Touch strip sweeps in TRANSPORT and PITCH mode"""
+
+    events = _sweep(CC.TOUCH_STRIP)
+    events.append(_cc(CC.TOUCH_STRIP_PITCH))
+    events += _sweep(CC.TOUCH_STRIP)
+    events.append(_cc(CC.TOUCH_STRIP_PITCH))
+    return Scenario(events)
+
+
+def _mix_vol_sweep() -> Scenario:
+    """`MIX_VOL` knob turned all the way up and down"""
+
+    return Scenario(_sweep(CC.MIX_VOL) * 2)
+
+
+def _knob_twist() -> Scenario:
+    """Fast twists of the mixer and channel knobs, several values per `OnIdle` tick"""
+
+    events: List[Event] = []
+    for control in KNOBS:
+        events += _sweep(control)
+    return Scenario(events, inputs_per_tick=8)
+
+
+def _refresh_storm() -> Scenario:
+    """Bursts of `OnRefresh` during playback, with an `OnIdle` tick after each burst"""
+
+    flags = (
+        midi.HW_Dirty_LEDs,
+        midi.HW_Dirty_Mixer_Controls | midi.HW_Dirty_LEDs,
+        midi.HW_Dirty_ControlValues,
+        midi.HW_ChannelEvent | midi.HW_Dirty_LEDs,
+        midi.HW_Dirty_Patterns,
+        midi.HW_Dirty_LEDs,
+        midi.HW_Dirty_Mixer_Sel,
+        midi.HW_Dirty_LEDs,
+    )
+    events: List[Event] = []
+    for _ in range(32):
+        events += [("OnRefresh", flag) for flag in flags]
+        events.append(("OnIdle", None))
+    return Scenario(events, setup=[_cc(CC.PLAY)])
+
+
+SCENARIOS: Dict[str, Callable[[], Scenario]] = {
+    "pad roll": _pad_roll,
+    "chords": _chord_progression,
+    "touch strip": _touch_strip_sweep,
+    "mix vol": _mix_vol_sweep,
+    "knob twist": _knob_twist,
+    "refresh storm": _refresh_storm,
+}
+
+
+class Runner:
+    """Runs events against a script and collects per-callback samples"""
+
+    def __init__(self, sim: FLSim, script: types.ModuleType) -> None:
+        self.sim = sim
+        self.script = script
+        self.timings: Dict[str, List[int]] = defaultdict(list)
+        self.api_calls: Dict[str, int] = defaultdict(int)
+        self.midi_out: Dict[str, int] = defaultdict(int)
+        self.writes: Dict[str, int] = defaultdict(int)
+
+    def run(
+        self, events: List[Event], inputs_per_tick: int = 1, record: bool = True
+    ) -> None:
+        inputs = 0
+        for name, arg in events:
+            self._call(name, arg, record)
+            if name in INPUT_CALLBACKS:
+                # FL Studio reports the changes made by the script, then keeps idling
+                if self.sim.dirty:
+                    flags, self.sim.dirty = self.sim.dirty, 0
+                    self._call("OnRefresh", flags, record)
+                inputs += 1
+                if inputs % inputs_per_tick == 0:
+                    self._call("OnIdle", None, record)
+        if inputs % inputs_per_tick:
+            self._call("OnIdle", None, record)
+
+    def _call(self, name: str, arg: Any, record: bool) -> None:
+        callback = getattr(self.script, name, None)
+        if callback is None:
+            return  # older revisions have no `OnIdle`
+
+        calls = self.sim.recorder.calls
+        api_before = self.sim.recorder.total()
+        out_before = sum(calls[call] for call in OUTPUT_CALLS)
+        writes_before = sum(calls[call] for call in WRITE_CALLS)
+
+        if arg is None:
+            start = time.perf_counter_ns()
+            callback()
+            elapsed = time.perf_counter_ns() - start
+        else:
+            start = time.perf_counter_ns()
+            callback(arg)
+            elapsed = time.perf_counter_ns() - start
+
+        if record:
+            self.timings[name].append(elapsed)
+            self.api_calls[name] += self.sim.recorder.total() - api_before
+            self.midi_out[name] += (
+                sum(calls[call] for call in OUTPUT_CALLS) - out_before
+            )
+            self.writes[name] += (
+                sum(calls[call] for call in WRITE_CALLS) - writes_before
+            )
+
+    def stats(self) -> Dict[str, Stats]:
+        stats: Dict[str, Stats] = {}
+        for name, timings in self.timings.items():
+            count = len(timings)
+            p99 = statistics.quantiles(timings, n=100)[98] if count > 1 else timings[0]
+            stats[name] = Stats(
+                samples=count,
+                median_ns=statistics.median(timings),
+                p99_ns=p99,
+                api_calls=self.api_calls[name] / count,
+                midi_out=self.midi_out[name] / count,
+                writes=self.writes[name] / count,
+            )
+        return stats
+
+
+def _load(dist: Optional[Path], rev: Optional[str]) -> types.ModuleType:
+    return load_dist(dist) if dist else import_src("main", rev)
+
+
+def _bench(
+    scenario: Scenario,
+    channels: int,
+    repeats: int,
+    dist: Optional[Path],
+    rev: Optional[str],
+) -> Dict[str, Stats]:
+    sim = FLSim(channels=channels).install()
+    script = _load(dist, rev)
+    runner = Runner(sim, script)
+
+    script.OnInit()
+    runner.run(scenario.setup, record=False)
+    runner.run(scenario.events, scenario.inputs_per_tick, record=False)  # warm up
+    for _ in range(repeats):
+        runner.run(scenario.events, scenario.inputs_per_tick)
+    script.OnDeInit()
+
+    return runner.stats()
+
+
+def _commit() -> str:
+    return subprocess.run(
+        ["git", "rev-parse", "--short", "HEAD"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    ).stdout.strip()
+
+
+def _compare(
+    results: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    tolerance: float,
+    p99_tolerance: float,
+    min_delta_ns: float,
+    count_tolerance: float,
+) -> List[str]:
+    """Returns a description of every regression against the baseline"""
+
+    regressions: List[str] = []
+    for key, stats in results.items():
+        before = baseline.get(key)
+        if before is None:
+            continue
+
+        for metric, allowed in (("median_ns", tolerance), ("p99_ns", p99_tolerance)):
+            delta = stats[metric] - before[metric]
+            if delta > min_delta_ns and delta > before[metric] * allowed:
+                regressions.append(
+                    f"{key}: {metric} {before[metric]:.0f} -> {stats[metric]:.0f}"
+                )
+
+        # the counts depend on the wall clock too: the knobs and the encoder are
+        # coalesced, the feedback held off and the syncs cut short by time
+        for metric in ("api_calls", "midi_out", "writes"):
+            # older baselines have no write counts
+            if metric not in before:
+                continue
+            delta = stats[metric] - before[metric]
+            if delta > MIN_COUNT_DELTA and delta > before[metric] * count_tolerance:
+                regressions.append(
+                    f"{key}: {metric} {before[metric]:.2f} -> {stats[metric]:.2f}"
+                )
+
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "-s",
+        "--scenario",
+        choices=SCENARIOS,
+        action="append",
+        default=None,
+        help="Scenario to run, can be repeated (default: all)",
+    )
+    parser.add_argument(
+        "-c",
+        "--channels",
+        type=int,
+        action="append",
+        default=None,
+        help=f"Project size to run, can be repeated (default: {CHANNEL_COUNTS})",
+    )
+    parser.add_argument(
+        "-r",
+        "--repeats",
+        type=int,
+        default=5,
+        help="Number of measured runs of every scenario",
+    )
+    parser.add_argument(
+        "--dist",
+        type=Path,
+        nargs="?",
+        const=DIST,
+        default=None,
+        help="Run the built script instead of src/ (default: %(const)s)",
+    )
+    parser.add_argument(
+        "--against",
+        type=str,
+        default=None,
+        help="Git revision of src/ to run instead of the working tree",
+    )
+    parser.add_argument(
+        "-o", "--output", type=Path, default=None, help="Write the results as JSON"
+    )
+    parser.add_argument(
+        "-b",
+        "--baseline",
+        type=Path,
+        default=None,
+        help="JSON results of an earlier run to compare against",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Allowed relative increase of the median time",
+    )
+    parser.add_argument(
+        "--p99-tolerance",
+        type=float,
+        default=0.5,
+        help="Allowed relative increase of the p99 time",
+    )
+    parser.add_argument(
+        "--min-delta",
+        type=float,
+        default=1000,
+        help="Time increases below this many nanoseconds are never regressions",
+    )
+    parser.add_argument(
+        "--count-tolerance",
+        type=float,
+        default=0.05,
+        help="Allowed relative increase of the FL API calls, messages and writes",
+    )
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text())["results"]
+
+    results: Dict[str, Dict[str, Any]] = {}
+    write_reports: List[str] = []
+    print(
+        f"{'scenario':<15}{'channels':>9}  {'callback':<16}{'samples':>8}"
+        f"{'median µs':>11}{'p99 µs':>9}{'api/cb':>8}{'out/cb':>8}{'change':>8}"
+    )
+    for name in args.scenario or SCENARIOS:
+        scenario = SCENARIOS[name]()
+        for channels in args.channels or CHANNEL_COUNTS:
+            stats = _bench(scenario, channels, args.repeats, args.dist, args.against)
+            for callback, entry in stats.items():
+                key = f"{name}/{channels}/{callback}"
+                results[key] = asdict(entry)
+
+                change = ""
+                if baseline is not None and key in baseline:
+                    before = baseline[key]["median_ns"]
+                    change = f"{(entry.median_ns - before) / before * 100:+.0f}%"
+
+                print(
+                    f"{name:<15}{channels:>9}  {callback:<16}{entry.samples:>8}"
+                    f"{entry.median_ns / 1e3:>11.2f}{entry.p99_ns / 1e3:>9.2f}"
+                    f"{entry.api_calls:>8.1f}{entry.midi_out:>8.1f}{change:>8}"
+                )
+
+            knob_values = args.repeats * sum(
+                1
+                for callback, msg in scenario.events
+                if callback == "OnControlChange" and msg.controlNum in KNOBS
+            )
+            if knob_values:
+                writes = round(sum(s.samples * s.writes for s in stats.values()))
+                feedback = round(sum(s.samples * s.midi_out for s in stats.values()))
+                write_reports.append(
+                    f"{name:<15}{channels:>9}  {knob_values:>12}{writes:>8}"
+                    f"{(writes - knob_values) / knob_values * 100:>+8.0f}%"
+                    f"{feedback:>10}"
+                )
+
+    if write_reports:
+        print(
+            f"\n{'scenario':<15}{'channels':>9}  {'knob values':>12}{'writes':>8}"
+            f"{'change':>9}{'feedback':>10}"
+        )
+        print("\n".join(write_reports))
+
+    if args.output is not None:
+        source = str(args.dist) if args.dist else args.against or "src"
+        meta = {
+            "commit": _commit(),
+            "source": source,
+            "python": platform.python_version(),
+            "repeats": args.repeats,
+        }
+        args.output.write_text(json.dumps({"meta": meta, "results": results}, indent=2))
+
+    if baseline is None:
+        return
+
+    regressions = _compare(
+        results,
+        baseline,
+        args.tolerance,
+        args.p99_tolerance,
+        args.min_delta,
+        args.count_tolerance,
+    )
+    if regressions:
+        print(f"\nREGRESSION: {len(regressions)} metrics got worse", file=sys.stderr)
+        for regression in regressions:
+            print(f"  {regression}", file=sys.stderr)
+        sys.exit(1)
+
+    print("\nOK: no regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
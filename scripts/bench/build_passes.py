@@ -0,0 +1,111 @@
+"""Compare separate and fused AST pass traversals of the build on an enlarged source tree"""
+
+import argparse
+import ast
+import copy
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+BUILD = Path(__file__).resolve().parents[1] / "build"
+sys.path.insert(0, str(BUILD))
+
+from ast_tools import *
+from config import cfg
+
+type Build = Callable[[List[ast.Module]], str]
+
+
+def _parse_modules(scale: int) -> List[ast.Module]:
+    """Parses every module of the build `scale` times, as if the tree was that large"""
+
+    sources = [(cfg.SRC / f"{mod}.py").read_text() for mod in cfg.MODULES]
+    return [ast.parse(source) for _ in range(scale) for source in sources]
+
+
+def _transforms(consts: dict, enums: dict) -> List[Pass]:
+    return [
+        ProfilerRemover(),
+        AllRemover(),
+        FlMidiMsgRemover(),
+        DocstringRemover(),
+        ConstInliner(consts),
+        ConstRemover(consts),
+        EnumInliner(enums),
+    ]
+
+
+def _separate(trees: List[ast.Module]) -> str:
+    """The build as it ran before the pass manager: one traversal per visitor"""
+
+    body, imports = BodyCollector(), ImportsCollector()
+    consts, enums = ConstCollector(), EnumCollector()
+    for tree in trees:
+        for collector in (body, imports, consts, enums):
+            collector.visit(tree)
+
+    tree: ast.AST = body.body
+    for transform in _transforms(consts.consts, enums.enums):
+        tree = transform.visit(tree)  # type: ignore[attr-defined]
+    return ast.unparse(tree)
+
+
+def _fused(trees: List[ast.Module]) -> str:
+    body, imports = BodyCollector(), ImportsCollector()
+    consts, enums = ConstCollector(), EnumCollector()
+    collectors = PassManager([body, imports, consts, enums])
+    for tree in trees:
+        collectors.run(tree)
+
+    transforms = PassManager(_transforms(consts.consts, enums.enums))
+    return ast.unparse(transforms.run(body.body))
+
+
+def _measure(build: Build, trees: List[ast.Module], rounds: int) -> Tuple[float, str]:
+    """Returns the median time in ms of the collect and transform steps, and the output"""
+
+    timings = []
+    output = ""
+    for _ in range(rounds):
+        # transforms modify the trees in place
+        fresh = copy.deepcopy(trees)
+        start = time.perf_counter()
+        output = build(fresh)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1e3, output
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "-s",
+        "--scale",
+        type=int,
+        action="append",
+        default=None,
+        help="Number of copies of the source tree, can be repeated (default: 1, 4, 16)",
+    )
+    parser.add_argument(
+        "-r", "--rounds", type=int, default=5, help="Rounds per measurement"
+    )
+    args = parser.parse_args()
+
+    cfg.SRC = BUILD.parents[1] / "src"
+
+    print(f"{'scale':>6}{'separate ms':>14}{'fused ms':>12}{'speedup':>10}")
+    for scale in args.scale or (1, 4, 16):
+        trees = _parse_modules(scale)
+        separate_ms, expected = _measure(_separate, trees, args.rounds)
+        fused_ms, output = _measure(_fused, trees, args.rounds)
+        if output != expected:
+            sys.exit(f"fused output differs from the separate passes at scale {scale}")
+        print(
+            f"{scale:>6}{separate_ms:>14.1f}{fused_ms:>12.1f}"
+            f"{separate_ms / fused_ms:>9.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Measure the per-CC cost of `Controller.on_control_change`"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from flsim import FLSim, MidiMsg, import_src
+
+FLSim().install()
+
+CC = import_src("controls").CC
+
+# a typical value: clockwise encoder detent, pressed button, centered knob
+CC_VALUE = 65
+
+
+def _measure(controller_cls: type, cc: int, repeats: int, rounds: int) -> float:
+    """Returns the median cost of a single dispatch in nanoseconds"""
+
+    timings = []
+    for _ in range(rounds):
+        controller = controller_cls()
+        msg = MidiMsg(0xB0, cc, CC_VALUE)
+        on_control_change = controller.on_control_change
+
+        start = time.perf_counter_ns()
+        for _ in range(repeats):
+            on_control_change(msg)
+        timings.append((time.perf_counter_ns() - start) / repeats)
+
+    return statistics.median(timings)
+
+
+def _measure_all(rev: Optional[str], repeats: int, rounds: int) -> Dict[CC, float]:
+    controller_cls = import_src("controller", rev).Controller
+    return {cc: _measure(controller_cls, cc, repeats, rounds) for cc in CC}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--against",
+        type=str,
+        default=None,
+        help="Git revision of src/ to compare the working tree against",
+    )
+    parser.add_argument(
+        "-n",
+        "--repeats",
+        type=int,
+        default=2000,
+        help="Number of dispatches per round",
+    )
+    parser.add_argument(
+        "-r",
+        "--rounds",
+        type=int,
+        default=5,
+        help="Number of rounds per CC, the median is reported",
+    )
+    args = parser.parse_args()
+
+    before = None
+    if args.against is not None:
+        before = _measure_all(args.against, args.repeats, args.rounds)
+    after = _measure_all(None, args.repeats, args.rounds)
+
+    if before is None:
+        print(f"{'CC':<22}{'ns':>10}")
+        for cc, ns in after.items():
+            print(f"{cc.name:<22}{ns:>10.0f}")
+        return
+
+    print(f"{'CC':<22}{args.against:>10}{'working':>10}{'change':>10}")
+    for cc, ns in after.items():
+        change = (ns - before[cc]) / before[cc] * 100
+        print(f"{cc.name:<22}{before[cc]:>10.0f}{ns:>10.0f}{change:>9.0f}%")
+
+    total_before, total_after = sum(before.values()), sum(after.values())
+    change = (total_after - total_before) / total_before * 100
+    print(f"{'TOTAL':<22}{total_before:>10.0f}{total_after:>10.0f}{change:>9.0f}%")
+
+
+if __name__ == "__main__":
+    main()
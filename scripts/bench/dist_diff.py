@@ -0,0 +1,216 @@
+"""
+Differential test of the built script.
+
+Replays the same event stream through the sources from `src/` and the built
+script, and checks that both make the same FL Studio API calls with the same
+arguments, handle the same messages and leave the project in the same state.
+The stream is generated from a seed, or replayed from a file saved with
+`--record`. Exits with an error on the first difference.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import random
+import sys
+import time
+import types
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+import midi
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from flsim import DIST, FLSim, import_src, load_dist
+
+type Event = Tuple[str, int, int]
+"""`("cc", control, value)`, `("note", note, velocity)`, `("refresh", flags, 0)` or `("idle", 0, 0)`"""
+
+type Call = Tuple[str, Tuple[Any, ...]]
+
+type Observation = Tuple[Optional[bool], List[Call]]
+"""Whether the message was handled, and the API calls made, for every event"""
+
+REFRESH_FLAGS = (
+    midi.HW_Dirty_LEDs,
+    midi.HW_Dirty_Mixer_Controls,
+    midi.HW_Dirty_Mixer_Sel,
+    midi.HW_Dirty_ControlValues,
+    midi.HW_Dirty_Patterns,
+    midi.HW_ChannelEvent,
+)
+
+
+def _events(CC: type, seed: int, count: int) -> List[Event]:
+    """Pad hits, held pads, buttons, knobs, SHIFT combos, refreshes and idle ticks"""
+
+    rng = random.Random(seed)
+    controls = [int(control) for control in CC]
+    held: Set[int] = set()
+    events: List[Event] = []
+
+    while len(events) < count:
+        kind = rng.random()
+        if kind < 0.35:
+            pad = rng.randrange(16)
+            events.append(("note", pad, rng.randrange(1, 128)))
+            if rng.random() < 0.7:
+                events.append(("note", pad, 0))
+            else:
+                held.add(pad)
+        elif kind < 0.45 and held:
+            pad = rng.choice(sorted(held))
+            held.discard(pad)
+            events.append(("note", pad, 0))
+        elif kind < 0.8:
+            value = rng.choice((0, 127, 63, 65, rng.randrange(128)))
+            events.append(("cc", rng.choice(controls), value))
+        elif kind < 0.88:
+            pad = rng.randrange(16)
+            events += [
+                ("cc", int(CC.SHIFT), 127),
+                ("note", pad, 100),
+                ("note", pad, 0),
+                ("cc", int(CC.SHIFT), 0),
+            ]
+        elif kind < 0.95:
+            events.append(("refresh", rng.choice(REFRESH_FLAGS), 0))
+        else:
+            events.append(("idle", 0, 0))
+
+    events += [("note", pad, 0) for pad in sorted(held)]
+    return events
+
+
+@contextlib.contextmanager
+def _frozen_clock() -> Iterator[None]:
+    """Stops the clock, so time budgets never cut a run short in only one of the scripts"""
+
+    perf_counter_ns = time.perf_counter_ns
+    time.perf_counter_ns = lambda: 0
+    try:
+        yield
+    finally:
+        time.perf_counter_ns = perf_counter_ns
+
+
+def _run(
+    load: Callable[[], types.ModuleType], events: List[Event], channels: int
+) -> Tuple[List[Observation], Dict[str, Any]]:
+    """Returns what the script did for every event and the final project state"""
+
+    # pads and knobs select patterns and tracks by number, with the full 7-bit range
+    sim = FLSim(channels=channels, tracks=128, patterns=16).install()
+    script = load()
+    sim.recorder.start_trace()
+    trace = sim.recorder.trace
+    assert trace is not None
+
+    observations: List[Observation] = []
+    # the script output is only printed by the sources, e.g. the profiler report
+    with _frozen_clock(), contextlib.redirect_stdout(io.StringIO()):
+        script.OnInit()
+        observations.append((None, trace[:]))
+
+        for kind, data1, data2 in events:
+            start = len(trace)
+            handled = None
+            if kind == "cc":
+                handled = sim.control_change(script, data1, data2).handled
+            elif kind == "note":
+                handled = sim.note_on(script, data1, data2).handled
+            elif kind == "refresh":
+                sim.refresh(script, data1)
+            # FL Studio reports the changes made by the script, then keeps idling
+            sim.idle(script)
+            observations.append((handled, trace[start:]))
+
+        start = len(trace)
+        script.OnDeInit()
+        observations.append((None, trace[start:]))
+
+    return observations, asdict(sim.project)
+
+
+def _describe(index: int, events: List[Event]) -> str:
+    if index == 0:
+        return "OnInit"
+    if index > len(events):
+        return "OnDeInit"
+    kind, data1, data2 = events[index - 1]
+    return f"event {index - 1}: {kind} {data1} {data2}"
+
+
+def _compare(
+    events: List[Event],
+    src: Tuple[List[Observation], Dict[str, Any]],
+    dist: Tuple[List[Observation], Dict[str, Any]],
+) -> List[str]:
+    """Returns a description of the first difference, if any"""
+
+    for index, (expected, actual) in enumerate(zip(src[0], dist[0])):
+        if expected == actual:
+            continue
+        lines = [f"{_describe(index, events)} differs"]
+        if expected[0] != actual[0]:
+            lines.append(f"  handled: src {expected[0]}, dist {actual[0]}")
+        for label, (_, calls) in (("src", expected), ("dist", actual)):
+            lines.append(f"  {label}:")
+            lines += [f"    {name}{args}" for name, args in calls]
+        return lines
+
+    lines = []
+    for name, value in src[1].items():
+        if dist[1][name] != value:
+            lines.append(
+                f"project.{name} differs at the end: {value} != {dist[1][name]}"
+            )
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--dist", type=Path, default=DIST, help="Built script (default: %(default)s)"
+    )
+    parser.add_argument(
+        "-n", "--count", type=int, default=5000, help="Number of generated events"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the events")
+    parser.add_argument(
+        "-c", "--channels", type=int, default=32, help="Number of channels"
+    )
+    parser.add_argument(
+        "--events", type=Path, default=None, help="Replay the events of a JSON file"
+    )
+    parser.add_argument(
+        "--record", type=Path, default=None, help="Save the events as JSON"
+    )
+    args = parser.parse_args()
+
+    if args.events is not None:
+        events = [tuple(event) for event in json.loads(args.events.read_text())]
+    else:
+        events = _events(import_src("controls").CC, args.seed, args.count)
+    if args.record is not None:
+        args.record.write_text(json.dumps(events))
+
+    src = _run(lambda: import_src("main"), events, args.channels)  # type: ignore[arg-type]
+    dist = _run(lambda: load_dist(args.dist), events, args.channels)  # type: ignore[arg-type]
+
+    differences = _compare(events, src, dist)  # type: ignore[arg-type]
+    if differences:
+        print("\n".join(differences), file=sys.stderr)
+        sys.exit(1)
+
+    calls = sum(len(calls) for _, calls in src[0])
+    print(f"OK: {len(events)} events, {calls} API calls identical in src and dist")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Rapid spins of the 4D encoder in every encoder mode.
+
+The encoder is spun at a fixed number of detents per `OnIdle` tick (20 ms in
+FL Studio) until it reaches a target: scrolling down a 500 channel rack, the
+mixer track volume down to 5%, the swing up to 128 and the tempo up by 100
+BPM. The detents, time and FL API calls needed are reported, optionally
+against another git revision.
+"""
+
+import argparse
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import midi
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from flsim import FLSim, MidiMsg, Project, import_src
+
+CC = import_src("controls").CC
+
+TICK_MS = 20
+"""Time between two `OnIdle` ticks"""
+
+CHANNELS = 500
+
+MAX_DETENTS = 10_000
+"""Detents after which a spin gives up on its target"""
+
+CLOCKWISE = 65
+COUNTER_CLOCKWISE = 63
+
+
+@dataclass
+class Spin:
+    mode: Optional[int]
+    """Encoder mode button pressed before spinning, `None` for JOG"""
+
+    direction: int
+    focused: int
+    """Window focused while spinning"""
+
+    reached: Callable[[Project], bool]
+
+
+SPINS: Dict[str, Spin] = {
+    "jog 500 channels": Spin(
+        None,
+        CLOCKWISE,
+        midi.widChannelRack,
+        lambda project: project.jog_pos >= CHANNELS,
+    ),
+    "mixer volume to 5%": Spin(
+        CC.ENCODER_VOLUME,
+        COUNTER_CLOCKWISE,
+        midi.widMixer,
+        lambda project: project.tracks[project.selected_track].volume <= 0.05,
+    ),
+    "swing to 128": Spin(
+        CC.ENCODER_SWING,
+        CLOCKWISE,
+        midi.widMixer,
+        lambda project: project.rec_values.get(midi.REC_MainShuffle, 0) >= 128,
+    ),
+    "tempo +100 BPM": Spin(
+        CC.ENCODER_TEMPO,
+        CLOCKWISE,
+        midi.widMixer,
+        lambda project, start=Project.tempo: project.tempo >= start + 100,
+    ),
+}
+
+
+@dataclass
+class Result:
+    detents: int
+    ticks: int
+    api_calls: int
+    reached: bool
+
+
+def _spin(rev: Optional[str], spin: Spin, rate: int) -> Result:
+    sim = FLSim(channels=CHANNELS).install()
+    controller = import_src("controller", rev).Controller()
+    controller.on_init()
+    if spin.mode is not None:
+        controller.on_control_change(MidiMsg(midi.MIDI_CONTROLCHANGE, spin.mode, 127))
+    sim.project.focused = spin.focused
+    start = sim.recorder.total()
+
+    detents = ticks = 0
+    reached = False
+    while detents < MAX_DETENTS and not reached:
+        for _ in range(rate):
+            controller.on_control_change(
+                MidiMsg(midi.MIDI_CONTROLCHANGE, CC.ENCODER_TURN, spin.direction)
+            )
+            detents += 1
+            reached = spin.reached(sim.project)
+            if reached:
+                break
+        controller.on_idle()
+        ticks += 1
+        reached = spin.reached(sim.project)
+
+    return Result(detents, ticks, sim.recorder.total() - start, reached)
+
+
+def _spin_all(rev: Optional[str], rate: int) -> Dict[str, Result]:
+    return {name: _spin(rev, spin, rate) for name, spin in SPINS.items()}
+
+
+def _row(result: Result) -> str:
+    time_ms = f"{result.ticks * TICK_MS}" if result.reached else "never"
+    return f"{result.detents:>9}{time_ms:>9}{result.api_calls:>7}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--against",
+        type=str,
+        default=None,
+        help="Git revision of src/ to compare the working tree against",
+    )
+    parser.add_argument(
+        "-r",
+        "--rate",
+        type=int,
+        default=8,
+        help="Detents per OnIdle tick (default: %(default)s, a fast spin)",
+    )
+    args = parser.parse_args()
+
+    columns: List[Tuple[str, Dict[str, Result]]] = []
+    if args.against is not None:
+        columns.append((args.against, _spin_all(args.against, args.rate)))
+    columns.append(("working", _spin_all(None, args.rate)))
+
+    print(f"{'':<20}" + "".join(f"{label:>25}" for label, _ in columns))
+    print(f"{'spin':<20}" + f"{'detents':>9}{'ms':>9}{'calls':>7}" * len(columns))
+    for name in SPINS:
+        print(f"{name:<20}" + "".join(_row(results[name]) for _, results in columns))
+
+
+if __name__ == "__main__":
+    main()
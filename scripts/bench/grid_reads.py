@@ -0,0 +1,106 @@
+"""Count `channels.getGridBit` reads of a STEP mode session"""
+
+import argparse
+import sys
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import midi
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from flsim import FLSim, MidiMsg, import_src
+
+sim = FLSim(channels=32).install()
+
+CC = import_src("controls").CC
+
+type Event = Callable[[object], None]
+
+
+def _cc(cc: int, value: int = 127) -> Event:
+    return lambda controller: controller.on_control_change(MidiMsg(0xB0, cc, value))
+
+
+def _pad(note: int, velocity: int) -> Event:
+    return lambda controller: controller.on_note_on(MidiMsg(0x90, note, velocity))
+
+
+def _refresh(flags: int) -> Event:
+    def refresh(controller) -> None:
+        controller.on_refresh(flags)
+        # older revisions sync right away instead of on `OnIdle`
+        if hasattr(controller, "on_idle"):
+            controller.on_idle()
+
+    return refresh
+
+
+def _session(playback_refreshes: int) -> List[Tuple[str, Event]]:
+    """STEP mode session: program steps, switch pages, then play back"""
+
+    events: List[Tuple[str, Event]] = [("enter STEP mode", _cc(CC.STEP_MODE))]
+
+    for group in range(CC.GROUP_A, CC.GROUP_D + 1):
+        events.append(("switch page", _cc(group)))
+        for note in range(0, 16, 4):
+            events.append(("toggle step", _pad(note, 100)))
+            events.append(("toggle step", _pad(note, 0)))
+            events.append(("pattern refresh", _refresh(midi.HW_Dirty_Patterns)))
+
+    events.append(("channel change", _refresh(midi.HW_ChannelEvent)))
+
+    for _ in range(playback_refreshes):
+        events.append(("playback refresh", _refresh(midi.HW_Dirty_LEDs)))
+
+    return events
+
+
+def _count(rev: Optional[str], events: List[Tuple[str, Event]]) -> Dict[str, int]:
+    controller = import_src("controller", rev).Controller()
+    calls = sim.recorder.calls
+    reads: Dict[str, int] = {}
+
+    for name, event in events:
+        before = calls["channels.getGridBit"]
+        event(controller)
+        reads[name] = reads.get(name, 0) + calls["channels.getGridBit"] - before
+
+    reads["TOTAL"] = sum(reads.values())
+    return reads
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--against",
+        type=str,
+        default=None,
+        help="Git revision of src/ to compare the working tree against",
+    )
+    parser.add_argument(
+        "-p",
+        "--playback-refreshes",
+        type=int,
+        default=100,
+        help="Number of LED refreshes during playback",
+    )
+    args = parser.parse_args()
+
+    events = _session(args.playback_refreshes)
+    after = _count(None, events)
+
+    if args.against is None:
+        print(f"{'event':<20}{'reads':>10}")
+        for name, reads in after.items():
+            print(f"{name:<20}{reads:>10}")
+        return
+
+    before = _count(args.against, events)
+    print(f"{'event':<20}{args.against:>10}{'working':>10}")
+    for name, reads in after.items():
+        print(f"{name:<20}{before[name]:>10}{reads:>10}")
+
+
+if __name__ == "__main__":
+    main()
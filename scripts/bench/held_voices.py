@@ -0,0 +1,129 @@
+"""Stress test: interleave pad holds with mode changes and check that no note hangs"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, List, Optional, Set, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from flsim import FLSim, MidiMsg, import_src
+
+CHANNEL_COUNT = 32
+
+sim = FLSim(channels=CHANNEL_COUNT).install()
+sounding = sim.project.sounding
+
+CC = import_src("controls").CC
+Pad = import_src("pads").Pad
+
+MODE_CCS = (CC.PAD_MODE, CC.KEYBOARD_MODE, CC.CHORDS_MODE, CC.STEP_MODE)
+GROUP_CCS = tuple(range(CC.GROUP_A, CC.GROUP_H + 1))
+SHIFT_PADS = (Pad.SEMI_DOWN, Pad.SEMI_UP, Pad.OCTAVE_DOWN, Pad.OCTAVE_UP)
+
+
+def _cc(controller: Any, cc: int, value: int = 127) -> None:
+    controller.on_control_change(MidiMsg(0xB0, cc, value))
+
+
+def _pad(controller: Any, note: int, velocity: int) -> None:
+    controller.on_note_on(MidiMsg(0x90, note, velocity))
+
+
+def _change_mode(controller: Any, rng: random.Random) -> None:
+    """Changes pad mode, group or semitone offset, possibly while pads are held"""
+
+    match rng.randrange(4):
+        case 0:
+            _cc(controller, rng.choice(MODE_CCS))
+        case 1:
+            _cc(controller, rng.choice(GROUP_CCS))
+        case 2:
+            _cc(controller, CC.SHIFT, 127)
+            pad = rng.choice(SHIFT_PADS)
+            _pad(controller, pad, 100)
+            _pad(controller, pad, 0)
+            _cc(controller, CC.SHIFT, 0)
+        case _:
+            controller._selected_channel = rng.randrange(CHANNEL_COUNT)
+
+
+def _run(rev: Optional[str], events: int, seed: int) -> Tuple[List[str], List[float]]:
+    """Returns the failures and the mean event cost (µs) of every tenth of the run"""
+
+    controller = import_src("controller", rev).Controller()
+    rng = random.Random(seed)
+    held: Set[int] = set()
+    failures: List[str] = []
+    costs: List[float] = []
+    chunk = max(events // 10, 1)
+    start = time.perf_counter()
+
+    for event in range(1, events + 1):
+        action = rng.random()
+        if action < 0.4:
+            _change_mode(controller, rng)
+        elif action < 0.7 or not held:
+            pad = rng.randrange(16)
+            held.add(pad)
+            _pad(controller, pad, rng.randrange(1, 128))
+        else:
+            pad = rng.choice(sorted(held))
+            held.discard(pad)
+            _pad(controller, pad, 0)
+
+        if not held and sounding:
+            failures.append(f"event {event}: {sorted(sounding)} hanging")
+            sounding.clear()
+
+        if event % chunk == 0:
+            costs.append((time.perf_counter() - start) / chunk * 1e6)
+            start = time.perf_counter()
+
+    # panic releases everything that is still held
+    _cc(controller, CC.SHIFT, 127)
+    _cc(controller, CC.STOP)
+    _cc(controller, CC.SHIFT, 0)
+    if sounding:
+        failures.append(f"panic: {sorted(sounding)} hanging")
+        sounding.clear()
+
+    return failures, costs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--against",
+        type=str,
+        default=None,
+        help="Git revision of src/ to run instead of the working tree",
+    )
+    parser.add_argument(
+        "-n",
+        "--events",
+        type=int,
+        default=20000,
+        help="Number of pad and mode change events",
+    )
+    parser.add_argument("-s", "--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    failures, costs = _run(args.against, args.events, args.seed)
+
+    print("mean event cost per tenth of the run (µs):")
+    print(" ".join(f"{cost:.1f}" for cost in costs))
+
+    if failures:
+        print(f"FAILED: {len(failures)} hanging note situations, first ones:")
+        for failure in failures[:10]:
+            print(f"  {failure}")
+        sys.exit(1)
+
+    print(f"OK: no hanging notes after {args.events} events")
+
+
+if __name__ == "__main__":
+    main()
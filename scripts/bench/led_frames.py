@@ -0,0 +1,92 @@
+"""Compare the per-message and SysEx frame LED output paths"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from flsim import FLSim, import_src
+
+sim = FLSim().install()
+# `import_src` leaves the imported modules of `src/` in `sys.modules`
+import_src("leds")
+
+from leds import LedBuffer
+from consts import CC_COUNT, NOTES_COUNT
+
+type Scene = Callable[[LedBuffer, int], None]
+
+
+def _full_repaint(leds: LedBuffer, frame: int) -> None:
+    """Every CC and pad LED changes, e.g. `OnInit` or `OnDeInit`"""
+
+    for cc in range(CC_COUNT):
+        leds.set_cc(cc, (cc + frame) % 128)
+    for note in range(NOTES_COUNT):
+        leds.set_note(note, (note + frame) % 128)
+
+
+def _pads_and_groups(leds: LedBuffer, frame: int) -> None:
+    """All pads and group buttons change, e.g. switching the pad mode"""
+
+    for cc in range(100, 108):
+        leds.set_cc(cc, (cc + frame) % 128)
+    for note in range(NOTES_COUNT):
+        leds.set_note(note, (note + frame) % 128)
+
+
+def _single_pad(leds: LedBuffer, frame: int) -> None:
+    """A single pad changes, e.g. a pad hit in KEYBOARD mode"""
+
+    leds.set_note(0, frame % 128)
+
+
+SCENES: dict[str, Scene] = {
+    "full repaint": _full_repaint,
+    "pads + groups": _pads_and_groups,
+    "single pad": _single_pad,
+}
+
+
+def _run(scene: Scene, sysex_frames: bool, repeats: int) -> tuple[float, int, int]:
+    """Returns median flush time in µs, messages and bytes sent per flush"""
+
+    leds = LedBuffer(sysex_frames)
+    timings: List[float] = []
+
+    for frame in range(repeats):
+        sim.reset()
+        scene(leds, frame)
+        start = time.perf_counter()
+        leds.flush()
+        timings.append(time.perf_counter() - start)
+
+    messages = len(sim.messages) + len(sim.sysex)
+    size = 3 * len(sim.messages) + sum(len(m) for m in sim.sysex)
+    return statistics.median(timings) * 1e6, messages, size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "-n",
+        "--repeats",
+        type=int,
+        default=1000,
+        help="Number of flushes to measure per scene",
+    )
+    args = parser.parse_args()
+
+    print(f"{'scene':<16}{'path':<10}{'messages':>10}{'bytes':>8}{'flush µs':>12}")
+    for name, scene in SCENES.items():
+        for path, sysex_frames in (("message", False), ("sysex", True)):
+            flush_us, messages, size = _run(scene, sysex_frames, args.repeats)
+            print(f"{name:<16}{path:<10}{messages:>10}{size:>8}{flush_us:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
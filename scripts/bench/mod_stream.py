@@ -0,0 +1,202 @@
+"""
+Touch strip streams in MOD mode, as seen by FL Studio.
+
+The touch strip drives a plugin parameter of the selected channel while FL
+Studio keeps calling `OnIdle` every 20 ms. Every stream sends a number of
+values per tick, from a slow slide to a flood of values, and a resting finger
+wobbling around the same value. Reported per stream: the values sent by the
+strip, the parameter writes (`plugins.setParamValue`), the most writes in a
+tick, the writes of a value equal to the previous one, the messages sent back
+to the device and how far the parameter ends from the last value of the
+strip (in values of the strip).
+
+Changes made in FL Studio after a slide, editing the parameter or selecting
+another channel, are then checked to be kept. It exits with an error when the
+strip writes a parameter it didn't move.
+"""
+
+import argparse
+import random
+import sys
+import types
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from flsim import FLSim, Project, import_src
+
+CC = import_src("controls").CC
+MOD_PARAM = import_src("consts").MOD_PARAM
+
+WRITE_CALL = "plugins.setParamValue"
+
+RELEASED_TICKS = 20
+"""`OnIdle` ticks run after the finger is lifted"""
+
+
+@dataclass
+class Stream:
+    start: int
+    end: int
+    ticks: int
+    """Duration of the stream in `OnIdle` ticks"""
+
+    values_per_tick: int
+    """Values the strip sends per tick"""
+
+    wobble: float
+    """Probability of every value to be off by one"""
+
+
+STREAMS: Dict[str, Stream] = {
+    "slow slide": Stream(20, 80, 60, 1, 0.3),
+    "fast slide": Stream(0, 100, 25, 8, 0.3),
+    "flood": Stream(100, 0, 25, 64, 0.3),
+    "resting finger": Stream(50, 50, 50, 4, 0.5),
+}
+
+
+@dataclass
+class Result:
+    values: int
+    writes: int
+    peak: int
+    """Most writes in a tick"""
+
+    repeats: int
+    """Writes of the same value as the previous write"""
+
+    messages: int
+    error: int
+    """Distance of the final parameter value to the last value of the strip"""
+
+
+def _values(stream: Stream, rng: random.Random) -> List[List[int]]:
+    """Values sent by the strip in every tick"""
+
+    ticks: List[List[int]] = []
+    samples = stream.ticks * stream.values_per_tick
+    for tick in range(stream.ticks):
+        values: List[int] = []
+        for sample in range(stream.values_per_tick):
+            done = (tick * stream.values_per_tick + sample + 1) / samples
+            value = round(stream.start + (stream.end - stream.start) * done)
+            # the strip reaches its end without wobbling
+            if done < 1 and rng.random() < stream.wobble:
+                value += rng.choice((-1, 1))
+            values.append(min(max(value, 0), 100))
+        ticks.append(values)
+    return ticks
+
+
+def _stream(stream: Stream, seed: int) -> Result:
+    sim = FLSim().install()
+    script = import_src("main")
+    script.OnInit()
+    sim.control_change(script, CC.TOUCH_STRIP_MOD, 127)
+    sim.idle(script)
+    sim.reset()
+    sim.recorder.start_trace()
+
+    calls = sim.recorder.calls
+    peak = 0
+    ticks = _values(stream, random.Random(seed))
+    for values in ticks:
+        before = calls[WRITE_CALL]
+        for value in values:
+            sim.control_change(script, CC.TOUCH_STRIP, value)
+        sim.idle(script)
+        peak = max(peak, calls[WRITE_CALL] - before)
+    for _ in range(RELEASED_TICKS):
+        sim.idle(script)
+
+    trace = sim.recorder.trace or []
+    written = [args[0] for name, args in trace if name == WRITE_CALL]
+    channel = sim.project.channels[sim.project.selected_channel]
+
+    return Result(
+        values=sum(len(values) for values in ticks),
+        writes=len(written),
+        peak=peak,
+        repeats=sum(a == b for a, b in zip(written, written[1:])),
+        messages=len(sim.messages) + len(sim.sysex),
+        error=abs(round(channel.params[MOD_PARAM] * 100) - ticks[-1][-1]),
+    )
+
+
+def _slid_sim() -> Tuple[FLSim, types.ModuleType]:
+    """Slides the strip up to 50 on the first channel and lifts the finger"""
+
+    sim = FLSim().install()
+    script = import_src("main")
+    script.OnInit()
+    sim.control_change(script, CC.TOUCH_STRIP_MOD, 127)
+    for value in range(30, 51):
+        sim.control_change(script, CC.TOUCH_STRIP, value)
+        sim.idle(script)
+    for _ in range(RELEASED_TICKS):
+        sim.idle(script)
+    return sim, script
+
+
+CHANGES: Dict[str, Callable[[FLSim], None]] = {
+    "parameter edit": lambda sim: sim.modules["plugins"].setParamValue(
+        0.9, MOD_PARAM, 0
+    ),
+    "channel switch": lambda sim: sim.modules["channels"].selectOneChannel(1),
+}
+
+
+def _params(project: Project) -> List[float]:
+    return [channel.params[MOD_PARAM] for channel in project.channels]
+
+
+def _check_changes() -> List[str]:
+    """Returns the changes made in FL Studio the strip wrote over"""
+
+    failures: List[str] = []
+    for name, change in CHANGES.items():
+        sim, script = _slid_sim()
+        change(sim)
+        expected = _params(sim.project)
+        before = sim.recorder.calls[WRITE_CALL]
+        for _ in range(RELEASED_TICKS):
+            sim.idle(script)
+        writes = sim.recorder.calls[WRITE_CALL] - before
+        if writes or _params(sim.project) != expected:
+            failures.append(f"{name}: {writes} writes after the change")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the finger wobble")
+    args = parser.parse_args()
+
+    print(
+        f"{'stream':<16}{'values':>7}{'writes':>8}{'peak':>6}{'repeats':>9}"
+        f"{'msgs':>6}{'error':>7}"
+    )
+    for name, stream in STREAMS.items():
+        result = _stream(stream, args.seed)
+        print(
+            f"{name:<16}{result.values:>7}{result.writes:>8}{result.peak:>6}"
+            f"{result.repeats:>9}{result.messages:>6}{result.error:>7}"
+        )
+
+    failures = _check_changes()
+    if failures:
+        print(f"FAILED: {len(failures)} changes made in FL Studio written over:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+
+    print(f"OK: {len(CHANGES)} changes made in FL Studio kept")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Touch strip sweeps in TRANSPORT mode, as seen by FL Studio.
+
+A finger slides along the strip while FL Studio keeps calling `OnIdle`
+every 20 ms, wobbling by one value now and then. Reported per sweep: the
+values sent by the strip, the seeks (`transport.setSongPos`), the seeks
+moving against the slide and their distance (jitter), the smallest move of
+the song position (resolution), the messages sent back to the device and
+the final song position.
+Optionally against another git revision.
+"""
+
+import argparse
+import random
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import midi
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from flsim import FLSim, import_src
+
+CC = import_src("controls").CC
+
+RELEASED_TICKS = 20
+"""`OnIdle` ticks run after the finger is lifted"""
+
+
+@dataclass
+class Sweep:
+    start: int
+    end: int
+    ticks: int
+    """Duration of the slide in `OnIdle` ticks"""
+
+    values_per_tick: int
+    """Values the strip sends per tick at most"""
+
+    wobble: float
+    """Probability of every value to be off by one"""
+
+
+SWEEPS: Dict[str, Sweep] = {
+    "fast slide": Sweep(10, 90, 20, 6, 0.3),
+    "slow slide": Sweep(40, 60, 100, 1, 0.3),
+}
+
+
+@dataclass
+class Result:
+    values: int
+    seeks: int
+    reversals: int
+    backward: float
+    """Distance sought against the slide"""
+
+    resolution: float
+    """Smallest move of the song position"""
+
+    messages: int
+
+    end: float
+    """Song position at the end"""
+
+
+def _values(sweep: Sweep, rng: random.Random) -> List[List[int]]:
+    """Values sent by the strip in every tick, without repeating a value"""
+
+    ticks: List[List[int]] = []
+    last = -1
+    samples = sweep.ticks * sweep.values_per_tick
+    for tick in range(sweep.ticks):
+        values: List[int] = []
+        for sample in range(sweep.values_per_tick):
+            done = (tick * sweep.values_per_tick + sample + 1) / samples
+            value = round(sweep.start + (sweep.end - sweep.start) * done)
+            if rng.random() < sweep.wobble:
+                value += rng.choice((-1, 1))
+            value = min(max(value, 0), 127)
+            if value != last:
+                values.append(value)
+                last = value
+        ticks.append(values)
+    return ticks
+
+
+def _sweep(rev: Optional[str], sweep: Sweep, seed: int) -> Result:
+    sim = FLSim().install()
+    script = import_src("main", rev)
+    script.OnInit()
+    sim.idle(script)
+    sim.reset()
+    sim.recorder.start_trace()
+
+    ticks = _values(sweep, random.Random(seed))
+    for values in ticks:
+        for value in values:
+            sim.control_change(script, CC.TOUCH_STRIP, value)
+        sim.idle(script)
+    for _ in range(RELEASED_TICKS):
+        sim.idle(script)
+
+    trace = sim.recorder.trace or []
+    positions = [args[0] for name, args in trace if name == "transport.setSongPos"]
+    direction = 1 if sweep.end > sweep.start else -1
+    moves = [(b - a) * direction for a, b in zip(positions, positions[1:])]
+    backward = [-move for move in moves if move < 0]
+
+    return Result(
+        values=sum(len(values) for values in ticks),
+        seeks=len(positions),
+        reversals=len(backward),
+        backward=sum(backward),
+        resolution=min((abs(move) for move in moves if move), default=0.0),
+        messages=len(sim.messages) + len(sim.sysex),
+        end=sim.project.song_pos,
+    )
+
+
+def _sweep_all(rev: Optional[str], seed: int) -> Dict[str, Result]:
+    return {name: _sweep(rev, sweep, seed) for name, sweep in SWEEPS.items()}
+
+
+def _row(result: Result) -> str:
+    return (
+        f"{result.seeks:>7}{result.reversals:>6}{result.backward:>9.3f}"
+        f"{result.resolution:>9.4f}{result.messages:>6}{result.end:>6.2f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--against",
+        type=str,
+        default=None,
+        help="Git revision of src/ to compare the working tree against",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the finger wobble")
+    args = parser.parse_args()
+
+    columns: List[Tuple[str, Dict[str, Result]]] = []
+    if args.against is not None:
+        columns.append((args.against, _sweep_all(args.against, args.seed)))
+    columns.append(("working", _sweep_all(None, args.seed)))
+
+    header = f"{'seeks':>7}{'back':>6}{'jitter':>9}{'step':>9}{'msgs':>6}{'end':>6}"
+    print(f"{'':<19}" + "".join(f"{label:>43}" for label, _ in columns))
+    print(f"{'sweep':<12}{'values':>7}" + header * len(columns))
+    for name in SWEEPS:
+        values = columns[-1][1][name].values
+        print(
+            f"{name:<12}{values:>7}"
+            + "".join(_row(results[name]) for _, results in columns)
+        )
+
+
+if __name__ == "__main__":
+    main()
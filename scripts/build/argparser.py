@@ -23,5 +23,48 @@ def init_parser() -> argparse.ArgumentParser:
         default=cfg.SCRIPT_NAME,
         help="Name of the script as it appears in FL Studio",
     )
+    parser.add_argument(
+        "--deploy",
+        type=Path,
+        action="append",
+        default=[],
+        help="Folder to copy the built script to, e.g. Settings/Hardware/<folder> of FL Studio. Can be repeated",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Build and deploy the script again whenever a module changes",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        default=cfg.PROFILE,
+        help="Keep the hot-path profiler in the built script",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        default=cfg.NO_CACHE,
+        help="Ignore the results of previous builds and rebuild everything",
+    )
+    parser.add_argument(
+        "--fold-report",
+        type=Path,
+        default=cfg.FOLD_REPORT,
+        help="Write every constant expression and branch folded by the build to a file",
+    )
+    parser.add_argument(
+        "--size-report",
+        action="store_true",
+        default=cfg.SIZE_REPORT,
+        help="Log the size and import time of the script before and after tree shaking",
+    )
+    parser.add_argument(
+        "--no-budgets",
+        dest="check_budgets",
+        action="store_false",
+        default=cfg.CHECK_BUDGETS,
+        help="Don't check the loading costs of the script against the budgets of the config",
+    )
 
     return parser
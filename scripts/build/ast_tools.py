@@ -1,24 +1,269 @@
 import ast
-from typing import Optional, Set, Tuple, Dict
+import math
+import operator
+import re
+import time
+from collections import Counter, defaultdict
+from typing import Any, Callable, Collection, Dict, List, Optional, Sequence, Set, Tuple
 
 from config import cfg
 
 __all__ = [
+    "PRUNE",
+    "Pass",
+    "PassManager",
     "ImportsCollector",
     "ImportsRemover",
     "BodyCollector",
     "AllRemover",
     "FlMidiMsgRemover",
     "DocstringRemover",
+    "ProfilerRemover",
     "ConstCollector",
     "ConstInliner",
     "ConstRemover",
     "EnumCollector",
     "EnumInliner",
+    "ConstantFolder",
+    "MatchLowering",
+    "AnnotationRemover",
+    "EnumEliminator",
+    "TreeShaker",
+    "Consts",
+    "Enums",
 ]
 
 
-class ImportsCollector(ast.NodeVisitor):
+PRUNE: Any = object()
+"""Returned by an `enter_*` hook to keep a node without visiting its children"""
+
+# statement lists whose statements can be dropped, `body` must never end up empty
+STMT_FIELDS = ("body", "orelse", "finalbody")
+
+type Hook = Callable[[ast.AST], Any]
+
+
+class Pass:
+    """
+    A visitor that can share a single tree traversal with other passes.
+
+    Passes implement any of these hooks:
+
+    - `enter_<NodeType>(node)` runs before the children of the node are visited.
+      It returns the node, a replacement node, `None` to remove the node, or
+      `PRUNE` to keep the node without visiting its children. The pass does not
+      visit a replacement, so it should have processed it already.
+    - `leave_<NodeType>(node)` runs after the children of the node are visited.
+      It returns `None` to keep the node, a replacement node, or a list of
+      statements replacing a statement. The leave hooks of the passes after it
+      don't run on a replacement.
+    - `drop(stmt)` removes statements from every statement list when the node
+      holding the list is entered. Passes before it in the same traversal
+      never see the dropped statements.
+
+    In a fused traversal, every node goes through the hooks of all passes in
+    order, so a pass sees the node as the passes before it left it. A pass that
+    needs more than that, e.g. the complete result of the passes before it,
+    sets `barrier` to start a new traversal.
+    """
+
+    barrier: bool = False
+    """Indicates whether the pass can't share a traversal with the passes before it"""
+
+    @property
+    def name(self) -> str:
+        return type(self).__name__
+
+
+class _Traversal:
+    """A single walk of the tree running the hooks of several passes"""
+
+    def __init__(self, passes: Sequence[Pass], timings: Optional[Dict[str, int]]):
+        self._passes = passes
+        self._timings = timings
+        self._active = tuple(range(len(passes)))
+        self._enters: Dict[type, Optional[Tuple[Optional[Hook], ...]]] = {}
+        self._leaves: Dict[type, Optional[Tuple[Optional[Hook], ...]]] = {}
+        self._drops = tuple(self._hook(p, "drop") for p in passes)
+        self._has_drops = any(self._drops)
+        self._containers: Dict[type, bool] = {}
+
+    def _hook(self, p: Pass, attr: str) -> Optional[Hook]:
+        hook = getattr(p, attr, None)
+        if hook is None or self._timings is None:
+            return hook
+
+        timings, name = self._timings, p.name
+        perf_counter_ns = time.perf_counter_ns
+
+        def timed(node: ast.AST) -> Any:
+            start = perf_counter_ns()
+            result = hook(node)
+            timings[name] += perf_counter_ns() - start
+            return result
+
+        return timed
+
+    def _hooks(
+        self, table: Dict[type, Optional[Tuple[Optional[Hook], ...]]], cls: type
+    ) -> Optional[Tuple[Optional[Hook], ...]]:
+        if cls not in table:
+            prefix = "enter_" if table is self._enters else "leave_"
+            hooks = tuple(self._hook(p, prefix + cls.__name__) for p in self._passes)
+            table[cls] = hooks if any(hooks) else None
+        return table[cls]
+
+    def _drops_for(self, cls: type) -> Optional[Tuple[Optional[Hook], ...]]:
+        if not self._has_drops:
+            return None
+        if cls not in self._containers:
+            self._containers[cls] = any(f in STMT_FIELDS for f in cls._fields)
+        return self._drops if self._containers[cls] else None
+
+    def run(self, tree: ast.AST) -> ast.AST:
+        return self._visit(tree, self._active)
+
+    def _visit(self, node: ast.AST, active: Tuple[int, ...]) -> Any:
+        enters = self._hooks(self._enters, type(node))
+        drops = self._drops_for(type(node))
+        entered: Sequence[int] = active
+        children = active
+
+        if enters is not None or drops is not None:
+            entered = []
+            pruned: List[int] = []
+
+            for i in active:
+                hook = enters[i] if enters is not None else None
+                if hook is not None:
+                    result = hook(node)
+                    if result is None:
+                        return None
+                    if result is PRUNE:
+                        pruned.append(i)
+                    elif result is not node:
+                        # only the following passes see the replacement
+                        node = result
+                        enters = self._hooks(self._enters, type(node))
+                        drops = self._drops_for(type(node))
+                        entered.clear()
+                        pruned.clear()
+                        continue
+                if drops is not None and drops[i] is not None:
+                    self._drop(node, drops[i])
+                entered.append(i)
+
+            if pruned:
+                children = tuple(i for i in entered if i not in pruned)
+            else:
+                children = tuple(entered)
+
+        if children:
+            self._visit_children(node, children)
+
+        leaves = self._hooks(self._leaves, type(node))
+        if leaves is not None:
+            for i in entered:
+                if leaves[i] is not None:
+                    result = leaves[i](node)
+                    if result is not None and result is not node:
+                        return result
+
+        return node
+
+    def _visit_children(self, node: ast.AST, active: Tuple[int, ...]) -> None:
+        AST, visit = ast.AST, self._visit
+        for field in node._fields:
+            old_value = getattr(node, field, None)
+            if isinstance(old_value, list):
+                if not old_value:
+                    continue
+                new_values = []
+                changed = False
+                for value in old_value:
+                    if isinstance(value, AST):
+                        new_value = visit(value, active)
+                        if new_value is not value:
+                            changed = True
+                            if new_value is None:
+                                continue
+                            if not isinstance(new_value, AST):
+                                new_values.extend(new_value)
+                                continue
+                        value = new_value
+                    new_values.append(value)
+                if not changed:
+                    continue
+                if field == "body" and not new_values:
+                    if not isinstance(node, ast.Module):
+                        new_values.append(ast.Pass())
+                old_value[:] = new_values
+            elif isinstance(old_value, AST):
+                new_node = self._visit(old_value, active)
+                if new_node is None:
+                    delattr(node, field)
+                else:
+                    setattr(node, field, new_node)
+
+    @staticmethod
+    def _drop(node: ast.AST, drop: Hook) -> None:
+        for field in STMT_FIELDS:
+            stmts = getattr(node, field, None)
+            if not isinstance(stmts, list) or not stmts:
+                continue
+            stmts[:] = [stmt for stmt in stmts if not drop(stmt)]
+            if field == "body" and not stmts:
+                stmts.append(ast.Pass())
+
+
+class PassManager:
+    """
+    Runs a pipeline of passes, fusing consecutive passes into one traversal.
+
+    With `timed`, the time spent in the hooks of every pass is recorded in
+    `timings` (in nanoseconds) and the duration of every traversal in
+    `traversals`.
+    """
+
+    def __init__(self, passes: Sequence[Pass], fuse: bool = True, timed: bool = False):
+        self.groups: List[List[Pass]] = []
+        for p in passes:
+            if self.groups and fuse and not p.barrier:
+                self.groups[-1].append(p)
+            else:
+                self.groups.append([p])
+
+        self.timings: Optional[Dict[str, int]] = None
+        if timed:
+            self.timings = {p.name: 0 for p in passes}
+        self.traversals: List[Tuple[str, int]] = []
+
+    def run(self, tree: ast.AST) -> ast.AST:
+        for group in self.groups:
+            start = time.perf_counter_ns()
+            tree = _Traversal(group, self.timings).run(tree)
+            if self.timings is not None:
+                names = " + ".join(p.name for p in group)
+                self.traversals.append((names, time.perf_counter_ns() - start))
+        return tree
+
+    def report(self) -> List[str]:
+        """Returns a line for the total hook time of every pass and every traversal"""
+
+        if self.timings is None:
+            return []
+
+        totals: Dict[str, int] = defaultdict(int)
+        for names, duration in self.traversals:
+            totals[names] += duration
+
+        lines = [f"{name:<20} {ns / 1e6:8.2f} ms" for name, ns in self.timings.items()]
+        for names, ns in totals.items():
+            lines.append(f"traversal {ns / 1e6:8.2f} ms: {names}")
+        return lines
+
+
+class ImportsCollector(ast.NodeVisitor, Pass):
     def __init__(self):
         self.imports = ast.Module(body=[], type_ignores=[])
 
@@ -28,6 +273,14 @@ class ImportsCollector(ast.NodeVisitor):
     def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
         self.imports.body.append(node)
 
+    def enter_Import(self, node: ast.Import) -> Any:
+        self.visit_Import(node)
+        return PRUNE
+
+    def enter_ImportFrom(self, node: ast.ImportFrom) -> Any:
+        self.visit_ImportFrom(node)
+        return PRUNE
+
 
 class ImportsRemover(ast.NodeTransformer):
     def __init__(self) -> None:
@@ -81,28 +334,38 @@ class ImportsRemover(ast.NodeTransformer):
         return ()
 
 
-class BodyCollector(ast.NodeVisitor):
+class BodyCollector(ast.NodeVisitor, Pass):
     def __init__(self) -> None:
         self.body = ast.Module(body=[], type_ignores=[])
 
     def visit_Module(self, node: ast.Module) -> None:
         self.generic_visit(node)
+        self._collect(node)
+
+    def enter_Module(self, node: ast.Module) -> ast.Module:
+        self._collect(node)
+        return node
+
+    def _collect(self, node: ast.Module) -> None:
         for stmt in node.body:
             if not isinstance(stmt, (ast.Import, ast.ImportFrom)):
                 self.body.body.append(stmt)
 
 
-class AllRemover(ast.NodeTransformer):
+class AllRemover(ast.NodeTransformer, Pass):
     def visit_Assign(self, node: ast.Assign) -> Optional[ast.Assign]:
-        if any(
-            isinstance(target, ast.Name) and target.id == "__all__"
-            for target in node.targets
-        ):
+        if self.drop(node):
             return None
         return node
 
+    def drop(self, stmt: ast.stmt) -> bool:
+        return isinstance(stmt, ast.Assign) and any(
+            isinstance(target, ast.Name) and target.id == "__all__"
+            for target in stmt.targets
+        )
+
 
-class FlMidiMsgRemover(ast.NodeTransformer):
+class FlMidiMsgRemover(ast.NodeTransformer, Pass):
     def visit_arg(self, node: ast.arg) -> ast.arg:
         if (
             node.annotation
@@ -112,8 +375,12 @@ class FlMidiMsgRemover(ast.NodeTransformer):
             node.annotation = None
         return node
 
+    def enter_arg(self, node: ast.arg) -> Any:
+        self.visit_arg(node)
+        return PRUNE
 
-class DocstringRemover(ast.NodeTransformer):
+
+class DocstringRemover(ast.NodeTransformer, Pass):
     def visit_Module(self, node: ast.Module) -> ast.Module:
         self.generic_visit(node)
         return self._remove_docstring(node)  # type: ignore[return-value]
@@ -126,6 +393,17 @@ class DocstringRemover(ast.NodeTransformer):
         self.generic_visit(node)
         return self._remove_docstring(node)  # type: ignore[return-value]
 
+    # the docstring is the first statement as left by the passes before this one,
+    # statements dropped by later passes are still there when the node is entered
+    def enter_Module(self, node: ast.Module) -> ast.AST:
+        return self._remove_docstring(node)
+
+    def enter_FunctionDef(self, node: ast.FunctionDef) -> ast.AST:
+        return self._remove_docstring(node)
+
+    def enter_ClassDef(self, node: ast.ClassDef) -> ast.AST:
+        return self._remove_docstring(node)
+
     def _remove_docstring(self, node: ast.AST) -> ast.AST:
         body = getattr(node, "body", None)
         if not body:
@@ -142,13 +420,56 @@ class DocstringRemover(ast.NodeTransformer):
         return node
 
 
+class ProfilerRemover(ast.NodeTransformer, Pass):
+    PROFILER = "profiler"
+    DECORATORS = ("profiled", "profiled_cc")
+
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> ast.FunctionDef:
+        self.enter_FunctionDef(node)
+        return self.generic_visit(node)  # type: ignore[return-value]
+
+    def visit_Expr(self, node: ast.Expr) -> Optional[ast.Expr]:
+        if self.drop(node):
+            return None
+        return node
+
+    def generic_visit(self, node: ast.AST) -> ast.AST:
+        super().generic_visit(node)
+        # a block whose only statement was a profiler call still needs a body
+        if isinstance(getattr(node, "body", None), list) and not node.body:
+            node.body = [ast.Pass()]  # type: ignore[attr-defined]
+        return node
+
+    def enter_FunctionDef(self, node: ast.FunctionDef) -> ast.FunctionDef:
+        node.decorator_list = [
+            decorator
+            for decorator in node.decorator_list
+            if not (
+                isinstance(decorator, ast.Name) and decorator.id in self.DECORATORS
+            )
+        ]
+        return node
+
+    def drop(self, stmt: ast.stmt) -> bool:
+        if not isinstance(stmt, ast.Expr):
+            return False
+        call = stmt.value
+        return (
+            isinstance(call, ast.Call)
+            and isinstance(call.func, ast.Attribute)
+            and isinstance(call.func.value, ast.Name)
+            and call.func.value.id == self.PROFILER
+        )
+
+
 type Consts = Dict[str, ast.AST]
 
 
-class ConstCollector(ast.NodeVisitor):
+class ConstCollector(ast.NodeVisitor, Pass):
     def __init__(self):
         self.consts: Consts = {}
         self._is_in_class = False
+        self._outer_in_class: List[bool] = []
 
     def visit_Assign(self, node: ast.Assign) -> None:
         target = node.targets[0]
@@ -165,8 +486,20 @@ class ConstCollector(ast.NodeVisitor):
         self.generic_visit(node)
         self._is_in_class = old_in_class
 
+    def enter_Assign(self, node: ast.Assign) -> Any:
+        self.visit_Assign(node)
+        return PRUNE
+
+    def enter_ClassDef(self, node: ast.ClassDef) -> ast.ClassDef:
+        self._outer_in_class.append(self._is_in_class)
+        self._is_in_class = True
+        return node
+
+    def leave_ClassDef(self, node: ast.ClassDef) -> None:
+        self._is_in_class = self._outer_in_class.pop()
 
-class ConstInliner(ast.NodeTransformer):
+
+class ConstInliner(ast.NodeTransformer, Pass):
     def __init__(self, constants: Consts):
         self.constants = constants
 
@@ -175,27 +508,45 @@ class ConstInliner(ast.NodeTransformer):
             return self.visit(self.constants[node.id])
         return node
 
+    def enter_Name(self, node: ast.Name) -> Any:
+        result = self.visit_Name(node)
+        return PRUNE if result is node else result
+
 
-class ConstRemover(ast.NodeTransformer):
+class ConstRemover(ast.NodeTransformer, Pass):
     def __init__(self, constants: Consts):
         self.const_names = set(constants.keys())
 
     def visit_Assign(self, node: ast.Assign) -> Optional[ast.Assign]:
-        target = node.targets[0]
-        if isinstance(target, ast.Name) and target.id in self.const_names:
+        if self.drop(node):
             return None
         return node
 
+    def drop(self, stmt: ast.stmt) -> bool:
+        if not isinstance(stmt, ast.Assign):
+            return False
+        target = stmt.targets[0]
+        return isinstance(target, ast.Name) and target.id in self.const_names
+
 
 type Enums = Dict[str, Dict[str, ast.AST]]
 
 
-class EnumCollector(ast.NodeVisitor):
+class EnumCollector(ast.NodeVisitor, Pass):
     def __init__(self):
         self.enums: Enums = {}
         self._curr_enum: str | None = None
 
     def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        self.enter_ClassDef(node)
+        self.generic_visit(node)
+
+    def visit_Assign(self, node: ast.Assign) -> None:
+        target = node.targets[0]
+        if isinstance(target, ast.Name) and self._curr_enum is not None:
+            self.enums[self._curr_enum][target.id] = node.value
+
+    def enter_ClassDef(self, node: ast.ClassDef) -> ast.ClassDef:
         is_in_enum = any(
             base
             for base in node.bases
@@ -208,15 +559,14 @@ class EnumCollector(ast.NodeVisitor):
         else:
             self._curr_enum = None
 
-        self.generic_visit(node)
+        return node
 
-    def visit_Assign(self, node: ast.Assign) -> None:
-        target = node.targets[0]
-        if isinstance(target, ast.Name) and self._curr_enum is not None:
-            self.enums[self._curr_enum][target.id] = node.value
+    def enter_Assign(self, node: ast.Assign) -> Any:
+        self.visit_Assign(node)
+        return PRUNE
 
 
-class EnumInliner(ast.NodeTransformer):
+class EnumInliner(ast.NodeTransformer, Pass):
     def __init__(self, enums: Enums):
         self.enums = enums
 
@@ -227,3 +577,958 @@ class EnumInliner(ast.NodeTransformer):
             if enum_name in self.enums and member_name in self.enums[enum_name]:
                 return self.visit(self.enums[enum_name][member_name])
         return node
+
+    def enter_Attribute(self, node: ast.Attribute) -> Any:
+        result = self.visit_Attribute(node)
+        return PRUNE if result is node else result
+
+
+# operand types of the folded expressions
+type Value = int | float | str | bytes | bool | None | Tuple[Value, ...]
+
+NOT_CONSTANT: Any = object()
+
+BIN_OPS: Dict[type, Callable[[Any, Any], Any]] = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+    ast.LShift: operator.lshift,
+    ast.RShift: operator.rshift,
+    ast.BitOr: operator.or_,
+    ast.BitXor: operator.xor,
+    ast.BitAnd: operator.and_,
+}
+
+UNARY_OPS: Dict[type, Callable[[Any], Any]] = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+    ast.Invert: operator.invert,
+    ast.Not: operator.not_,
+}
+
+COMPARE_OPS: Dict[type, Callable[[Any, Any], Any]] = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.In: lambda a, b: a in b,
+    ast.NotIn: lambda a, b: a not in b,
+}
+
+
+def _constant_value(node: ast.AST) -> Any:
+    """Returns the value of a constant expression, or `NOT_CONSTANT`"""
+
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.UnaryOp) and isinstance(node.operand, ast.Constant):
+        try:
+            return UNARY_OPS[type(node.op)](node.operand.value)
+        except (ArithmeticError, TypeError):
+            return NOT_CONSTANT
+    if isinstance(node, ast.Tuple):
+        values = tuple(_constant_value(elt) for elt in node.elts)
+        return NOT_CONSTANT if NOT_CONSTANT in values else values
+    return NOT_CONSTANT
+
+
+def _pattern_values(pattern: ast.pattern) -> Optional[List[Value]]:
+    """Returns the values matched by a pattern of literals, or `None`"""
+
+    if isinstance(pattern, ast.MatchSingleton):
+        return [pattern.value]
+    if isinstance(pattern, ast.MatchValue):
+        value = _constant_value(pattern.value)
+        return None if value is NOT_CONSTANT else [value]
+    if isinstance(pattern, ast.MatchOr):
+        values: List[Value] = []
+        for alternative in pattern.patterns:
+            literals = _pattern_values(alternative)
+            if literals is None:
+                return None
+            values += literals
+        return values
+    return None
+
+
+# builtins without side effects, folded when called with constants
+PURE_BUILTINS: Dict[str, Callable[..., Any]] = {
+    "abs": abs,
+    "len": len,
+    "max": max,
+    "min": min,
+}
+
+
+class ConstantFolder(Pass):
+    """
+    Folds constant expressions, unrolls `range` loops over constants into
+    tuples and removes unreachable branches and empty trailing `match` arms.
+
+    Folding runs bottom-up in the leave hooks, so it must come after the
+    passes inlining constants and enums. Every change is recorded in `folds`
+    as the enclosing scope, the code before and the code after.
+    """
+
+    MAX_RANGE = 32
+    """Longest `range` unrolled into a tuple"""
+
+    MAX_BITS = 128
+    """Largest folded integer, larger ones are left to the script"""
+
+    MAX_LEN = 256
+    """Longest folded string"""
+
+    def __init__(self) -> None:
+        self.folds: List[Tuple[str, str, str]] = []
+        self._scope: List[str] = []
+        self._sources: List[Tuple[int, str]] = []
+
+    def enter_FunctionDef(self, node: ast.FunctionDef) -> ast.FunctionDef:
+        self._scope.append(node.name)
+        return node
+
+    def leave_FunctionDef(self, node: ast.FunctionDef) -> None:
+        self._scope.pop()
+
+    def enter_ClassDef(self, node: ast.ClassDef) -> ast.ClassDef:
+        self._scope.append(node.name)
+        return node
+
+    def leave_ClassDef(self, node: ast.ClassDef) -> None:
+        self._scope.pop()
+
+    # the code before the fold is taken on entering, before the constants
+    # in it are inlined, and the folds inside it are replaced by its own
+    def _enter_expr(self, node: ast.expr) -> ast.expr:
+        self._sources.append((len(self.folds), ast.unparse(node)))
+        return node
+
+    def _enter_test(self, node: ast.If | ast.While) -> ast.stmt:
+        self._sources.append((len(self.folds), ast.unparse(node.test)))
+        return node
+
+    def _enter_iter(self, node: ast.For | ast.comprehension) -> ast.AST:
+        self._sources.append((len(self.folds), ast.unparse(node.iter)))
+        return node
+
+    enter_BinOp = enter_UnaryOp = enter_BoolOp = enter_Compare = _enter_expr
+    enter_IfExp = _enter_expr
+    enter_If = enter_While = _enter_test
+    enter_For = enter_comprehension = _enter_iter
+
+    def enter_Call(self, node: ast.Call) -> ast.Call:
+        if self._builtin(node) is not None:
+            self._enter_expr(node)
+        return node
+
+    def leave_Call(self, node: ast.Call) -> Optional[ast.AST]:
+        builtin = self._builtin(node)
+        if builtin is None:
+            return None
+        args = [_constant_value(arg) for arg in node.args]
+        if NOT_CONSTANT in args:
+            return self._fold(node, None)
+        return self._fold(node, builtin, *args)
+
+    def leave_BinOp(self, node: ast.BinOp) -> Optional[ast.AST]:
+        left, right = _constant_value(node.left), _constant_value(node.right)
+        op = BIN_OPS.get(type(node.op))
+        if op is None or NOT_CONSTANT in (left, right):
+            return self._fold(node, None)
+        if not self._is_cheap(node.op, left, right):
+            return self._fold(node, None)
+        return self._fold(node, op, left, right)
+
+    def leave_UnaryOp(self, node: ast.UnaryOp) -> Optional[ast.AST]:
+        operand = _constant_value(node.operand)
+        if operand is NOT_CONSTANT:
+            return self._fold(node, None)
+        return self._fold(node, UNARY_OPS[type(node.op)], operand)
+
+    def leave_BoolOp(self, node: ast.BoolOp) -> Optional[ast.AST]:
+        values = [_constant_value(value) for value in node.values]
+        if NOT_CONSTANT in values:
+            return self._fold(node, None)
+        # `and` evaluates to the first falsy value, `or` to the first truthy one
+        is_and = isinstance(node.op, ast.And)
+        result = next((v for v in values if bool(v) != is_and), values[-1])
+        return self._fold(node, lambda: result)
+
+    def leave_Compare(self, node: ast.Compare) -> Optional[ast.AST]:
+        values = [_constant_value(node.left)] + [_constant_value(c) for c in node.comparators]
+        ops = [COMPARE_OPS.get(type(op)) for op in node.ops]
+        if NOT_CONSTANT in values or None in ops:
+            return self._fold(node, None)
+
+        def compare() -> bool:
+            return all(
+                op(a, b)  # type: ignore[misc]
+                for op, a, b in zip(ops, values, values[1:])
+            )
+
+        return self._fold(node, compare)
+
+    def leave_IfExp(self, node: ast.IfExp) -> Optional[ast.AST]:
+        test = _constant_value(node.test)
+        if test is NOT_CONSTANT:
+            self._sources.pop()
+            return None
+        result = node.body if test else node.orelse
+        self._record(ast.unparse(result))
+        return result
+
+    def leave_If(self, node: ast.If) -> Optional[List[ast.stmt]]:
+        test = _constant_value(node.test)
+        if test is NOT_CONSTANT:
+            self._sources.pop()
+            return None
+        self._record("body" if test else "else", "if ")
+        return node.body if test else node.orelse
+
+    def leave_While(self, node: ast.While) -> Optional[List[ast.stmt]]:
+        test = _constant_value(node.test)
+        if test is NOT_CONSTANT or test:
+            self._sources.pop()
+            return None
+        self._record("else", "while ")
+        return node.orelse
+
+    def _leave_iter(self, node: ast.For | ast.comprehension) -> None:
+        unrolled = self._unroll(node.iter)
+        if unrolled is None:
+            self._sources.pop()
+            return
+        node.iter = unrolled
+        self._record(ast.unparse(unrolled))
+
+    leave_For = leave_comprehension = _leave_iter
+
+    def leave_Match(self, node: ast.Match) -> Optional[List[ast.stmt]]:
+        # an arm doing nothing can go, unless a later arm would match its subjects
+        cases: List[ast.match_case] = []
+        for case in reversed(node.cases):
+            if self._is_empty(case) and all(
+                self._is_disjoint(case.pattern, later.pattern) for later in cases
+            ):
+                self._sources.append((len(self.folds), ast.unparse(case.pattern)))
+                self._record("removed", "case ")
+                continue
+            cases.insert(0, case)
+
+        if cases:
+            node.cases = cases
+            return None
+        if isinstance(node.subject, (ast.Name, ast.Constant)):
+            return []
+        return [ast.Expr(node.subject)]
+
+    def _fold(
+        self, node: ast.AST, op: Optional[Callable[..., Any]], *args: Any
+    ) -> Optional[ast.AST]:
+        """Returns the constant result of `op`, or `None` when `op` is `None` or fails"""
+
+        if op is None:
+            self._sources.pop()
+            return None
+
+        try:
+            result = op(*args)
+        except (ArithmeticError, TypeError, ValueError):
+            result = NOT_CONSTANT
+
+        folded = None if result is NOT_CONSTANT else self._constant(result)
+        if folded is None or ast.unparse(node) == ast.unparse(folded):
+            self._sources.pop()
+            return None
+
+        self._record(ast.unparse(folded))
+        return ast.copy_location(folded, node)
+
+    def _unroll(self, node: ast.expr) -> Optional[ast.expr]:
+        """Returns the tuple of a `range` over constants, or `enumerate` over it, or `None`"""
+
+        if not isinstance(node, ast.Call) or not isinstance(node.func, ast.Name):
+            return None
+        if node.func.id == "enumerate" and len(node.args) == 1 and not node.keywords:
+            unrolled = self._unroll(node.args[0])
+            if unrolled is None:
+                return None
+            node.args[0] = unrolled
+            return node
+        if node.func.id != "range" or node.keywords:
+            return None
+
+        args = [_constant_value(arg) for arg in node.args]
+        if not args or not all(type(arg) is int for arg in args):
+            return None
+        values = range(*args)
+        if len(values) > self.MAX_RANGE:
+            return None
+
+        unrolled = ast.Tuple(
+            elts=[self._constant(value) for value in values], ctx=ast.Load()
+        )
+        return ast.copy_location(unrolled, node)
+
+    @staticmethod
+    def _builtin(node: ast.Call) -> Optional[Callable[..., Any]]:
+        if not isinstance(node.func, ast.Name) or node.keywords or not node.args:
+            return None
+        return PURE_BUILTINS.get(node.func.id)
+
+    def _constant(self, value: Value) -> Optional[ast.expr]:
+        if value is None or isinstance(value, bool):
+            return ast.Constant(value)
+        if isinstance(value, int):
+            if value.bit_length() > self.MAX_BITS:
+                return None
+        elif isinstance(value, float):
+            if not math.isfinite(value):
+                return None
+        elif isinstance(value, (str, bytes)):
+            if len(value) > self.MAX_LEN:
+                return None
+            return ast.Constant(value)
+        else:
+            return None
+
+        # `ast.unparse` doesn't parenthesize negative constants, e.g. in `-5 ** 2`
+        if value < 0 or math.copysign(1, value) < 0:
+            return ast.UnaryOp(ast.USub(), ast.Constant(-value))
+        return ast.Constant(value)
+
+    def _is_cheap(self, op: ast.operator, left: Value, right: Value) -> bool:
+        """Indicates whether an operation can't blow up the build with a huge result"""
+
+        if isinstance(op, (ast.Pow, ast.LShift)):
+            return type(right) is not int or right <= self.MAX_BITS
+        if isinstance(op, ast.Mult):
+            for sequence, count in ((left, right), (right, left)):
+                if isinstance(sequence, (str, bytes, tuple)) and type(count) is int:
+                    return count * len(sequence) <= self.MAX_LEN
+        return True
+
+    @staticmethod
+    def _is_empty(case: ast.match_case) -> bool:
+        return case.guard is None and all(
+            isinstance(stmt, ast.Pass) for stmt in case.body
+        )
+
+    def _is_disjoint(self, pattern: ast.pattern, other: ast.pattern) -> bool:
+        values, others = _pattern_values(pattern), _pattern_values(other)
+        if values is None or others is None:
+            return False
+        # compared by equality, so `1` and `True` overlap like in `match`
+        return not any(value == other for value in values for other in others)
+
+    def _record(self, after: str, prefix: str = "") -> None:
+        """Records a fold of the code taken on entering the node, replacing the folds inside it"""
+
+        mark, before = self._sources.pop()
+        del self.folds[mark:]
+        scope = ".".join(self._scope) or "<module>"
+        self.folds.append((scope, prefix + before, after))
+
+
+class MatchLowering(Pass):
+    """
+    Lowers `match` statements over integer literals whose arms all assign a
+    value to the same variable, or all return a value, into a lookup in a
+    module-level table:
+
+        match cc:                    _CASES_TOGGLE_MODE = {44: 1, 45: 2, 47: 3}
+            case 44:
+                mode = 1             mode = _CASES_TOGGLE_MODE.get(cc, 0)
+            case 45:
+                mode = 2
+            ...
+            case _:
+                mode = 0
+
+    A hashed lookup beats comparing the arms one by one from about four arms.
+    Values must be constants or attributes of `modules`, which are evaluated
+    once when the script is loaded. Matches with guards, other patterns or
+    other statements are left as they are, and so is a match without a
+    default arm. Every lowered match is recorded in `lowered` like the folds
+    of `ConstantFolder`.
+    """
+
+    MIN_ARMS = 4
+    """Fewest arms lowered, default arm included"""
+
+    def __init__(self, modules: Set[str]) -> None:
+        self.modules = modules
+        self.lowered: List[Tuple[str, str, str]] = []
+        self._scope: List[ast.FunctionDef | ast.ClassDef] = []
+        self._tables: Dict[int, List[ast.stmt]] = defaultdict(list)
+        self._names: Set[str] = set()
+
+    def enter_FunctionDef(self, node: ast.FunctionDef) -> ast.FunctionDef:
+        self._scope.append(node)
+        return node
+
+    def leave_FunctionDef(self, node: ast.FunctionDef) -> None:
+        self._scope.pop()
+
+    def enter_ClassDef(self, node: ast.ClassDef) -> ast.ClassDef:
+        self._scope.append(node)
+        return node
+
+    def leave_ClassDef(self, node: ast.ClassDef) -> None:
+        self._scope.pop()
+
+    def leave_Match(self, node: ast.Match) -> Optional[ast.stmt]:
+        arms = self._arms(node)
+        if arms is None or not self._scope:
+            return None
+        target, table, default = arms
+
+        name = self._table_name()
+        lookup = ast.Call(
+            func=ast.Attribute(ast.Name(name, ast.Load()), "get", ast.Load()),
+            args=[node.subject, default],
+            keywords=[],
+        )
+        if target is None:
+            lowered: ast.stmt = ast.Return(lookup)
+        else:
+            lowered = ast.Assign([ast.Name(target, ast.Store())], lookup)
+
+        # the table goes before the top-level class or function using it
+        assign = ast.Assign(
+            [ast.Name(name, ast.Store())],
+            ast.Dict([ast.Constant(key) for key in table], list(table.values())),
+        )
+        ast.copy_location(assign, node)
+        self._tables[id(self._scope[0])].append(assign)
+
+        scope = ".".join(scope.name for scope in self._scope)
+        self.lowered.append((scope, f"match {ast.unparse(node.subject)}", name))
+        return ast.copy_location(lowered, node)
+
+    def leave_Module(self, node: ast.Module) -> None:
+        body: List[ast.stmt] = []
+        for stmt in node.body:
+            body += self._tables.get(id(stmt), [])
+            body.append(stmt)
+        node.body = body
+
+    def _arms(
+        self, node: ast.Match
+    ) -> Optional[Tuple[Optional[str], Dict[int, ast.expr], ast.expr]]:
+        """Returns the assigned variable (`None` for returns), values by key and default"""
+
+        if len(node.cases) < self.MIN_ARMS:
+            return None
+
+        targets: Set[Optional[str]] = set()
+        table: Dict[int, ast.expr] = {}
+        for case in node.cases:
+            if case.guard is not None or len(case.body) != 1:
+                return None
+
+            stmt = case.body[0]
+            if isinstance(stmt, ast.Return) and stmt.value is not None:
+                targets.add(None)
+            elif (
+                isinstance(stmt, ast.Assign)
+                and len(stmt.targets) == 1
+                and isinstance(stmt.targets[0], ast.Name)
+            ):
+                targets.add(stmt.targets[0].id)
+            else:
+                return None
+            if len(targets) > 1 or not self._is_stable(stmt.value):  # type: ignore[arg-type]
+                return None
+
+            if case is node.cases[-1]:
+                if self._is_wildcard(case.pattern):
+                    return targets.pop(), table, stmt.value  # type: ignore[return-value]
+                return None
+
+            keys = _pattern_values(case.pattern)
+            if keys is None or not all(type(key) is int for key in keys):
+                return None
+            for key in keys:
+                # the first arm matching a key wins
+                table.setdefault(key, stmt.value)  # type: ignore[arg-type]
+
+        return None
+
+    def _is_stable(self, node: ast.expr) -> bool:
+        """Indicates whether an expression has the same value every time it's evaluated"""
+
+        if _constant_value(node) is not NOT_CONSTANT:
+            return True
+        return (
+            isinstance(node, ast.Attribute)
+            and isinstance(node.value, ast.Name)
+            and node.value.id in self.modules
+        )
+
+    @staticmethod
+    def _is_wildcard(pattern: ast.pattern) -> bool:
+        return (
+            isinstance(pattern, ast.MatchAs)
+            and pattern.pattern is None
+            and pattern.name is None
+        )
+
+    def _table_name(self) -> str:
+        base = "_CASES_" + self._scope[-1].name.strip("_").upper()
+        name, count = base, 1
+        while name in self._names:
+            count += 1
+            name = f"{base}_{count}"
+        self._names.add(name)
+        return name
+
+
+class AnnotationRemover(Pass):
+    """
+    Removes annotations and attribute docstrings. The annotations of
+    arguments, returns and class attributes are evaluated when the script is
+    loaded, and keep the names they use alive.
+    """
+
+    def enter_arg(self, node: ast.arg) -> Any:
+        node.annotation = None
+        return PRUNE
+
+    def enter_FunctionDef(self, node: ast.FunctionDef) -> ast.FunctionDef:
+        node.returns = None
+        return node
+
+    def leave_AnnAssign(self, node: ast.AnnAssign) -> Optional[ast.AST]:
+        if node.value is None:
+            return None
+        assign = ast.Assign(targets=[node.target], value=node.value)
+        return ast.copy_location(assign, node)
+
+    def drop(self, stmt: ast.stmt) -> bool:
+        if isinstance(stmt, ast.AnnAssign):
+            return stmt.value is None
+        return (
+            isinstance(stmt, ast.Expr)
+            and isinstance(stmt.value, ast.Constant)
+            and isinstance(stmt.value.value, str)
+        )
+
+
+def _children(node: ast.AST) -> List[ast.AST]:
+    """Child nodes of a node, faster than `ast.iter_child_nodes`"""
+
+    children: List[ast.AST] = []
+    for name in node._fields:
+        value = getattr(node, name, None)
+        if isinstance(value, list):
+            children += [child for child in value if isinstance(child, ast.AST)]
+        elif isinstance(value, ast.AST):
+            children.append(value)
+    return children
+
+
+def _replace_child(parent: ast.AST, old: ast.AST, new: ast.AST) -> None:
+    for name in parent._fields:
+        value = getattr(parent, name, None)
+        if value is old:
+            setattr(parent, name, new)
+            return
+        if isinstance(value, list):
+            for i, child in enumerate(value):
+                if child is old:
+                    value[i] = new
+                    return
+
+
+class EnumEliminator(Pass):
+    """
+    Removes the enum classes that are only used for their members, once the
+    members are inlined:
+
+    - `_is_enum_value(E, x)` becomes `x in <frozenset of the values of E>`.
+    - `E(x)` of an `IntEnum` becomes a lookup of `x` in a dict of its values,
+      raising `KeyError` instead of `ValueError` for other values. This is
+      only done outside of `try` blocks, and when no member is used as an
+      object, e.g. for its `name`.
+
+    The members of the remaining enums which are never accessed by name are
+    removed, unless the enum is called, iterated or passed to a function.
+    Runs in its own traversal, as it needs the whole script.
+    """
+
+    barrier = True
+
+    MEMBERSHIP = "_is_enum_value"
+    """Utility testing if a value is a member of an enum"""
+
+    ENUM_BASES = ("Enum", "IntEnum", "IntFlag")
+
+    def __init__(self) -> None:
+        self.removed: List[str] = []
+        self._members: Dict[str, Dict[str, Any]] = {}
+        self._calls: List[Tuple[ast.Call, str]] = []
+        self._memberships: List[Tuple[ast.Call, str]] = []
+
+    def enter_Module(self, node: ast.Module) -> Any:
+        for stmt in node.body:
+            members = self._enum_members(stmt)
+            if members is not None:
+                self._members[stmt.name] = members  # type: ignore[attr-defined]
+        if not self._members:
+            return PRUNE
+
+        # a single walk, the script is large
+        parents: Dict[int, ast.AST] = {}
+        names: List[ast.Name] = []
+        attrs: Set[str] = set()
+        object_uses: List[ast.Attribute] = []
+        stack: List[ast.AST] = [node]
+        while stack:
+            parent = stack.pop()
+            for child in _children(parent):
+                parents[id(child)] = parent
+                stack.append(child)
+                if isinstance(child, ast.Name):
+                    if child.id in self._members and isinstance(child.ctx, ast.Load):
+                        names.append(child)
+                elif isinstance(child, ast.Attribute):
+                    attrs.add(child.attr)
+                    if child.attr in ("name", "value", "_name_", "_value_"):
+                        object_uses.append(child)
+
+        calls_allowed = self._can_lower_calls(object_uses)
+        uses: Dict[str, Set[str]] = defaultdict(set)
+        for name_node in names:
+            uses[name_node.id].add(self._classify(name_node, parents, calls_allowed))
+
+        body: List[ast.stmt] = []
+        for stmt in node.body:
+            name = getattr(stmt, "name", None)
+            if name not in self._members:
+                body.append(stmt)
+                continue
+            kinds = uses[name]
+            if kinds <= {"call", "membership"}:
+                self.removed.append(name)
+                body += self._lower(stmt, kinds)
+                continue
+            body += self._lower(stmt, kinds & {"membership"})
+            if not kinds & {"call", "dynamic"}:
+                self._prune_members(stmt, attrs)  # type: ignore[arg-type]
+            body.append(stmt)
+        node.body = body
+
+        # the calls are replaced in place, rather than in a traversal of the script
+        for call, name in self._memberships:
+            test = ast.Compare(
+                left=call.args[1],
+                ops=[ast.In()],
+                comparators=[ast.Name(self._table_name(name, "VALUES"), ast.Load())],
+            )
+            _replace_child(parents[id(call)], call, ast.copy_location(test, call))
+        for call, name in self._calls:
+            if name not in self.removed:
+                continue
+            lookup = ast.Subscript(
+                value=ast.Name(self._table_name(name, "MEMBERS"), ast.Load()),
+                slice=call.args[0],
+                ctx=ast.Load(),
+            )
+            _replace_child(parents[id(call)], call, ast.copy_location(lookup, call))
+        return PRUNE
+
+    def _enum_members(self, stmt: ast.stmt) -> Optional[Dict[str, Any]]:
+        """Returns the values of the members of an enum class with constant members"""
+
+        if not isinstance(stmt, ast.ClassDef) or stmt.decorator_list:
+            return None
+        bases = [base.id for base in stmt.bases if isinstance(base, ast.Name)]
+        if len(bases) != 1 or len(stmt.bases) != 1 or bases[0] not in self.ENUM_BASES:
+            return None
+
+        members: Dict[str, Any] = {}
+        for member in stmt.body:
+            if isinstance(member, ast.Pass):
+                continue
+            if not (
+                isinstance(member, ast.Assign)
+                and len(member.targets) == 1
+                and isinstance(member.targets[0], ast.Name)
+            ):
+                return None
+            value = _constant_value(member.value)
+            if value is NOT_CONSTANT:
+                return None
+            members[member.targets[0].id] = value
+        # plain enums don't compare equal to their values, so calls can't be lowered
+        members["__int__"] = bases[0] != "Enum"
+        return members
+
+    def _can_lower_calls(self, object_uses: List[ast.Attribute]) -> bool:
+        """Indicates whether no enum member is used as an object, e.g. for its `name`"""
+
+        member_names = {name for members in self._members.values() for name in members}
+        for node in object_uses:
+            # `color.DEFAULT.value`, with `color` one of the enums
+            owner = node.value
+            if not (
+                isinstance(owner, ast.Attribute)
+                and isinstance(owner.value, ast.Name)
+                and owner.attr in member_names
+            ):
+                return False
+        return True
+
+    def _classify(
+        self, node: ast.Name, parents: Dict[int, ast.AST], calls_allowed: bool
+    ) -> str:
+        """Returns how an enum is used: `call`, `membership`, `member` or `dynamic`"""
+
+        parent = parents.get(id(node))
+        if isinstance(parent, ast.Call):
+            if (
+                isinstance(parent.func, ast.Name)
+                and parent.func.id == self.MEMBERSHIP
+                and len(parent.args) == 2
+                and parent.args[0] is node
+                and not parent.keywords
+            ):
+                self._memberships.append((parent, node.id))
+                return "membership"
+            if (
+                parent.func is node
+                and len(parent.args) == 1
+                and not parent.keywords
+                and calls_allowed
+                and self._members[node.id]["__int__"]
+                and not self._is_in_try(parent, parents)
+            ):
+                self._calls.append((parent, node.id))
+                return "call"
+            return "dynamic"
+        if isinstance(parent, (ast.For, ast.comprehension, ast.Starred)):
+            return "dynamic"
+        return "member"
+
+    @staticmethod
+    def _is_in_try(node: ast.AST, parents: Dict[int, ast.AST]) -> bool:
+        parent = parents.get(id(node))
+        while parent is not None:
+            if isinstance(parent, (ast.Try, ast.TryStar)):
+                return True
+            if isinstance(parent, (ast.FunctionDef, ast.Lambda, ast.ClassDef)):
+                return False
+            parent = parents.get(id(parent))
+        return False
+
+    def _lower(self, enum: ast.ClassDef, kinds: Set[str]) -> List[ast.stmt]:
+        """Returns the tables replacing the uses of an enum"""
+
+        name = enum.name
+        values = [
+            value for member, value in self._members[name].items() if member != "__int__"
+        ]
+        tables: List[ast.stmt] = []
+        if "membership" in kinds:
+            frozenset_call = ast.Call(
+                func=ast.Name("frozenset", ast.Load()),
+                args=[ast.Tuple([ast.Constant(v) for v in values], ast.Load())],
+                keywords=[],
+            )
+            tables.append(self._assign(self._table_name(name, "VALUES"), frozenset_call))
+        if "call" in kinds:
+            lookup = ast.Dict(
+                keys=[ast.Constant(v) for v in values],
+                values=[ast.Constant(v) for v in values],
+            )
+            tables.append(self._assign(self._table_name(name, "MEMBERS"), lookup))
+        # the tables are located at the enum, for the source map
+        return [ast.copy_location(table, enum) for table in tables]
+
+    @staticmethod
+    def _prune_members(node: ast.ClassDef, attrs: Set[str]) -> None:
+        node.body = [
+            member
+            for member in node.body
+            if not isinstance(member, ast.Assign)
+            or getattr(member.targets[0], "id", None) in attrs
+        ] or [ast.Pass()]
+
+    @staticmethod
+    def _assign(name: str, value: ast.expr) -> ast.Assign:
+        return ast.Assign(targets=[ast.Name(name, ast.Store())], value=value)
+
+    @staticmethod
+    def _table_name(name: str, kind: str) -> str:
+        snake = re.sub(r"(?<=[a-z0-9])(?=[A-Z])", "_", name).upper()
+        return f"_{snake}_{kind}"
+
+
+class TreeShaker(Pass):
+    """
+    Removes the module-level functions, classes and assignments, and the
+    methods, which are never used. Functions named like FL Studio callbacks
+    (`On...`) are always kept. Assignments are only removed when their value
+    has no side effects, and decorated definitions are kept. Runs in its own
+    traversal until nothing else can be removed.
+    """
+
+    barrier = True
+
+    ENTRY_PREFIX = "On"
+    """Prefix of the FL Studio callbacks"""
+
+    def __init__(self) -> None:
+        self.removed: List[str] = []
+        self.names: Set[str] = set()
+        """Names used by the script, after removing everything unused"""
+
+    def enter_Module(self, node: ast.Module) -> Any:
+        # the uses of every statement and method are counted once, and those
+        # of the removed ones subtracted, instead of walking the script again
+        # after every removal
+        names: Counter[str] = Counter()
+        attrs: Counter[str] = Counter()
+        uses: Dict[int, Tuple[Counter[str], Counter[str]]] = {}
+
+        def count(stmt: ast.stmt, roots: List[ast.AST]) -> None:
+            uses[id(stmt)] = self._uses(roots)
+            names.update(uses[id(stmt)][0])
+            attrs.update(uses[id(stmt)][1])
+
+        def discard(stmt: ast.stmt) -> None:
+            for counter, used in zip((names, attrs), uses[id(stmt)]):
+                counter.subtract(used)
+            if isinstance(stmt, ast.ClassDef):
+                for member in stmt.body:
+                    discard(member)
+
+        for stmt in node.body:
+            if isinstance(stmt, ast.ClassDef):
+                count(stmt, [*stmt.bases, *stmt.keywords, *stmt.decorator_list])
+                for member in stmt.body:
+                    count(member, [member])
+            else:
+                count(stmt, [stmt])
+
+        while True:
+            removed = len(self.removed)
+            node.body = self._shake(node.body, +names, "", discard)
+            for stmt in node.body:
+                if isinstance(stmt, ast.ClassDef):
+                    used = (+names).keys() | (+attrs).keys()
+                    stmt.body = self._shake(stmt.body, used, f"{stmt.name}.", discard)
+            if len(self.removed) == removed:
+                break
+
+        for stmt in node.body:
+            if isinstance(stmt, ast.ClassDef) and not stmt.body:
+                stmt.body.append(ast.Pass())
+        node.body = node.body or [ast.Pass()]
+        self.names = set(+names)
+        return PRUNE
+
+    def _shake(
+        self,
+        stmts: List[ast.stmt],
+        names: Collection[str],
+        prefix: str,
+        discard: Callable[[ast.stmt], None],
+    ) -> List[ast.stmt]:
+        kept: List[ast.stmt] = []
+        for stmt in stmts:
+            if self._is_used(stmt, names, prefix):
+                kept.append(stmt)
+            else:
+                discard(stmt)
+        return kept
+
+    def shake_imports(self, imports: ast.Module) -> None:
+        """Removes the imports of names the script doesn't use"""
+
+        body: List[ast.stmt] = []
+        for stmt in imports.body:
+            if isinstance(stmt, (ast.Import, ast.ImportFrom)):
+                aliases = [
+                    alias
+                    for alias in stmt.names
+                    if (alias.asname or alias.name).split(".")[0] in self.names
+                ]
+                if not aliases:
+                    self.removed.append(f"import {ast.unparse(stmt)}")
+                    continue
+                stmt.names = aliases
+            body.append(stmt)
+        imports.body = body
+
+    @staticmethod
+    def _uses(roots: List[ast.AST]) -> Tuple[Counter[str], Counter[str]]:
+        """Counts the names read by the nodes and the attribute names they access"""
+
+        names: Counter[str] = Counter()
+        attrs: Counter[str] = Counter()
+        nodes = list(roots)
+        for node in nodes:
+            nodes += _children(node)
+            if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Store):
+                names[node.id] += 1
+            elif isinstance(node, ast.Attribute):
+                attrs[node.attr] += 1
+            elif isinstance(node, (ast.Global, ast.Nonlocal)):
+                names.update(node.names)
+        return names, attrs
+
+    def _is_used(self, stmt: ast.stmt, names: Collection[str], prefix: str) -> bool:
+        if isinstance(stmt, (ast.FunctionDef, ast.ClassDef)):
+            name = stmt.name
+            if (
+                stmt.decorator_list
+                or name in names
+                or (name.startswith("__") and name.endswith("__"))
+                or (not prefix and name.startswith(self.ENTRY_PREFIX))
+            ):
+                return True
+        elif isinstance(stmt, ast.Assign) and not prefix:
+            targets = [target for target in stmt.targets if isinstance(target, ast.Name)]
+            if len(targets) != len(stmt.targets) or not self._is_pure(stmt.value):
+                return True
+            if any(target.id in names for target in targets):
+                return True
+            name = ", ".join(target.id for target in targets)
+        else:
+            return True
+
+        self.removed.append(prefix + name)
+        return False
+
+    @classmethod
+    def _is_pure(cls, node: ast.expr) -> bool:
+        """Indicates whether evaluating an expression has no side effects"""
+
+        if isinstance(node, (ast.Constant, ast.Name, ast.Lambda)):
+            return True
+        if isinstance(node, ast.Attribute):
+            return isinstance(node.value, ast.Name)
+        if isinstance(node, (ast.Tuple, ast.List, ast.Set)):
+            return all(cls._is_pure(elt) for elt in node.elts)
+        if isinstance(node, ast.Dict):
+            return all(
+                cls._is_pure(part)
+                for part in (*node.keys, *node.values)
+                if part is not None
+            )
+        if isinstance(node, ast.Subscript):
+            return cls._is_pure(node.value) and cls._is_pure(node.slice)
+        if isinstance(node, ast.BinOp):
+            return cls._is_pure(node.left) and cls._is_pure(node.right)
+        if isinstance(node, ast.UnaryOp):
+            return cls._is_pure(node.operand)
+        return False
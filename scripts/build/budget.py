@@ -0,0 +1,104 @@
+import contextlib
+import io
+import logging
+import statistics
+import sys
+import time
+import types
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+from config import cfg
+
+__all__ = ["Measurement", "measure", "check_budgets"]
+
+logger = logging.getLogger(__name__)
+
+# scripts/flsim, the stand-in for the FL Studio API
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+FIRST_NOTE = 0
+"""Pad note hit after `OnInit`, in the default pad mode"""
+
+
+@dataclass
+class Measurement:
+    """Medians of the loading costs of a built script"""
+
+    import_ms: float
+    """Time to compile and run the module, which creates the controller"""
+
+    init_ms: float
+    """Time spent in `OnInit`"""
+
+    init_messages: int
+    """MIDI and SysEx messages sent by `OnInit`"""
+
+    first_note_ms: float
+    """Time spent in the first `OnNoteOn` after `OnInit`"""
+
+
+def measure(source: str, runs: int) -> Optional[Measurement]:
+    """
+    Loads the script `runs` times against a fresh simulation of FL Studio,
+    like FL Studio does when the script is selected. What the script prints,
+    e.g. the profiler report of `OnDeInit`, is silenced. Returns None when the
+    simulation can't be imported.
+    """
+
+    try:
+        from flsim import FLSim
+    except ImportError as e:
+        logger.warning(f"Can't simulate FL Studio to measure the script: {e}")
+        return None
+
+    samples: List[Measurement] = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(runs):
+            sim = FLSim().install()
+            script = types.ModuleType(cfg.OUT_PATH.stem)
+
+            start = time.perf_counter()
+            exec(compile(source, str(cfg.OUT_PATH), "exec"), script.__dict__)
+            imported = time.perf_counter()
+            sim.reset()
+            script.OnInit()
+            initialized = time.perf_counter()
+            messages = len(sim.messages) + len(sim.sysex)
+            sim.note_on(script, FIRST_NOTE, 100)
+            noted = time.perf_counter()
+
+            sim.note_on(script, FIRST_NOTE, 0)
+            script.OnDeInit()
+            samples.append(
+                Measurement(
+                    import_ms=(imported - start) * 1000,
+                    init_ms=(initialized - imported) * 1000,
+                    init_messages=messages,
+                    first_note_ms=(noted - initialized) * 1000,
+                )
+            )
+
+    return Measurement(
+        import_ms=statistics.median(s.import_ms for s in samples),
+        init_ms=statistics.median(s.init_ms for s in samples),
+        init_messages=max(s.init_messages for s in samples),
+        first_note_ms=statistics.median(s.first_note_ms for s in samples),
+    )
+
+
+def check_budgets(measurement: Measurement) -> List[str]:
+    """Returns a description of every budget of `cfg` the measurement exceeds"""
+
+    checks = (
+        ("import", measurement.import_ms, cfg.IMPORT_BUDGET_MS, "ms"),
+        ("OnInit", measurement.init_ms, cfg.INIT_BUDGET_MS, "ms"),
+        ("OnInit", measurement.init_messages, cfg.INIT_MESSAGES_BUDGET, "messages"),
+        ("first OnNoteOn", measurement.first_note_ms, cfg.FIRST_NOTE_BUDGET_MS, "ms"),
+    )
+    return [
+        f"{name}: {value:g} {unit} over the budget of {budget:g} {unit}"
+        for name, value, budget, unit in checks
+        if value > budget
+    ]
@@ -1,83 +1,447 @@
 """Build script to generate a single-file MIDI script"""
 
 import ast
-import black
 import logging
+import os
+import pickle
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import Callable, Dict, List, Optional, Tuple
 
 from config import *
 from ast_tools import *
 from argparser import init_parser
+from budget import check_budgets, measure
+from cache import BuildCache
+from formatter import ChunkFormatter
+from note_tables import NoteTableError, pack_note_tables
+from sourcemap import SourceMap, tag_lines
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.DEBUG, format="[%(levelname)s] %(message)s")
 
+_formatter = ChunkFormatter()
+"""Chunks of the script formatted by this process, reused by the builds of `--watch`"""
 
-body_collector = BodyCollector()
-imports_collector = ImportsCollector()
-const_collector = ConstCollector()
-enum_collector = EnumCollector()
+type Collected = Tuple[List[ast.stmt], List[ast.stmt], Consts, Enums]
+"""Body statements, imports, constants and enums of a module"""
 
 
-def _process_module(mod_path: Path) -> None:
-    source = mod_path.read_text(encoding="utf-8")
-    tree = ast.parse(source, mod_path.name)
+def _collect_module(name: str, source: bytes, index: int) -> bytes:
+    """
+    Parses a module and returns its pickled `Collected` results, with the line
+    numbers of the `index`-th module for the source map
+    """
 
-    body_collector.visit(tree)
-    imports_collector.visit(tree)
-    const_collector.visit(tree)
-    enum_collector.visit(tree)
+    tree = ast.parse(source, name)
+    tag_lines(tree, index)
 
+    body_collector = BodyCollector()
+    imports_collector = ImportsCollector()
+    const_collector = ConstCollector()
+    enum_collector = EnumCollector()
+    PassManager(
+        [body_collector, imports_collector, const_collector, enum_collector]
+    ).run(tree)
 
-def _process_modules_and_packages() -> None:
+    collected: Collected = (
+        body_collector.body.body,
+        imports_collector.imports.body,
+        const_collector.consts,
+        enum_collector.enums,
+    )
+    return pickle.dumps(collected)
+
+
+def _module_paths() -> List[Path]:
+    paths: List[Path] = []
     for pkg in cfg.PACKAGES:
         pkg_path: Path = cfg.SRC / pkg
         if not Path.exists(pkg_path):
             logger.warning(f"Package {pkg} not found, skipping.")
             continue
         pkg_files: List[Path] = list(pkg_path.glob("*.py"))
-        for mod_path in sorted(pkg_files):
-            _process_module(mod_path)
+        paths += sorted(pkg_files)
 
     for mod in cfg.MODULES:
+        if mod == cfg.PROFILER_MODULE and not cfg.PROFILE:
+            continue
         mod_path: Path = cfg.SRC / f"{mod}.py"
         if not Path.exists(mod_path):
             logger.warning(f"Module {mod}.py not found, skipping.")
             continue
-        _process_module(mod_path)
-
-
-def _write_out() -> None:
-    with open(cfg.OUT_PATH, "w", encoding="utf-8") as out:
-        out.write(f"# name={cfg.SCRIPT_NAME}\n\n")
-        out.write(cfg.HEADER + "\n\n")
-
-        imports = ImportsRemover().visit(imports_collector.imports)
-        ast.fix_missing_locations(imports)
-        out.write(ast.unparse(imports) + "\n\n\n")
-
-        body = body_collector.body
-        consts = const_collector.consts
-        enums = enum_collector.enums
-
-        body = AllRemover().visit(body)
-        body = FlMidiMsgRemover().visit(body)
-        body = DocstringRemover().visit(body)
-        body = ConstInliner(consts).visit(body)
-        body = ConstRemover(consts).visit(body)
-        body = EnumInliner(enums).visit(body)
-        ast.fix_missing_locations(body)
-        out.write(ast.unparse(body))
-
-
-def _format_out() -> None:
-    black.format_file_in_place(
-        cfg.OUT_PATH,
-        fast=True,
-        mode=black.FileMode(),
-        write_back=black.WriteBack.YES,
+        paths.append(mod_path)
+
+    return paths
+
+
+def _collect_modules(
+    cache: BuildCache, paths: List[Path], sources: List[bytes], keys: List[str]
+) -> List[Collected]:
+    """Loads the collected results of every module, parsing the changed ones in parallel"""
+
+    results = [cache.load_module(key) for key in keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+
+    if len(missing) > 1:
+        workers = min(len(missing), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parsed = pool.map(
+                _collect_module,
+                [paths[i].name for i in missing],
+                [sources[i] for i in missing],
+                missing,
+            )
+            for i, result in zip(missing, parsed):
+                results[i] = result
+    elif missing:
+        i = missing[0]
+        results[i] = _collect_module(paths[i].name, sources[i], i)
+
+    for i in missing:
+        cache.store_module(keys[i], results[i])  # type: ignore[arg-type]
+    logger.debug(f"Parsed {len(missing)} modules, {len(keys) - len(missing)} cached")
+
+    return [pickle.loads(result) for result in results]  # type: ignore[arg-type]
+
+
+def _generate(
+    modules: List[Collected], shake: bool = True
+) -> Tuple[ast.Module, ast.Module]:
+    """Returns the imports and the body of the script, without the unused code unless `shake` is off"""
+
+    body = ast.Module(body=[], type_ignores=[])
+    imports = ast.Module(body=[], type_ignores=[])
+    consts: Consts = {}
+    enums: Enums = {}
+    for mod_body, mod_imports, mod_consts, mod_enums in modules:
+        body.body += mod_body
+        imports.body += mod_imports
+        consts.update(mod_consts)
+        enums.update(mod_enums)
+
+    tables = pack_note_tables(consts, enums)
+    # timing the tables for the report would slow down every build
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(tables.report())
+
+    imports = ImportsRemover().visit(imports)
+    ast.fix_missing_locations(imports)
+    modules = {
+        alias.asname or alias.name
+        for stmt in imports.body
+        if isinstance(stmt, ast.Import)
+        for alias in stmt.names
+    }
+
+    passes: List[Pass] = []
+    if cfg.PROFILE:
+        consts["PROFILER"] = ast.Constant(True)
+    else:
+        passes.append(ProfilerRemover())
+
+    passes += [
+        AllRemover(),
+        FlMidiMsgRemover(),
+        DocstringRemover(),
+        ConstInliner(consts),
+        ConstRemover(consts),
+        EnumInliner(enums),
+        folder := ConstantFolder(),
+        lowering := MatchLowering(modules),
+    ]
+    if shake:
+        passes += [
+            AnnotationRemover(),
+            enum_eliminator := EnumEliminator(),
+            shaker := TreeShaker(),
+        ]
+    transforms = PassManager(passes, timed=logger.isEnabledFor(logging.DEBUG))
+    # the locations are only needed by the source map, which skips the nodes without
+    # any, so they aren't fixed after the passes
+    body = transforms.run(body)
+    if not shake:
+        return imports, body
+
+    shaker.shake_imports(imports)
+    for line in transforms.report():
+        logger.debug(line)
+    _report_folds(folder.folds + lowering.lowered)
+    logger.debug(
+        f"Removed {len(enum_eliminator.removed)} enums and "
+        f"{len(shaker.removed)} unused definitions and imports"
     )
+    return imports, body
+
+
+def _prelude(imports: ast.Module) -> str:
+    return f"# name={cfg.SCRIPT_NAME}\n\n" + cfg.HEADER + "\n\n" + ast.unparse(imports)
+
+
+def _report_folds(folds: List[Tuple[str, str, str]]) -> None:
+    logger.debug(f"Folded {len(folds)} expressions, branches and matches")
+    if cfg.FOLD_REPORT is None:
+        return
+
+    with open(cfg.FOLD_REPORT, "w", encoding="utf-8") as out:
+        for scope, before, after in folds:
+            out.write(f"{scope}: {before}  ->  {after}\n")
+    logger.info(f"Wrote the folds to {cfg.FOLD_REPORT.resolve()}")
+
+
+def _report_size(before: str, after: str) -> None:
+    """Logs the size and import time of the script without and with the unused code removed"""
+
+    for label, source in (("before", before), ("after", after)):
+        size = len(source.encode())
+        lines = source.count("\n")
+        measurement = measure(source, cfg.MEASURE_RUNS)
+        imported = (
+            f", imported in {measurement.import_ms:.2f} ms" if measurement else ""
+        )
+        logger.info(f"Script {label} tree shaking: {size} bytes, {lines} lines{imported}")
+
+
+def _check_budgets(output: str, cache: BuildCache) -> bool:
+    """
+    Logs the loading costs of the script, returns False when one exceeds its
+    budget. The costs of a script measured by a previous build are reused.
+    """
+
+    measurement = cache.load_measurement(output)
+    if measurement is None:
+        measurement = measure(output, cfg.MEASURE_RUNS)
+        if measurement is None:
+            return True
+        cache.store_measurement(output, measurement)
+
+    logger.info(
+        f"Import {measurement.import_ms:.2f} ms, "
+        f"OnInit {measurement.init_ms:.2f} ms and {measurement.init_messages} messages, "
+        f"first OnNoteOn {measurement.first_note_ms:.3f} ms"
+    )
+    failures = check_budgets(measurement)
+    for failure in failures:
+        logger.error(f"Budget exceeded, {failure}")
+    return not failures
+
+
+def _log_note_tables(error: NoteTableError) -> None:
+    logger.error(f"Invalid scales or chord sets in {cfg.SRC / 'notes.py'}:")
+    for problem in error.problems:
+        logger.error(f"  {problem}")
+
+
+def _build(cache: BuildCache) -> Tuple[str, Callable[[], str]]:
+    """
+    Returns the formatted script and a function returning its source map,
+    reusing everything unchanged since a previous build. The source map is
+    only made when needed, after the script is deployed.
+    """
+
+    paths = _module_paths()
+    sources = [path.read_bytes() for path in paths]
+    keys = [
+        cache.module_key(path, source, index)
+        for index, (path, source) in enumerate(zip(paths, sources))
+    ]
+
+    build_key = cache.build_key(keys)
+    # the reports need the transforms to run
+    reported = cfg.FOLD_REPORT is not None or cfg.SIZE_REPORT
+    output = cache.load_build(build_key) if not reported else None
+    cached_map = cache.load_map(build_key)
+    if output is not None and cached_map is not None:
+        logger.debug("No changes since the previous build")
+        return output, lambda: cached_map  # type: ignore[return-value]
+
+    imports, body = _generate(_collect_modules(cache, paths, sources, keys))
+    output_key, output = _format_cached(cache, imports, body)
+    cache.store_build(build_key, output_key)
+
+    def source_map() -> str:
+        tree = ast.Module(body=imports.body + body.body, type_ignores=[])
+        names = [path.as_posix() for path in paths]
+        built = SourceMap.build(output, tree, names).dumps()
+        cache.store_map(build_key, built)
+        return built
+
+    if cfg.SIZE_REPORT:
+        # the passes change the trees, the modules are loaded again for the other build
+        modules = _collect_modules(cache, paths, sources, keys)
+        _, before = _format_cached(cache, *_generate(modules, shake=False))
+        _report_size(before, output)
+    return output, source_map
+
+
+def _format_cached(
+    cache: BuildCache, imports: ast.Module, body: ast.Module
+) -> Tuple[str, str]:
+    """Returns the key of the formatted script and the script"""
+
+    chunks = _formatter.unparse(_prelude(imports), body.body)
+    output_key = cache.output_key("\n".join(source for _, _, source in chunks))
+    output = cache.load_output(output_key)
+    if output is None:
+        formatted = _formatter.formatted
+        output = _formatter.format(chunks, cache)
+        logger.debug(f"Formatted {_formatter.formatted - formatted} chunks of the script")
+        cache.store_output(output_key, output)
+    else:
+        logger.debug("Generated script unchanged, skipping formatting")
+    return output_key, output
+
+
+def _is_changed(path: Path, output: str) -> bool:
+    return not path.exists() or path.read_text(encoding="utf-8") != output
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    # FL Studio never sees a partly written script
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _write_out(output: str, cache: BuildCache, check_budgets: bool) -> bool:
+    """
+    Writes and deploys the script. Returns False when the script exceeds its
+    budgets, keeping the previous one. The budgets are checked even when the
+    script is up to date, so lowering one fails the next build.
+    """
+
+    changed = _is_changed(cfg.OUT_PATH, output)
+    if check_budgets and not _check_budgets(output, cache):
+        if changed:
+            logger.error(f"Kept the previous MIDI script at {cfg.OUT_PATH.resolve()}")
+        return False
+
+    # an unchanged file is left as is, so FL Studio doesn't reload the script
+    if not changed:
+        logger.info(f"MIDI script at {cfg.OUT_PATH.resolve()} is up to date")
+    else:
+        _write_atomic(cfg.OUT_PATH, output)
+        logger.info(f"Built MIDI script at {cfg.OUT_PATH.resolve()}")
+
+    for directory in cfg.DEPLOY_DIRS:
+        deployed = directory / cfg.OUT_PATH.name
+        if _is_changed(deployed, output):
+            _write_atomic(deployed, output)
+            logger.info(f"Deployed MIDI script to {deployed.resolve()}")
+    return True
+
+
+def _write_map(source_map: str) -> None:
+    map_path = SourceMap.path(cfg.OUT_PATH)
+    if _is_changed(map_path, source_map):
+        _write_atomic(map_path, source_map)
+
+
+def _stat(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+WARM_UP_SOURCE = """
+class Warm:
+    def up(self, value: int) -> None:
+        match value:
+            case 0:
+                print(f"{value}", [value], {value: (value,)})
+"""
+"""Module formatted when watching starts, covering the syntax of the script"""
+
+
+def _warm_up() -> None:
+    """
+    Runs black and the passes once, so the first save isn't built while they
+    start cold. The cache isn't used, the script built is thrown away.
+    """
+
+    import black
+
+    black.format_str(WARM_UP_SOURCE, mode=black.FileMode())
+    paths = _module_paths()
+    try:
+        modules = [
+            pickle.loads(_collect_module(path.name, path.read_bytes(), index))
+            for index, path in enumerate(paths)
+        ]
+        imports, body = _generate(modules)
+    except Exception:
+        # the first build reports the error
+        return
+    _formatter.unparse(_prelude(imports), body.body)
+
+
+def _watch() -> None:
+    """
+    Builds and deploys the script whenever a module is saved, until
+    interrupted. Modules are polled by modification time and size, and only
+    the changed ones are parsed again. The budgets are checked after
+    deploying, so they don't delay it. Black and the passes are warmed up
+    before the first poll.
+    """
+
+    # the pass timings and cache details would flood the output, and timing
+    # the passes slows the build down
+    logging.getLogger().setLevel(logging.INFO)
+
+    start_ns = time.time_ns()
+    _warm_up()
+    logger.info(f"Warmed up in {(time.time_ns() - start_ns) / 1e6:.0f} ms")
+
+    paths = _module_paths()
+    stats: Dict[Path, Optional[Tuple[int, int]]] = {}
+    logger.info(f"Watching {len(paths)} modules of {cfg.SRC.resolve()}...")
+
+    while True:
+        changed = [path for path in paths if _stat(path) != stats.get(path)]
+        if not changed:
+            time.sleep(cfg.WATCH_INTERVAL)
+            continue
+
+        start_ns = time.time_ns()
+        # the first build isn't timed from the last changes
+        first = not stats
+        stats = {path: _stat(path) for path in paths}
+        saved_ns = max(
+            (stat[0] for path in changed if (stat := stats[path]) is not None),
+            default=start_ns,
+        )
+        try:
+            cache = BuildCache()
+            output, source_map = _build(cache)
+            _write_out(output, cache, check_budgets=False)
+        except NoteTableError as e:
+            _log_note_tables(e)
+            logger.error("Waiting for changes...")
+            continue
+        except Exception:
+            logger.exception("Build failed, waiting for changes...")
+            continue
+
+        deployed_ns = time.time_ns()
+        built = f"built in {(deployed_ns - start_ns) / 1e6:.0f} ms"
+        if first:
+            logger.info(built.capitalize())
+        else:
+            names = ", ".join(path.name for path in changed)
+            logger.info(
+                f"Deployed {(deployed_ns - saved_ns) / 1e6:.0f} ms after saving "
+                f"{names} ({built})"
+            )
+
+        _write_map(source_map())
+        cache.prune()
+        if cfg.CHECK_BUDGETS:
+            _check_budgets(output, cache)
 
 
 def main() -> None:
@@ -88,12 +452,31 @@ def main() -> None:
     args = parser.parse_args()
     cfg.OUT_PATH = Path(args.out)
     cfg.SCRIPT_NAME = str(args.name)
+    cfg.PROFILE = bool(args.profile)
+    cfg.NO_CACHE = bool(args.no_cache)
+    cfg.FOLD_REPORT = args.fold_report
+    cfg.SIZE_REPORT = bool(args.size_report)
+    cfg.CHECK_BUDGETS = bool(args.check_budgets)
+    cfg.DEPLOY_DIRS += args.deploy
 
-    _process_modules_and_packages()
-    _write_out()
-    _format_out()
+    if args.watch:
+        try:
+            _watch()
+        except KeyboardInterrupt:
+            logger.info("Stopped watching")
+        return
 
-    logger.info(f"Done. Built MIDI script at {cfg.OUT_PATH.resolve()}")
+    cache = BuildCache()
+    try:
+        output, source_map = _build(cache)
+    except NoteTableError as e:
+        _log_note_tables(e)
+        sys.exit(1)
+    cache.prune()
+    if not _write_out(output, cache, check_budgets=cfg.CHECK_BUDGETS):
+        sys.exit(1)
+    _write_map(source_map())
+    logger.info("Done.")
 
 
 if __name__ == "__main__":
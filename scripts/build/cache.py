@@ -0,0 +1,218 @@
+import dataclasses
+import hashlib
+import importlib.util
+import json
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+from budget import Measurement
+from config import cfg
+
+__all__ = ["BuildCache"]
+
+BUILD_DIR = Path(__file__).resolve().parent
+
+# the simulated FL Studio API the scripts are measured against
+FLSIM_DIR = BUILD_DIR.parent / "flsim"
+
+# config options which don't change the built script
+UNKEYED = (
+    "OUT_PATH",
+    "DEPLOY_DIRS",
+    "WATCH_INTERVAL",
+    "CACHE_DIR",
+    "NO_CACHE",
+    "FOLD_REPORT",
+    "SIZE_REPORT",
+    "CHECK_BUDGETS",
+    "IMPORT_BUDGET_MS",
+    "INIT_BUDGET_MS",
+    "INIT_MESSAGES_BUDGET",
+    "FIRST_NOTE_BUDGET_MS",
+    "MEASURE_RUNS",
+)
+
+# formatted outputs kept, e.g. for switching between regular and profile builds
+KEEP_OUTPUTS = 8
+
+
+def _hash(*parts: str | bytes) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode() if isinstance(part, str) else part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _black_version() -> str:
+    # importing black takes longer than a build without changes
+    spec = importlib.util.find_spec("black")
+    if spec is None or spec.origin is None:
+        return ""
+    stat = Path(spec.origin).stat()
+    return f"{spec.origin}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class BuildCache:
+    """
+    Content-hashed cache of the build in `cfg.CACHE_DIR`.
+
+    - `modules/<key>.pickle` holds the collected results of a module, keyed
+      by its source and the build toolchain.
+    - `outputs/<key>.py` holds a formatted script, keyed by its unformatted source.
+    - `chunks/<key>.py` holds a formatted chunk of a script (see
+      `ChunkFormatter`), keyed by its unformatted source.
+    - `builds/<key>` holds the key of the output of a build, keyed by the
+      toolchain, the config and all the modules, and `builds/<key>.map` the
+      source map of the output.
+    - `measurements/<key>.json` holds the loading costs of a script (see
+      `budget.measure`), keyed by the script and the simulated FL Studio API.
+
+    Every key includes the build scripts and the Python and black installs, so
+    changing any of them invalidates the cache. With `cfg.NO_CACHE`, nothing
+    is loaded from the cache, but the results are still stored.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = not cfg.NO_CACHE
+        self.root = cfg.CACHE_DIR
+        self._toolchain = _hash(
+            sys.version,
+            _black_version(),
+            *(path.read_bytes() for path in sorted(BUILD_DIR.glob("*.py"))),
+        )
+        self._used_modules: List[Path] = []
+
+    def module_key(self, mod_path: Path, source: bytes, index: int) -> str:
+        # the index is in the line numbers of the module, see `sourcemap.tag_lines`
+        key = _hash(self._toolchain, mod_path.name, str(index), source)
+        self._used_modules.append(self._module_path(key))
+        return key
+
+    def build_key(self, module_keys: List[str]) -> str:
+        config = {
+            name: value for name, value in vars(cfg).items() if name not in UNKEYED
+        }
+        config["SRC"] = cfg.SRC
+        return _hash(self._toolchain, repr(sorted(config.items())), *module_keys)
+
+    def load_module(self, key: str) -> Optional[bytes]:
+        """Returns the pickled collected results of a module, if they're in the cache"""
+
+        path = self._module_path(key)
+        if not self.enabled or not path.exists():
+            return None
+        return path.read_bytes()
+
+    def store_module(self, key: str, data: bytes) -> None:
+        self._write(self._module_path(key), data)
+
+    def load_build(self, key: str) -> Optional[str]:
+        """Returns the formatted output of a build, if it's in the cache"""
+
+        path = self._path("builds", key)
+        if not self.enabled or not path.exists():
+            return None
+        return self.load_output(path.read_text())
+
+    def store_build(self, key: str, output_key: str) -> None:
+        self._write(self._path("builds", key), output_key.encode())
+
+    def load_map(self, key: str) -> Optional[str]:
+        """Returns the source map of the output of a build, if it's in the cache"""
+
+        path = self._path("builds", f"{key}.map")
+        if not self.enabled or not path.exists():
+            return None
+        return path.read_text(encoding="utf-8")
+
+    def store_map(self, key: str, source_map: str) -> None:
+        self._write(self._path("builds", f"{key}.map"), source_map.encode())
+
+    def output_key(self, unformatted: str) -> str:
+        return _hash(self._toolchain, unformatted)
+
+    def load_output(self, key: str) -> Optional[str]:
+        path = self._path("outputs", f"{key}.py")
+        if not self.enabled or not path.exists():
+            return None
+        path.touch()
+        return path.read_text(encoding="utf-8")
+
+    def store_output(self, key: str, output: str) -> None:
+        self._write(self._path("outputs", f"{key}.py"), output.encode())
+
+    def load_chunk(self, source: str) -> Optional[str]:
+        path = self._path("chunks", f"{_hash(self._toolchain, source)}.py")
+        if not self.enabled or not path.exists():
+            return None
+        path.touch()
+        return path.read_text(encoding="utf-8")
+
+    def store_chunk(self, source: str, formatted: str) -> None:
+        path = self._path("chunks", f"{_hash(self._toolchain, source)}.py")
+        self._write(path, formatted.encode())
+
+    def load_measurement(self, output: str) -> Optional[Measurement]:
+        """Returns the loading costs of a formatted script, if they're in the cache"""
+
+        path = self._measurement_path(output)
+        if not self.enabled or not path.exists():
+            return None
+        path.touch()
+        return Measurement(**json.loads(path.read_text()))
+
+    def store_measurement(self, output: str, measurement: Measurement) -> None:
+        data = json.dumps(dataclasses.asdict(measurement))
+        self._write(self._measurement_path(output), data.encode())
+
+    def prune(self) -> None:
+        """
+        Removes the modules not used by this build, the oldest outputs and the
+        chunks and measurements not used since the oldest output kept
+        """
+
+        used = set(self._used_modules)
+        for path in self._path("modules").glob("*.pickle"):
+            if path not in used:
+                path.unlink()
+
+        outputs = sorted(
+            self._path("outputs").glob("*.py"), key=lambda path: path.stat().st_mtime
+        )
+        kept = {path.stem for path in outputs[-KEEP_OUTPUTS:]}
+        for path in outputs[:-KEEP_OUTPUTS]:
+            path.unlink()
+        if outputs:
+            oldest = outputs[-KEEP_OUTPUTS:][0].stat().st_mtime
+            for path in (
+                *self._path("chunks").glob("*.py"),
+                *self._path("measurements").glob("*.json"),
+            ):
+                if path.stat().st_mtime < oldest:
+                    path.unlink()
+        for path in self._path("builds").glob("*"):
+            if path.suffix:
+                continue
+            if path.read_text() not in kept:
+                path.unlink()
+                path.with_suffix(".map").unlink(missing_ok=True)
+
+    def _measurement_path(self, output: str) -> Path:
+        flsim = (path.read_bytes() for path in sorted(FLSIM_DIR.glob("*.py")))
+        key = _hash(self._toolchain, *flsim, output)
+        return self._path("measurements", f"{key}.json")
+
+    def _module_path(self, key: str) -> Path:
+        return self._path("modules", f"{key}.pickle")
+
+    def _path(self, *parts: str) -> Path:
+        return self.root.joinpath(*parts)
+
+    @staticmethod
+    def _write(path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_bytes(data)
+        tmp.replace(path)
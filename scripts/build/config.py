@@ -1,5 +1,5 @@
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 from dataclasses import dataclass, field
 
 __all__ = ["cfg"]
@@ -24,7 +24,11 @@ class Config:
             "consts",
             "enums",
             "notes",
+            "leds",
             "utilities",
+            "profiler",
+            "scheduler",
+            "coalescer",
             "controller",
             "main",
         ]
@@ -32,6 +36,41 @@ class Config:
 
     SCRIPT_NAME: str = "NI Maschine MK3"
 
+    # Folders the built script is copied to, e.g. the `Settings/Hardware/<folder>`
+    # folder of FL Studio. More can be added with --deploy.
+    DEPLOY_DIRS: List[Path] = field(default_factory=list[Path])
+
+    # Seconds between two polls of the modules with --watch
+    WATCH_INTERVAL: float = 0.02
+
+    # Cache of the parsed modules and formatted outputs of previous builds.
+    # Skipped with --no-cache.
+    CACHE_DIR: Path = Path(".build_cache")
+    NO_CACHE: bool = False
+
+    # Keep the hot-path profiler in the built script.
+    # Otherwise its module, decorators and calls are stripped.
+    PROFILE: bool = False
+    PROFILER_MODULE: str = "profiler"
+
+    # File listing every constant expression and branch folded by the build
+    FOLD_REPORT: Optional[Path] = None
+
+    # Log the size and import time of the script with and without the unused
+    # code removed. Times the imports when scripts/flsim can be imported.
+    SIZE_REPORT: bool = False
+
+    # Budgets of the loading costs of the script, measured against
+    # scripts/flsim whenever the built script changes. The build fails and
+    # keeps the previous script when one is exceeded. Skipped with --no-budgets.
+    CHECK_BUDGETS: bool = True
+    IMPORT_BUDGET_MS: float = 40.0
+    INIT_BUDGET_MS: float = 5.0
+    INIT_MESSAGES_BUDGET: int = 200
+    FIRST_NOTE_BUDGET_MS: float = 1.0
+    # Runs measured by the budgets and the size report, the medians are used
+    MEASURE_RUNS: int = 20
+
     HEADER: str = """
     # ------------------------------------------------------------------------- #
     #  THIS FILE IS AUTO-GENERATED                                              #
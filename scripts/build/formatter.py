@@ -0,0 +1,104 @@
+import ast
+from typing import Dict, List, Optional, Tuple
+
+from cache import BuildCache
+
+__all__ = ["Chunk", "ChunkFormatter"]
+
+DEFINITIONS = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+type Chunk = Tuple[int, str, str]
+"""Blank lines before the chunk, its kind (`stmt`, `header` or `member`) and unformatted source"""
+
+
+class ChunkFormatter:
+    """
+    Formats the script with black one chunk at a time, reusing the chunks
+    formatted before by this process or found in the build cache. A chunk is
+    a top-level statement, or a member of a top-level class, so changing a
+    method only formats the method again.
+
+    Black formats a statement the same on its own as in the whole script,
+    except for the blank lines around it, which follow its rules for the
+    output of `ast.unparse`: two blank lines around top-level definitions,
+    one around methods and none between other statements.
+    """
+
+    def __init__(self) -> None:
+        self._formatted: Dict[str, str] = {}
+        self.formatted = 0
+        """Chunks formatted with black, i.e. not reused"""
+
+    def unparse(self, prelude: str, body: List[ast.stmt]) -> List[Chunk]:
+        """Splits the `prelude` (imports and comments) and `body` of the script in chunks"""
+
+        chunks: List[Chunk] = [(0, "stmt", prelude)]
+        previous: Optional[ast.stmt] = None
+        for stmt in body:
+            blank_lines = 2 if previous is None else self._blank_lines(previous, stmt, 2)
+            if isinstance(stmt, ast.ClassDef) and not stmt.decorator_list:
+                chunks += self._class(blank_lines, stmt)
+            else:
+                chunks.append((blank_lines, "stmt", ast.unparse(stmt)))
+            previous = stmt
+        return chunks
+
+    def format(self, chunks: List[Chunk], cache: BuildCache) -> str:
+        return "".join(
+            "\n" * blank_lines + self._format(kind, source, cache)
+            for blank_lines, kind, source in chunks
+        )
+
+    def _class(self, blank_lines: int, node: ast.ClassDef) -> List[Chunk]:
+        members, node.body = node.body, [ast.Pass()]
+        try:
+            chunks: List[Chunk] = [(blank_lines, "header", ast.unparse(node))]
+        finally:
+            node.body = members
+
+        previous: Optional[ast.stmt] = None
+        for member in members:
+            if previous is None:
+                # `ast.unparse` puts an empty line between a class and its first method
+                blank_lines = int(isinstance(member, DEFINITIONS))
+            else:
+                blank_lines = self._blank_lines(previous, member, 1)
+            # in a class of its own for its indentation, and after `pass` so a
+            # string isn't formatted as the docstring of the class
+            wrapper = ast.ClassDef(
+                name="_",
+                bases=[],
+                keywords=[],
+                body=[ast.Pass(), member],
+                decorator_list=[],
+                type_params=[],
+            )
+            chunks.append((blank_lines, "member", ast.unparse(wrapper)))
+            previous = member
+        return chunks
+
+    @staticmethod
+    def _blank_lines(previous: ast.stmt, stmt: ast.stmt, around_definitions: int) -> int:
+        if isinstance(previous, DEFINITIONS) or isinstance(stmt, DEFINITIONS):
+            return around_definitions
+        return 0
+
+    def _format(self, kind: str, source: str, cache: BuildCache) -> str:
+        formatted = self._formatted.get(source)
+        if formatted is None:
+            formatted = cache.load_chunk(source)
+        if formatted is None:
+            import black  # slow to import, only needed when the script changed
+
+            formatted = black.format_str(source, mode=black.FileMode())
+            if kind == "header":
+                formatted = formatted.removesuffix("    pass\n")
+            elif kind == "member":
+                lines = formatted.split("\n")[2:]
+                while lines and not lines[0]:
+                    lines.pop(0)
+                formatted = "\n".join(lines)
+            cache.store_chunk(source, formatted)
+            self.formatted += 1
+        self._formatted[source] = formatted
+        return formatted
@@ -0,0 +1,196 @@
+"""
+Checks the scales and chord sets of `src/notes.py` and packs them into bytes.
+
+`SCALES` and `CHORD_SETS` are lists of lists, easy to edit but allocated
+again whenever the script compiles the notes of the pads. The build replaces
+the tables computed from them at import, `SCALE_TABLE`, `CHORD_TABLE` and
+`CHORD_OFFSETS`, with literals the script indexes directly:
+
+- `SCALE_TABLE`: `NOTES_COUNT` notes of every scale
+- `CHORD_TABLE`: every chord as its number of notes followed by its notes
+- `CHORD_OFFSETS`: start of every chord set in `CHORD_TABLE`, then its end
+"""
+
+import ast
+import sys
+import timeit
+from dataclasses import dataclass
+from typing import Any, List
+
+from ast_tools import Consts, Enums
+
+__all__ = ["NoteTableError", "NoteTables", "pack_note_tables"]
+
+MIDI_NOTES = range(128)
+
+MAX_CHORD_NOTES = 255
+"""Notes of a chord, its length is stored in one byte"""
+
+TIMED_RUNS = 200
+"""Evaluations of the tables timed for the report"""
+
+
+class NoteTableError(Exception):
+    """The scales or chord sets don't have the shape the script expects"""
+
+    def __init__(self, problems: List[str]):
+        super().__init__("\n".join(problems))
+        self.problems = problems
+
+
+@dataclass
+class NoteTables:
+    scale_table: bytes
+    chord_table: bytes
+    chord_offsets: tuple[int, ...]
+
+    list_bytes: int
+    """Memory of the lists of `SCALES` and `CHORD_SETS`"""
+
+    list_literals: tuple[str, ...]
+    """Literals of `SCALES` and `CHORD_SETS`, only timed for the report"""
+
+    @property
+    def list_us(self) -> float:
+        """Time to build `SCALES` and `CHORD_SETS` from their literals"""
+        return _time(*self.list_literals)
+
+    @property
+    def table_us(self) -> float:
+        """Time to load the packed tables"""
+        return _time(
+            repr(self.scale_table), repr(self.chord_table), repr(self.chord_offsets)
+        )
+
+    @property
+    def table_bytes(self) -> int:
+        return (
+            sys.getsizeof(self.scale_table)
+            + sys.getsizeof(self.chord_table)
+            + _size(self.chord_offsets)
+        )
+
+    def report(self) -> str:
+        return (
+            f"Packed the note tables into {self.table_bytes} bytes instead of "
+            f"{self.list_bytes} bytes of lists, loaded in {self.table_us:.2f} us "
+            f"instead of {self.list_us:.2f} us"
+        )
+
+
+def pack_note_tables(consts: Consts, enums: Enums) -> NoteTables:
+    """
+    Checks `SCALES` and `CHORD_SETS` and replaces the tables made from them
+    in `consts` with literals. Raises `NoteTableError` listing every problem.
+    """
+
+    # one scale and one chord set per group button
+    cc = enums["CC"]
+    groups = _value(cc["GROUP_H"], consts) - _value(cc["GROUP_A"], consts) + 1
+    pads = _value(consts["NOTES_COUNT"], consts)
+
+    problems: List[str] = []
+    names = _names(consts["SCALES"])
+    scales = _value(consts["SCALES"], consts)
+    if not _is_list(scales, groups, "SCALES", "scales", problems):
+        scales = []
+    for index, scale in enumerate(scales):
+        label = f"SCALES[{index}] ({names[index]})"
+        if _is_list(scale, pads, label, "notes", problems):
+            _check_notes(scale, label, problems)
+
+    names = _names(consts["CHORD_SETS"])
+    chord_sets = _value(consts["CHORD_SETS"], consts)
+    if not _is_list(chord_sets, groups, "CHORD_SETS", "chord sets", problems):
+        chord_sets = []
+    for index, chord_set in enumerate(chord_sets):
+        label = f"CHORD_SETS[{index}] ({names[index]})"
+        if not _is_list(chord_set, pads, label, "chords", problems):
+            continue
+        for chord_index, chord in enumerate(chord_set):
+            chord_label = f"{label}[{chord_index}]"
+            if not isinstance(chord, list) or not 0 < len(chord) <= MAX_CHORD_NOTES:
+                problems.append(
+                    f"{chord_label}: expected a list of 1 to {MAX_CHORD_NOTES} notes, "
+                    f"got {chord!r}"
+                )
+            else:
+                _check_notes(chord, chord_label, problems)
+
+    if problems:
+        raise NoteTableError(problems)
+
+    scale_table = bytes(note for scale in scales for note in scale)
+    chord_table = bytearray()
+    chord_offsets: List[int] = []
+    for chord_set in chord_sets:
+        chord_offsets.append(len(chord_table))
+        for chord in chord_set:
+            chord_table += bytes((len(chord), *chord))
+    chord_offsets.append(len(chord_table))
+
+    tables = NoteTables(
+        scale_table=scale_table,
+        chord_table=bytes(chord_table),
+        chord_offsets=tuple(chord_offsets),
+        list_bytes=_size(scales) + _size(chord_sets),
+        list_literals=(repr(scales), repr(chord_sets)),
+    )
+    consts["SCALE_TABLE"] = ast.Constant(tables.scale_table)
+    consts["CHORD_TABLE"] = ast.Constant(tables.chord_table)
+    consts["CHORD_OFFSETS"] = ast.Tuple(
+        [ast.Constant(offset) for offset in tables.chord_offsets], ast.Load()
+    )
+    return tables
+
+
+def _value(node: ast.AST, consts: Consts) -> Any:
+    """Evaluates a literal, resolving the names of constants"""
+
+    if isinstance(node, ast.Name) and node.id in consts:
+        return _value(consts[node.id], consts)
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return [_value(elt, consts) for elt in node.elts]
+    try:
+        return ast.literal_eval(node)
+    except ValueError:
+        return ast.unparse(node)
+
+
+def _names(node: ast.AST) -> List[str]:
+    """Returns the source of every element of a list, e.g. the name of every scale"""
+
+    elts = node.elts if isinstance(node, (ast.List, ast.Tuple)) else []
+    return [ast.unparse(elt) for elt in elts]
+
+
+def _is_list(value: Any, length: int, label: str, items: str, problems: List[str]) -> bool:
+    """Checks a list has `length` elements, returns False when it isn't a list"""
+
+    if not isinstance(value, list):
+        problems.append(f"{label}: expected a list of {length} {items}, got {value!r}")
+        return False
+    if len(value) != length:
+        problems.append(f"{label}: expected {length} {items}, got {len(value)}")
+    return True
+
+
+def _check_notes(notes: List[Any], label: str, problems: List[str]) -> None:
+    for index, note in enumerate(notes):
+        if type(note) is not int or note not in MIDI_NOTES:
+            problems.append(f"{label}[{index}]: {note!r} is not a MIDI note (0-127)")
+
+
+def _size(value: Any) -> int:
+    """Size of a list or tuple and of the lists and tuples in it, the notes are cached ints"""
+
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_size(item) for item in value)
+    return 0
+
+
+def _time(*literals: str) -> float:
+    """Microseconds to evaluate the literals, as the script does with inlined tables"""
+
+    code = compile(f"({', '.join(literals)})", "<tables>", "eval")
+    return timeit.timeit(lambda: eval(code), number=TIMED_RUNS) / TIMED_RUNS * 1e6
@@ -0,0 +1,201 @@
+"""
+Map of the lines of the built script back to the modules of `src/`.
+
+Every module gets its own range of line numbers before the modules are
+merged (see `tag_lines`), so the locations kept by the build transforms
+through `ast.copy_location` still tell which module a node comes from. The
+formatted script is then parsed again and matched node by node with the
+transformed tree.
+
+Rewrites the paths and lines of the built script in tracebacks and profiles
+read from stdin, or from a file:
+
+    python ./scripts/build/sourcemap.py traceback.txt
+"""
+
+import argparse
+import ast
+import json
+import re
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from config import cfg
+
+__all__ = ["LINE_STRIDE", "SourceMap", "tag_lines", "remap"]
+
+LINE_STRIDE = 1 << 20
+"""Line numbers reserved for every module, `lineno // LINE_STRIDE` is its index"""
+
+type Location = Tuple[str, int, str]
+"""Source file, line and enclosing function"""
+
+
+def tag_lines(tree: ast.Module, index: int) -> None:
+    """Moves the line numbers of a parsed module into its own range"""
+
+    offset = index * LINE_STRIDE
+    if not offset:
+        return
+
+    # like `ast.increment_lineno`, without its generators, the modules are large
+    AST = ast.AST
+    stack: List[ast.AST] = [tree]
+    while stack:
+        node = stack.pop()
+        if "lineno" in node._attributes:
+            node.lineno += offset  # type: ignore[attr-defined]
+            end_lineno = node.end_lineno  # type: ignore[attr-defined]
+            if end_lineno is not None:
+                node.end_lineno = end_lineno + offset  # type: ignore[attr-defined]
+        for name in node._fields:
+            value = getattr(node, name, None)
+            if isinstance(value, list):
+                stack += [child for child in value if isinstance(child, AST)]
+            elif isinstance(value, AST):
+                stack.append(value)
+
+
+@dataclass
+class SourceMap:
+    """Source location of every line of the built script, if known"""
+
+    sources: List[str] = field(default_factory=list)
+    scopes: List[str] = field(default_factory=list)
+    lines: List[Optional[Tuple[int, int, int]]] = field(default_factory=list)
+    """Indices in `sources` and `scopes` and source line, by line of the script - 1"""
+
+    @classmethod
+    def build(cls, output: str, tree: ast.Module, sources: List[str]) -> "SourceMap":
+        """Maps the lines of the formatted `output` of the transformed `tree`"""
+
+        source_map = cls(sources=sources, lines=[None] * (output.count("\n") + 1))
+        scopes: Dict[str, int] = {}
+
+        def visit(formatted: ast.AST, node: ast.AST, scope: str, stmt_file: int) -> None:
+            # the line of a definition is reported in its own scope
+            if isinstance(formatted, (ast.FunctionDef, ast.ClassDef)):
+                scope = f"{scope}.{formatted.name}" if scope else formatted.name
+
+            lineno = getattr(node, "lineno", None)
+            if lineno is not None and hasattr(formatted, "lineno"):
+                index, line = divmod(lineno, LINE_STRIDE)
+                scope_index = scopes.setdefault(scope, len(scopes))
+                if isinstance(formatted, ast.stmt):
+                    stmt_file = index
+                    end = formatted.end_lineno or formatted.lineno
+                    for out_line in range(formatted.lineno, end + 1):
+                        source_map.lines[out_line - 1] = (index, line, scope_index)
+                elif index == stmt_file:
+                    # inlined constants and enum members point to their own module
+                    source_map.lines[formatted.lineno - 1] = (index, line, scope_index)
+
+            # the trees differ where formatting changed the syntax, e.g. for a
+            # tuple constant, and the lines are left to the enclosing node
+            for name in formatted._fields:
+                children = getattr(formatted, name, None)
+                originals = getattr(node, name, None)
+                if not isinstance(children, list):
+                    children, originals = [children], [originals]
+                if not isinstance(originals, list) or len(children) != len(originals):
+                    continue
+                for child, original in zip(children, originals):
+                    if isinstance(child, ast.AST) and type(child) is type(original):
+                        visit(child, original, scope, stmt_file)
+
+        visit(ast.parse(output), tree, "", -1)
+        source_map.scopes = list(scopes)
+        return source_map
+
+    def lookup(self, line: int) -> Optional[Location]:
+        """Returns the source location of a line of the built script"""
+
+        if not 0 < line <= len(self.lines):
+            return None
+        location = self.lines[line - 1]
+        if location is None:
+            return None
+        index, source_line, scope = location
+        return self.sources[index], source_line, self.scopes[scope]
+
+    def dumps(self) -> str:
+        return json.dumps(
+            {"sources": self.sources, "scopes": self.scopes, "lines": self.lines},
+            separators=(",", ":"),
+        )
+
+    @classmethod
+    def loads(cls, data: str) -> "SourceMap":
+        loaded = json.loads(data)
+        return cls(
+            sources=loaded["sources"],
+            scopes=loaded["scopes"],
+            lines=[tuple(line) if line else None for line in loaded["lines"]],
+        )
+
+    @staticmethod
+    def path(script: Path) -> Path:
+        """Returns the path of the map of a built script"""
+
+        return script.with_name(script.name + ".map")
+
+
+def remap(text: str, script: Path, source_map: SourceMap) -> str:
+    """
+    Rewrites the locations in the built script of tracebacks and profiles:
+
+    - `File ".../device_Maschine_MK3.py", line 42, in on_pad`
+    - `device_Maschine_MK3.py:42(on_pad)`, as printed by `cProfile`
+    """
+
+    name = re.escape(script.name)
+
+    def traceback(match: re.Match[str]) -> str:
+        location = source_map.lookup(int(match["line"]))
+        if location is None:
+            return match[0]
+        path, line, scope = location
+        return f'File "{path}", line {line}, in {scope or "<module>"}'
+
+    def profile(match: re.Match[str]) -> str:
+        location = source_map.lookup(int(match["line"]))
+        if location is None:
+            return match[0]
+        path, line, scope = location
+        return f"{path}:{line}({scope or match['fn']})"
+
+    text = re.sub(
+        rf'File "[^"]*{name}", line (?P<line>\d+), in (?P<fn>\S+)', traceback, text
+    )
+    return re.sub(rf"\S*{name}:(?P<line>\d+)\((?P<fn>[^)]*)\)", profile, text)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "input",
+        type=argparse.FileType("r", encoding="utf-8"),
+        nargs="?",
+        default=sys.stdin,
+        help="Traceback or profile to rewrite (default: stdin)",
+    )
+    parser.add_argument(
+        "--script",
+        type=Path,
+        default=cfg.OUT_PATH,
+        help="Built script, with its map next to it (default: %(default)s)",
+    )
+    args = parser.parse_args()
+
+    source_map = SourceMap.loads(
+        SourceMap.path(args.script).read_text(encoding="utf-8")
+    )
+    sys.stdout.write(remap(args.input.read(), args.script, source_map))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+Headless simulation of the FL Studio API, for running the script off-host.
+
+    sim = FLSim(channels=64).install()
+    script = import_src()  # or load_dist()
+    script.OnInit()
+    sim.control_change(script, CC.PLAY, 127)
+    sim.idle(script)
+    print(sim.recorder.calls, sim.messages)
+"""
+
+from .api import MODULES, SimModule, check_stubs
+from .loader import DIST, ROOT, SRC, import_src, load_dist
+from .recorder import CallRecorder, CostModel
+from .sim import FLSim, MidiMsg
+from .state import Channel, Project, Track
+
+__all__ = [
+    "MODULES",
+    "SimModule",
+    "check_stubs",
+    "DIST",
+    "ROOT",
+    "SRC",
+    "import_src",
+    "load_dist",
+    "CallRecorder",
+    "CostModel",
+    "FLSim",
+    "MidiMsg",
+    "Channel",
+    "Project",
+    "Track",
+]
@@ -0,0 +1,87 @@
+"""Run a short session of the script against the simulated FL Studio API and report its calls"""
+
+import argparse
+import sys
+import time
+import types
+from pathlib import Path
+from typing import Callable, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from flsim import DIST, CostModel, FLSim, import_src, load_dist
+
+type Step = Callable[[FLSim, types.ModuleType], None]
+
+
+def _session(CC: type) -> List[Step]:
+    """Pad hits in every pad mode, encoder turns, mixer knobs and transport"""
+
+    def cc(control: int, value: int = 127) -> Step:
+        return lambda sim, script: sim.control_change(script, control, value)
+
+    def pad(note: int, velocity: int) -> Step:
+        return lambda sim, script: sim.note_on(script, note, velocity)
+
+    steps: List[Step] = []
+    for mode in (CC.PAD_MODE, CC.KEYBOARD_MODE, CC.CHORDS_MODE, CC.STEP_MODE):
+        steps.append(cc(mode))
+        for note in range(16):
+            steps += (pad(note, 100), pad(note, 0))
+    steps += [cc(CC.ENCODER_TURN, 65), cc(CC.ENCODER_TURN, 63)] * 8
+    steps += [cc(CC.MIX_VOL, value) for value in range(0, 128, 8)]
+    steps += [cc(CC.PLAY), cc(CC.STOP)]
+    return steps
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--dist",
+        type=Path,
+        nargs="?",
+        const=DIST,
+        default=None,
+        help="Run the built script instead of src/ (default: %(const)s)",
+    )
+    parser.add_argument(
+        "--against",
+        type=str,
+        default=None,
+        help="Git revision of src/ to run instead of the working tree",
+    )
+    parser.add_argument(
+        "-c", "--channels", type=int, default=16, help="Number of channels"
+    )
+    parser.add_argument(
+        "--cost",
+        type=Path,
+        default=None,
+        help="JSON cost model of the API calls, see `flsim.CostModel`",
+    )
+    args = parser.parse_args()
+
+    cost = CostModel.load(args.cost) if args.cost else None
+    sim = FLSim(channels=args.channels, cost=cost).install()
+    CC = import_src("controls", args.against).CC
+    script = load_dist(args.dist) if args.dist else import_src("main", args.against)
+
+    start = time.perf_counter()
+    script.OnInit()
+    for step in _session(CC):
+        step(sim, script)
+        sim.idle(script)
+    script.OnDeInit()
+    elapsed = time.perf_counter() - start
+
+    print(f"{'call':<32}{'count':>10}")
+    for name, count in sorted(sim.recorder.calls.items()):
+        print(f"{name:<32}{count:>10}")
+    print(f"{'TOTAL':<32}{sim.recorder.total():>10}")
+    print(f"messages sent: {len(sim.messages)} + {len(sim.sysex)} SysEx")
+    print(f"modeled API cost: {sim.recorder.cost_ns / 1e6:.3f} ms")
+    print(f"wall time: {elapsed * 1e3:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,542 @@
+"""
+Simulated FL Studio API modules.
+
+Every public method of a `SimModule` becomes a function of the module with
+the same name, with the same signature as in `fl-studio-api-stubs` (see
+`check_stubs`). Only the functions used by the script are simulated.
+"""
+
+import importlib
+import inspect
+import sys
+import types
+from typing import TYPE_CHECKING, Dict, Iterator, List, Tuple
+
+import midi
+
+from .state import Channel, Project, Track
+
+if TYPE_CHECKING:
+    from .sim import FLSim
+
+__all__ = ["SimModule", "MODULES", "check_stubs"]
+
+
+class SimModule:
+    """Base class of the simulated FL Studio modules"""
+
+    name: str
+    """Name of the module, as imported by the script"""
+
+    def __init__(self, sim: "FLSim") -> None:
+        self._sim = sim
+        self._project: Project = sim.project
+
+    @classmethod
+    def functions(cls) -> Iterator[Tuple[str, types.FunctionType]]:
+        """Yields the name and the (unbound) implementation of every simulated function"""
+
+        for name, fn in vars(cls).items():
+            if not name.startswith("_") and inspect.isfunction(fn):
+                yield name, fn
+
+    def build(self) -> types.ModuleType:
+        """Returns a module with a recording function for every simulated function"""
+
+        module = types.ModuleType(self.name, f"Simulated `{self.name}` module")
+        recorder = self._sim.recorder
+        for name, _ in self.functions():
+            fn = recorder.wrap(f"{self.name}.{name}", getattr(self, name))
+            setattr(module, name, fn)
+        return module
+
+    def _dirty(self, flags: int) -> None:
+        self._sim.dirty |= flags
+
+    def _channel(self, index: int) -> Channel:
+        if not 0 <= index < len(self._project.channels):
+            raise IndexError(f"Channel index out of range: {index}")
+        return self._project.channels[index]
+
+    def _track(self, index: int) -> Track:
+        if not 0 <= index < len(self._project.tracks):
+            raise IndexError(f"Track index out of range: {index}")
+        return self._project.tracks[index]
+
+    def _rec_event(self, eventId: int, value: int, flags: int) -> int:
+        values = self._project.rec_values
+        if flags & midi.REC_GetValue:
+            return values.get(eventId, 0)
+        if flags & midi.REC_UpdateValue:
+            values[eventId] = value
+            self._dirty(midi.HW_Dirty_ControlValues)
+        return value
+
+
+def _clamp(value: float, low: float, high: float) -> float:
+    return min(max(value, low), high)
+
+
+def _toggle(current: bool, value: int) -> bool:
+    """Applies FL Studio's convention of -1 for toggling a state"""
+
+    return not current if value == -1 else bool(value)
+
+
+class Channels(SimModule):
+    name = "channels"
+
+    def channelCount(self, globalCount: bool = False) -> int:
+        return len(self._project.channels)
+
+    def selectedChannel(
+        self, canBeNone: bool = False, offset: int = 0, indexGlobal: bool = False
+    ) -> int:
+        return self._project.selected_channel
+
+    def selectOneChannel(self, index: int, useGlobalIndex: bool = False) -> None:
+        self._channel(index)
+        self._project.selected_channel = index
+        self._dirty(midi.HW_ChannelEvent)
+
+    def getChannelName(self, index: int, useGlobalIndex: bool = False) -> str:
+        return self._channel(index).name
+
+    def getChannelVolume(
+        self, index: int, mode: bool = False, useGlobalIndex: bool = False
+    ) -> float:
+        return self._channel(index).volume
+
+    def setChannelVolume(
+        self,
+        index: int,
+        volume: float,
+        pickupMode: int = 0,
+        useGlobalIndex: bool = False,
+    ) -> None:
+        self._channel(index).volume = _clamp(volume, 0.0, 1.0)
+        self._dirty(midi.HW_ChannelEvent)
+
+    def getChannelPan(self, index: int, useGlobalIndex: bool = False) -> float:
+        return self._channel(index).pan
+
+    def setChannelPan(
+        self, index: int, pan: float, pickupMode: int = 0, useGlobalIndex: bool = False
+    ) -> None:
+        self._channel(index).pan = _clamp(pan, -1.0, 1.0)
+        self._dirty(midi.HW_ChannelEvent)
+
+    def getChannelPitch(
+        self, index: int, mode: int = 0, useGlobalIndex: bool = False
+    ) -> float | int:
+        channel = self._channel(index)
+        match mode:
+            case 1:
+                return round(channel.pitch * channel.pitch_range * 100)
+            case 2:
+                return channel.pitch_range
+            case _:
+                return channel.pitch
+
+    def setChannelPitch(
+        self,
+        index: int,
+        value: float,
+        mode: int = 0,
+        pickupMode: int = 0,
+        useGlobalIndex: bool = False,
+    ) -> None:
+        channel = self._channel(index)
+        match mode:
+            case 1:
+                channel.pitch = _clamp(value / (channel.pitch_range * 100), -1.0, 1.0)
+            case 2:
+                channel.pitch_range = int(value)
+            case _:
+                channel.pitch = _clamp(value, -1.0, 1.0)
+        self._dirty(midi.HW_ChannelEvent)
+
+    def isChannelMuted(self, index: int, useGlobalIndex: bool = False) -> bool:
+        return self._channel(index).muted
+
+    def muteChannel(
+        self, index: int, value: int = -1, useGlobalIndex: bool = False
+    ) -> None:
+        channel = self._channel(index)
+        channel.muted = _toggle(channel.muted, value)
+        self._dirty(midi.HW_ChannelEvent)
+
+    def isChannelSolo(self, index: int, useGlobalIndex: bool = False) -> bool:
+        return self._channel(index).solo
+
+    def soloChannel(self, index: int, useGlobalIndex: bool = False) -> None:
+        solo = not self._channel(index).solo
+        for other, channel in enumerate(self._project.channels):
+            channel.solo = solo and other == index
+        self._dirty(midi.HW_ChannelEvent)
+
+    def getGridBit(
+        self, index: int, position: int, useGlobalIndex: bool = False
+    ) -> bool:
+        steps = self._channel(index).steps.get(self._project.pattern, ())
+        return position in steps
+
+    def setGridBit(
+        self, index: int, position: int, value: bool, useGlobalIndex: bool = False
+    ) -> None:
+        steps = self._channel(index).steps.setdefault(self._project.pattern, set())
+        if value:
+            steps.add(position)
+        else:
+            steps.discard(position)
+        self._dirty(midi.HW_Dirty_Patterns)
+
+    def midiNoteOn(
+        self, indexGlobal: int, note: int, velocity: int, channel: int = -1
+    ) -> None:
+        self._channel(indexGlobal)
+        if velocity > 0:
+            self._project.sounding.add((indexGlobal, note))
+        else:
+            self._project.sounding.discard((indexGlobal, note))
+
+    def showCSForm(
+        self, index: int, state: int = 1, useGlobalIndex: bool = False
+    ) -> None:
+        channel = self._channel(index)
+        channel.editor = _toggle(channel.editor, state)
+        self._dirty(midi.HW_Dirty_FocusedWindow)
+
+    def quickQuantize(
+        self, index: int, startOnly: int = 1, useGlobalIndex: bool = False
+    ) -> None:
+        self._channel(index).quantized += 1
+
+    def getRecEventId(self, index: int, useGlobalIndex: bool = False) -> int:
+        self._channel(index)
+        return midi.REC_Chan_First + (index << 16)
+
+    def processRECEvent(self, eventId: int, value: int, flags: int, /) -> int:
+        return self._rec_event(eventId, value, flags)
+
+
+class Mixer(SimModule):
+    name = "mixer"
+
+    def trackCount(self) -> int:
+        return len(self._project.tracks)
+
+    def trackNumber(self) -> int:
+        return self._project.selected_track
+
+    def setTrackNumber(self, trackNumber: int, flags: int = 0) -> None:
+        self._track(trackNumber)
+        self._project.selected_track = trackNumber
+        self._dirty(midi.HW_Dirty_Mixer_Sel)
+
+    def getTrackVolume(self, index: int, mode: int = 0) -> float:
+        return self._track(index).volume
+
+    def setTrackVolume(self, index: int, volume: float, pickupMode: int = 0) -> None:
+        self._track(index).volume = _clamp(volume, 0.0, 1.0)
+        self._dirty(midi.HW_Dirty_Mixer_Controls)
+
+    def getTrackPan(self, index: int) -> float:
+        return self._track(index).pan
+
+    def setTrackPan(self, index: int, pan: float, pickupMode: int = 0) -> None:
+        self._track(index).pan = _clamp(pan, -1.0, 1.0)
+        self._dirty(midi.HW_Dirty_Mixer_Controls)
+
+    def getTrackStereoSep(self, index: int) -> float:
+        return self._track(index).stereo_sep
+
+    def setTrackStereoSep(self, index: int, pan: float, pickupMode: int = 0) -> None:
+        self._track(index).stereo_sep = _clamp(pan, -1.0, 1.0)
+        self._dirty(midi.HW_Dirty_Mixer_Controls)
+
+    def isTrackSolo(self, index: int) -> bool:
+        return self._track(index).solo
+
+    def soloTrack(self, index: int, value: int = -1, mode: int = -1) -> None:
+        solo = _toggle(self._track(index).solo, value)
+        for other, track in enumerate(self._project.tracks):
+            track.solo = solo and other == index
+        self._dirty(midi.HW_Dirty_Mixer_Controls)
+
+    def isTrackMuted(self, index: int) -> bool:
+        return self._track(index).muted
+
+    def muteTrack(self, index: int, value: int = -1) -> None:
+        track = self._track(index)
+        track.muted = _toggle(track.muted, value)
+        self._dirty(midi.HW_Dirty_Mixer_Controls)
+
+
+class Patterns(SimModule):
+    name = "patterns"
+
+    def patternCount(self) -> int:
+        return self._project.pattern_count
+
+    def patternNumber(self) -> int:
+        return self._project.pattern
+
+    def isPatternSelected(self, index: int) -> bool:
+        return index == self._project.pattern
+
+    def jumpToPattern(self, index: int) -> None:
+        if not 1 <= index <= self._project.pattern_count:
+            raise IndexError(f"Pattern index out of range: {index}")
+        self._project.pattern = index
+        self._dirty(midi.HW_Dirty_Patterns)
+
+
+class Transport(SimModule):
+    name = "transport"
+
+    def start(self) -> None:
+        self._project.playing = not self._project.playing
+        self._dirty(midi.HW_Dirty_LEDs)
+
+    def stop(self) -> None:
+        self._project.playing = False
+        self._project.song_pos = 0.0
+        self._dirty(midi.HW_Dirty_LEDs)
+
+    def record(self) -> None:
+        self._project.recording = not self._project.recording
+        self._dirty(midi.HW_Dirty_LEDs)
+
+    def isPlaying(self) -> bool:
+        return self._project.playing
+
+    def isRecording(self) -> bool:
+        return self._project.recording
+
+    def getLoopMode(self) -> int:
+        return self._project.loop_mode
+
+    def setLoopMode(self) -> None:
+        self._project.loop_mode ^= 1
+        self._dirty(midi.HW_Dirty_LEDs)
+
+    def getSongPos(self, mode: int = -1) -> float | int:
+        return self._project.song_pos
+
+    def setSongPos(self, position: float | int, mode: int = -1) -> None:
+        self._project.song_pos = _clamp(position, 0.0, 1.0)
+        # the seek shows on the transport LEDs
+        self._dirty(midi.HW_Dirty_LEDs)
+
+    def globalTransport(
+        self, command: int, value: int, pmeflags: int = 2, flags=15
+    ) -> int:
+        project = self._project
+        match command:
+            case midi.FPT_Metronome:
+                project.metronome = not project.metronome
+                self._dirty(midi.HW_Dirty_LEDs)
+            case midi.FPT_CountDown:
+                project.count_in = not project.count_in
+                self._dirty(midi.HW_Dirty_LEDs)
+            case midi.FPT_TempoJog:
+                project.tempo += value / 10
+            case midi.FPT_Save:
+                project.saves += 1
+            case midi.FPT_F10:
+                project.settings = not project.settings
+        return 1
+
+
+class Ui(SimModule):
+    name = "ui"
+
+    def getVisible(self, index: int) -> bool:
+        return index in self._project.visible
+
+    def showWindow(self, index: int) -> None:
+        self._project.visible.add(index)
+        self._project.focused = index
+        self._dirty(midi.HW_Dirty_FocusedWindow)
+
+    def hideWindow(self, index: int) -> None:
+        self._project.visible.discard(index)
+        if self._project.focused == index:
+            self._project.focused = -1
+        self._dirty(midi.HW_Dirty_FocusedWindow)
+
+    def getFocused(self, index: int) -> bool:
+        return self._project.focused == index
+
+    def setFocused(self, index: int) -> None:
+        self._project.visible.add(index)
+        self._project.focused = index
+        self._dirty(midi.HW_Dirty_FocusedWindow)
+
+    def jog(self, value: int) -> int:
+        self._project.jog_pos += value
+        return 1
+
+    def up(self, value: int = 1) -> int:
+        return 1
+
+    def down(self, value: int = 1) -> int:
+        return 1
+
+    def left(self, value: int = 1) -> int:
+        return 1
+
+    def right(self, value: int = 1) -> int:
+        return 1
+
+    def enter(self) -> int:
+        return 1
+
+    def delete(self) -> int:
+        return 1
+
+    def snapOnOff(self) -> int:
+        project = self._project
+        if project.snap == midi.Snap_None:
+            project.snap = project.last_snap
+        else:
+            project.last_snap, project.snap = project.snap, midi.Snap_None
+        self._dirty(midi.HW_Dirty_LEDs)
+        return 1
+
+    def getSnapMode(self) -> int:
+        return self._project.snap
+
+
+class General(SimModule):
+    name = "general"
+
+    def undoUp(self) -> int:
+        self._project.undo_pos += 1
+        return 1
+
+    def undoDown(self) -> int:
+        self._project.undo_pos -= 1
+        return 1
+
+    def getUseMetronome(self) -> bool:
+        return self._project.metronome
+
+    def processRECEvent(self, eventId: int, value: int, flags: int) -> int:
+        return self._rec_event(eventId, value, flags)
+
+
+class Plugins(SimModule):
+    name = "plugins"
+
+    def isValid(
+        self, index: int, slotIndex: int = -1, useGlobalIndex: bool = False
+    ) -> bool:
+        return 0 <= index < len(self._project.channels) and self._channel(index).plugin
+
+    def nextPreset(
+        self, index: int, slotIndex: int = -1, useGlobalIndex: bool = False
+    ) -> None:
+        self._channel(index).preset += 1
+        self._dirty(midi.HW_Dirty_Names)
+
+    def prevPreset(
+        self, index: int, slotIndex: int = -1, useGlobalIndex: bool = False
+    ) -> None:
+        self._channel(index).preset -= 1
+        self._dirty(midi.HW_Dirty_Names)
+
+    def getParamCount(
+        self, index: int, slotIndex: int = -1, useGlobalIndex: bool = False
+    ) -> int:
+        return len(self._channel(index).params)
+
+    def getParamValue(
+        self,
+        paramIndex: int,
+        index: int,
+        slotIndex: int = -1,
+        useGlobalIndex: bool = False,
+    ) -> float:
+        return self._channel(index).params[paramIndex]
+
+    def setParamValue(
+        self,
+        value: float,
+        paramIndex: int,
+        index: int,
+        slotIndex: int = -1,
+        pickupMode: int = 0,
+        useGlobalIndex: bool = False,
+    ) -> None:
+        self._channel(index).params[paramIndex] = _clamp(value, 0.0, 1.0)
+        self._dirty(midi.HW_Dirty_ControlValues)
+
+
+class Device(SimModule):
+    name = "device"
+
+    def midiOutMsg(
+        self, message: int, channel: int = -1, data1: int = -1, data2: int = -1
+    ) -> None:
+        if channel == -1:
+            # single argument form: status | data1 << 8 | data2 << 16
+            data1, data2 = (message >> 8) & 0xFF, (message >> 16) & 0xFF
+            message, channel = message & 0xF0, message & 0x0F
+        self._sim.messages.append((message, channel, data1, data2))
+
+    def midiOutSysex(self, message: bytes) -> None:
+        self._sim.sysex.append(bytes(message))
+
+
+MODULES: Tuple[type[SimModule], ...] = (
+    Channels,
+    Mixer,
+    Patterns,
+    Transport,
+    Ui,
+    General,
+    Plugins,
+    Device,
+)
+
+_checked: List[str] = []
+
+
+def _load_stub(name: str) -> types.ModuleType:
+    """Import the `fl-studio-api-stubs` module `name`, even when a simulated one is installed"""
+
+    installed = sys.modules.pop(name, None)
+    try:
+        return importlib.import_module(name)
+    finally:
+        if installed is not None:
+            sys.modules[name] = installed
+
+
+def _parameters(fn: types.FunctionType) -> List[Tuple[str, object, object]]:
+    parameters = inspect.signature(fn).parameters.values()
+    return [(p.name, p.kind, p.default) for p in parameters if p.name != "self"]
+
+
+def check_stubs(modules: Tuple[type[SimModule], ...] = MODULES) -> None:
+    """Raise `TypeError` when a simulated function differs from its stub in name or parameters"""
+
+    errors: Dict[str, str] = {}
+    for cls in modules:
+        if cls.name in _checked:
+            continue
+        stub = _load_stub(cls.name)
+        for name, fn in cls.functions():
+            qualname = f"{cls.name}.{name}"
+            expected = getattr(stub, name, None)
+            if expected is None:
+                errors[qualname] = "not in fl-studio-api-stubs"
+            elif _parameters(fn) != _parameters(expected):
+                errors[qualname] = f"expected {inspect.signature(expected)}"
+        _checked.append(cls.name)
+
+    if errors:
+        lines = "\n".join(f"  {name}: {error}" for name, error in errors.items())
+        raise TypeError(f"simulated functions differ from the stubs:\n{lines}")
@@ -0,0 +1,70 @@
+"""Loading the script from `src/`, a git revision of it, or the built `dist/` file"""
+
+import atexit
+import functools
+import importlib.util
+import shutil
+import subprocess
+import sys
+import tempfile
+import types
+from pathlib import Path
+from typing import Optional
+
+__all__ = ["ROOT", "SRC", "DIST", "import_src", "load_dist"]
+
+ROOT = Path(__file__).resolve().parents[2]
+SRC = ROOT / "src"
+DIST = ROOT / "dist" / "device_Maschine_MK3.py"
+
+
+@functools.cache
+def _extract_src(rev: str) -> Path:
+    src = Path(tempfile.mkdtemp(prefix="src-"))
+    # the modules are imported from it until the end of the run
+    atexit.register(shutil.rmtree, src, ignore_errors=True)
+    archive = subprocess.run(
+        ["git", "archive", rev, "src"],
+        cwd=ROOT,
+        check=True,
+        capture_output=True,
+    ).stdout
+    subprocess.run(
+        ["tar", "-x", "--strip-components=1", "-C", str(src)],
+        input=archive,
+        check=True,
+    )
+    return src
+
+
+def import_src(module: str = "main", rev: Optional[str] = None) -> types.ModuleType:
+    """
+    Import a module from `src/`, either from the working tree or from a git revision.
+
+    Modules of `src/` share flat names (`controller`, `utilities`, ...), so
+    previously imported ones are dropped first. Modules imported earlier keep
+    working, since they hold references to their own dependencies.
+
+    `main` is the script itself, with the FL Studio entry points.
+    """
+
+    src = SRC if rev is None else _extract_src(rev)
+
+    for path in src.glob("*.py"):
+        sys.modules.pop(path.stem, None)
+
+    sys.path.insert(0, str(src))
+    try:
+        return __import__(module)
+    finally:
+        sys.path.remove(str(src))
+
+
+def load_dist(path: Path = DIST) -> types.ModuleType:
+    """Load a fresh instance of the built script, with the FL Studio entry points"""
+
+    spec = importlib.util.spec_from_file_location(Path(path).stem, path)
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,88 @@
+"""Call recording and cost model of the simulated FL Studio API"""
+
+import functools
+import json
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+__all__ = ["CostModel", "CallRecorder"]
+
+
+@dataclass
+class CostModel:
+    """
+    Cost of every FL Studio API call, in nanoseconds.
+
+    Calls are named `module.function`, e.g. `channels.getGridBit`. With `spin`
+    enabled, the cost is spent busy-waiting in the call, so it shows up in
+    wall-clock timings of the script. Otherwise it is only accumulated in
+    `CallRecorder.cost_ns`.
+    """
+
+    default_ns: int = 0
+    calls: Dict[str, int] = field(default_factory=dict)
+    spin: bool = False
+
+    def cost(self, name: str) -> int:
+        """Returns the cost of a single call of `name`"""
+
+        return self.calls.get(name, self.default_ns)
+
+    @classmethod
+    def load(cls, path: Path) -> "CostModel":
+        """Load a cost model from a JSON file with `default_ns`, `calls` and `spin` keys"""
+
+        return cls(**json.loads(Path(path).read_text()))
+
+
+class CallRecorder:
+    """Counts every call of the simulated FL Studio API and its modeled cost"""
+
+    def __init__(self, cost: Optional[CostModel] = None) -> None:
+        self.cost = cost or CostModel()
+        self.calls: Counter[str] = Counter()
+        self.cost_ns = 0
+        self.trace: Optional[List[Tuple[str, Tuple[Any, ...]]]] = None
+
+    def wrap(self, name: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+        """Returns `fn` recording its calls as `name`. The cost model is read once, here"""
+
+        calls = self.calls
+        cost_ns = self.cost.cost(name)
+        spin = self.cost.spin and cost_ns > 0
+        perf_counter_ns = time.perf_counter_ns
+
+        @functools.wraps(fn)
+        def call(*args: Any, **kwargs: Any) -> Any:
+            calls[name] += 1
+            self.cost_ns += cost_ns
+            if self.trace is not None:
+                self.trace.append((name, args))
+            if spin:
+                deadline = perf_counter_ns() + cost_ns
+                while perf_counter_ns() < deadline:
+                    pass
+            return fn(*args, **kwargs)
+
+        return call
+
+    def start_trace(self) -> None:
+        """Record every call with its arguments from now on, see `trace`"""
+
+        self.trace = []
+
+    def reset(self) -> None:
+        """Forget all recorded calls and their cost"""
+
+        self.calls.clear()
+        self.cost_ns = 0
+        if self.trace is not None:
+            self.trace.clear()
+
+    def total(self) -> int:
+        """Returns the number of recorded calls"""
+
+        return sum(self.calls.values())
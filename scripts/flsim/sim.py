@@ -0,0 +1,140 @@
+"""Headless FL Studio: installs the simulated API modules and drives a script"""
+
+import sys
+import types
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import midi
+
+from .api import MODULES, check_stubs
+from .recorder import CallRecorder, CostModel
+from .state import Project
+
+__all__ = ["MidiMsg", "FLSim"]
+
+
+@dataclass
+class MidiMsg:
+    """Minimal stand-in for `fl_classes.FlMidiMsg`"""
+
+    status: int = 0
+    data1: int = 0
+    data2: int = 0
+    midiChan: int = 0
+    handled: bool = False
+
+    @property
+    def controlNum(self) -> int:
+        return self.data1
+
+    @property
+    def controlVal(self) -> int:
+        return self.data2
+
+    @property
+    def note(self) -> int:
+        return self.data1
+
+    @property
+    def velocity(self) -> int:
+        return self.data2
+
+
+class FLSim:
+    """
+    Stateful stand-in for FL Studio.
+
+    `install()` puts the simulated `channels`, `mixer`, `patterns`,
+    `transport`, `ui`, `general`, `plugins` and `device` modules in
+    `sys.modules`. Scripts hold references to the modules they imported, so
+    the script has to be loaded after `install()` (see `loader`).
+
+    State changes made through the API are collected as `OnRefresh` flags in
+    `dirty` and delivered to the script by `refresh()` or `idle()`, like FL
+    Studio does after a callback returns.
+    """
+
+    project: Project
+    """Simulated project state, can be set up or inspected directly"""
+
+    recorder: CallRecorder
+    """Counts of all API calls and their modeled cost"""
+
+    messages: List[Tuple[int, int, int, int]]
+    """(status, channel, data1, data2) of every MIDI message sent by the script"""
+
+    sysex: List[bytes]
+    """Every SysEx message sent by the script"""
+
+    dirty: int
+    """`OnRefresh` flags of the changes not yet delivered to the script"""
+
+    modules: Dict[str, types.ModuleType]
+    """Installed modules by name"""
+
+    def __init__(
+        self,
+        channels: int = 16,
+        tracks: int = 127,
+        patterns: int = 8,
+        cost: Optional[CostModel] = None,
+    ) -> None:
+        self.project = Project.create(channels, tracks, patterns)
+        self.recorder = CallRecorder(cost)
+        self.messages = []
+        self.sysex = []
+        self.dirty = 0
+        self.modules = {}
+
+    def install(self) -> "FLSim":
+        """Put the simulated modules in `sys.modules`, replacing any installed before"""
+
+        check_stubs()
+        for cls in MODULES:
+            module = cls(self).build()
+            self.modules[cls.name] = module
+            sys.modules[cls.name] = module
+        return self
+
+    def reset(self) -> None:
+        """Forget recorded calls, sent messages and undelivered refresh flags"""
+
+        self.recorder.reset()
+        self.messages.clear()
+        self.sysex.clear()
+        self.dirty = 0
+
+    def control_change(
+        self, script: types.ModuleType, control: int, value: int, channel: int = 0
+    ) -> MidiMsg:
+        """Send a CONTROL CHANGE message to the script"""
+
+        msg = MidiMsg(midi.MIDI_CONTROLCHANGE | channel, control, value, channel)
+        script.OnControlChange(msg)
+        return msg
+
+    def note_on(
+        self, script: types.ModuleType, note: int, velocity: int, channel: int = 0
+    ) -> MidiMsg:
+        """Send a NOTE ON message to the script, velocity 0 releases the note"""
+
+        msg = MidiMsg(midi.MIDI_NOTEON | channel, note, velocity, channel)
+        script.OnNoteOn(msg)
+        return msg
+
+    def refresh(self, script: types.ModuleType, flags: int = 0) -> None:
+        """Call `OnRefresh` with `flags` and the flags of the undelivered changes"""
+
+        flags |= self.dirty
+        self.dirty = 0
+        if flags:
+            script.OnRefresh(flags)
+
+    def idle(self, script: types.ModuleType) -> None:
+        """Deliver pending refresh flags and run an `OnIdle` tick, if the script has one"""
+
+        self.refresh(script)
+        on_idle = getattr(script, "OnIdle", None)
+        if on_idle is not None:
+            on_idle()
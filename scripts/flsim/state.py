@@ -0,0 +1,98 @@
+"""State of the simulated FL Studio project"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Set, Tuple
+
+import midi
+
+__all__ = ["Channel", "Track", "Project"]
+
+# defaults of a new FL Studio project
+CHANNEL_VOLUME = 0.78125
+TRACK_VOLUME = 0.8
+PITCH_RANGE = 2
+PARAM_COUNT = 16
+TEMPO = 140.0
+
+
+@dataclass
+class Channel:
+    """A channel of the channel rack"""
+
+    name: str
+    volume: float = CHANNEL_VOLUME
+    pan: float = 0.0
+    pitch: float = 0.0
+    """Normalized pitch, between -1 and 1 of `pitch_range` semitones"""
+    pitch_range: int = PITCH_RANGE
+    muted: bool = False
+    solo: bool = False
+    plugin: bool = True
+    """Indicates whether the channel hosts a valid plugin"""
+    preset: int = 0
+    params: List[float] = field(default_factory=lambda: [0.0] * PARAM_COUNT)
+    editor: bool = False
+    """Indicates whether the channel settings window is shown"""
+    quantized: int = 0
+    steps: Dict[int, Set[int]] = field(default_factory=dict)
+    """Step sequencer positions that are set, by pattern number"""
+
+
+@dataclass
+class Track:
+    """A mixer track"""
+
+    volume: float = TRACK_VOLUME
+    pan: float = 0.0
+    stereo_sep: float = 0.0
+    muted: bool = False
+    solo: bool = False
+
+
+@dataclass
+class Project:
+    """Everything the simulated FL Studio API reads and writes"""
+
+    channels: List[Channel]
+    tracks: List[Track]
+    pattern_count: int
+    pattern: int = 1
+    selected_channel: int = 0
+    selected_track: int = 0
+    playing: bool = False
+    recording: bool = False
+    loop_mode: int = 0
+    """0 for pattern and 1 for song mode"""
+    song_pos: float = 0.0
+    """Normalized song position, between 0 and 1"""
+    tempo: float = TEMPO
+    metronome: bool = False
+    count_in: bool = False
+    snap: int = midi.Snap_Line
+    last_snap: int = midi.Snap_Line
+    visible: Set[int] = field(default_factory=set)
+    """Visible windows, by `midi.wid*` index"""
+    focused: int = -1
+    """Focused window or -1 when no window is focused"""
+    settings: bool = False
+    """Indicates whether the settings window is shown"""
+    jog_pos: int = 0
+    """Sum of the `ui.jog` values, e.g. the item selected in a scrolled list"""
+    undo_pos: int = 0
+    saves: int = 0
+    rec_values: Dict[int, int] = field(default_factory=dict)
+    """Values of REC events, by event ID"""
+    sounding: Set[Tuple[int, int]] = field(default_factory=set)
+    """(channel, note) pairs started with `channels.midiNoteOn` and not yet released"""
+
+    @classmethod
+    def create(
+        cls, channels: int = 16, tracks: int = 127, patterns: int = 8
+    ) -> "Project":
+        """Create a project with the given number of channels, mixer tracks and patterns"""
+
+        return cls(
+            channels=[Channel(f"Channel {index + 1}") for index in range(channels)],
+            tracks=[Track() for _ in range(tracks)],
+            pattern_count=patterns,
+        )
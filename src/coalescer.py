@@ -0,0 +1,401 @@
+import time
+from typing import Callable
+
+from consts import (
+    CC_COUNT,
+    KNOB_COALESCE_NS,
+    ENCODER_ACCELERATION,
+    ENCODER_WINDOW_NS,
+    SCRUB_SEEK_TICKS,
+    SCRUB_RELEASE_TICKS,
+    SCRUB_GAINS,
+    SCRUB_DEADBAND,
+    MOD_WRITE_TICKS,
+    MOD_RELEASE_TICKS,
+    MOD_DEADBAND,
+)
+
+__all__ = ["KnobCoalescer", "EncoderAccelerator", "Scrubber", "ModStreamer"]
+
+KnobSetter = Callable[[int, int], None]
+"""Applies a knob value `(target, cc_val)` to FL Studio"""
+
+EncoderTurn = Callable[[int, int], None]
+"""Turns FL Studio by `(mode, steps)` of the 4D encoder"""
+
+ModSetter = Callable[[int, int], None]
+"""Writes a touch strip value `(channel, cc_val)` to the mod target of a channel"""
+
+
+class KnobCoalescer:
+    """
+    Coalesces the values of continuous knobs into at most one FL Studio write per `OnIdle` tick.
+
+    A knob turned quickly sends dozens of values per second. `push()` only
+    keeps the latest value of every knob and target (e.g. the mixer track the
+    knob was turned on), and `flush()` applies them. Values wait at most
+    `window` nanoseconds when `OnIdle` isn't called.
+    """
+
+    _setters: list[KnobSetter | None]
+    """Setter of every knob, indexed by CC number"""
+
+    _pending: dict[tuple[int, int], int]
+    """Latest value of every knob and target, in the order they were first turned"""
+
+    _window: int
+    """Longest time a value waits before it's applied (in nanoseconds)"""
+
+    _since: int
+    """Time the oldest pending value was pushed (in nanoseconds)"""
+
+    received: int
+    """Number of values pushed"""
+
+    applied: int
+    """Number of values applied to FL Studio"""
+
+    def __init__(
+        self,
+        knobs: tuple[tuple[int, KnobSetter], ...],
+        window: int = KNOB_COALESCE_NS,
+    ):
+        self._setters = [None] * CC_COUNT
+        for cc_num, setter in knobs:
+            self._setters[cc_num] = setter
+        self._pending = {}
+        self._window = window
+        self._since = 0
+        self.received = 0
+        self.applied = 0
+
+    def push(self, cc_num: int, target: int, cc_val: int) -> None:
+        """Keep the value of a knob turned on `target`, replacing the one not applied yet"""
+
+        now = time.perf_counter_ns()
+        if not self._pending:
+            self._since = now
+
+        self._pending[(cc_num, target)] = cc_val
+        self.received += 1
+
+        if now - self._since >= self._window:
+            self.flush()
+
+    def flush(self) -> None:
+        """Apply the pending values"""
+
+        if not self._pending:
+            return
+
+        pending, self._pending = self._pending, {}
+        for (cc_num, target), cc_val in pending.items():
+            self._setters[cc_num](target, cc_val)  # type: ignore[misc]
+        self.applied += len(pending)
+
+
+class EncoderAccelerator:
+    """
+    Sums the detents of the 4D encoder into at most one FL Studio call per `OnIdle` tick.
+
+    The faster the encoder turns, the more steps every detent is worth: the
+    detents summed in a tick are multiplied by the gain of the curve of the
+    encoder mode for that many detents (see `ENCODER_ACCELERATION`). Detents
+    wait at most `window` nanoseconds when `OnIdle` isn't called.
+    """
+
+    _turn: EncoderTurn
+    """Applies the accelerated steps"""
+
+    _curves: tuple[tuple[int, ...], ...]
+    """Gain by number of detents summed in a tick, for every encoder mode"""
+
+    _window: int
+    """Longest time a detent waits before it's applied (in nanoseconds)"""
+
+    _mode: int
+    """Encoder mode of the pending detents"""
+
+    _detents: int
+    """Sum of the pending detents, positive clockwise"""
+
+    _since: int
+    """Time the oldest pending detent was received (in nanoseconds)"""
+
+    received: int
+    """Number of detents received"""
+
+    applied: int
+    """Number of FL Studio calls the detents were applied with"""
+
+    def __init__(
+        self,
+        turn: EncoderTurn,
+        curves: tuple[tuple[int, ...], ...] = ENCODER_ACCELERATION,
+        window: int = ENCODER_WINDOW_NS,
+    ):
+        self._turn = turn
+        self._curves = curves
+        self._window = window
+        self._mode = 0
+        self._detents = 0
+        self._since = 0
+        self.received = 0
+        self.applied = 0
+
+    def push(self, mode: int, detents: int) -> None:
+        """Add detents turned in `mode`, positive clockwise"""
+
+        if self._detents and mode != self._mode:
+            self.flush()
+
+        now = time.perf_counter_ns()
+        if not self._detents:
+            self._since = now
+
+        self._mode = mode
+        self._detents += detents
+        self.received += 1
+
+        if now - self._since >= self._window:
+            self.flush()
+
+    def flush(self) -> None:
+        """Apply the pending detents as a single accelerated turn"""
+
+        detents = self._detents
+        if not detents:
+            return
+
+        self._detents = 0
+        curve = self._curves[self._mode]
+        gain = curve[min(abs(detents), len(curve)) - 1]
+        self._turn(self._mode, detents * gain)
+        self.applied += 1
+
+
+class Scrubber:
+    """
+    Scrubs the song position with the touch strip, seeking at most once every `SCRUB_SEEK_TICKS` `OnIdle` ticks.
+
+    Touching the strip after it was released seeks to the touched position.
+    While the finger slides, the position moves by the values slid in every
+    tick instead, by a fraction of a step for slow slides (see `SCRUB_GAINS`),
+    which is finer than the 128 values of the strip. Moving back against the
+    slide by up to `SCRUB_DEADBAND` values is taken as the finger wobbling, and
+    so is moving by that much right after touching it. Only the newest
+    position is sought.
+    """
+
+    _seek: Callable[[float], None]
+    """Sets the song position (0.0 to 1.0)"""
+
+    _position: float
+    """Song position to seek to"""
+
+    _pending: bool
+    """Indicates whether `_position` wasn't sought yet"""
+
+    _last: int
+    """Previous touch strip value, -1 when the strip is released"""
+
+    _direction: int
+    """Direction of the slide, 1 forward, -1 backward and 0 before it moved"""
+
+    _moved: int
+    """Values slid since the last tick"""
+
+    _idle_ticks: int
+    """`OnIdle` ticks since the strip was last touched"""
+
+    _wait: int
+    """`OnIdle` ticks to wait before the next seek"""
+
+    received: int
+    """Number of touch strip values received"""
+
+    seeks: int
+    """Number of seeks"""
+
+    def __init__(self, seek: Callable[[float], None]):
+        self._seek = seek
+        self._position = 0.0
+        self._pending = False
+        self._last = -1
+        self._direction = 0
+        self._moved = 0
+        self._idle_ticks = 0
+        self._wait = 0
+        self.received = 0
+        self.seeks = 0
+
+    def touch(self, cc_val: int) -> None:
+        """Move the position with a touch strip value"""
+
+        self.received += 1
+        self._idle_ticks = 0
+        last = self._last
+
+        if last < 0:
+            self._position = min(cc_val / 100, 1.0)
+            self._pending = True
+            self._direction = 0
+            self._moved = 0
+        else:
+            delta = cc_val - last
+            # small moves only continue a slide, they never start or turn one
+            if abs(delta) <= SCRUB_DEADBAND and delta * self._direction <= 0:
+                return
+            self._moved += delta
+            self._direction = 1 if delta > 0 else -1
+
+        self._last = cc_val
+
+    def tick(self) -> None:
+        """Seek to the newest position if the rate allows it, called on every `OnIdle` tick"""
+
+        self._slide()
+        if self._last >= 0:
+            self._idle_ticks += 1
+            if self._idle_ticks >= SCRUB_RELEASE_TICKS:
+                self._last = -1
+
+        if self._wait:
+            self._wait -= 1
+        if self._pending and not self._wait:
+            self.flush()
+
+    def flush(self) -> None:
+        """Seek to the newest position now"""
+
+        self._slide()
+        if not self._pending:
+            return
+
+        self._pending = False
+        self._seek(self._position)
+        self._wait = SCRUB_SEEK_TICKS
+        self.seeks += 1
+
+    def _slide(self) -> None:
+        """Move the position by the values slid since the last tick, scaled by their speed"""
+
+        moved = self._moved
+        if not moved:
+            return
+
+        self._moved = 0
+        gain = SCRUB_GAINS[min(abs(moved), len(SCRUB_GAINS)) - 1]
+        self._position = min(max(self._position + moved * gain / 100, 0.0), 1.0)
+        self._pending = True
+
+
+class ModStreamer:
+    """
+    Streams the touch strip to a mod target at a bounded rate.
+
+    Touching the strip after it was released takes the touched value. While
+    the finger slides, moving back against the slide by up to `MOD_DEADBAND`
+    values is taken as the finger wobbling, and so is moving by that much
+    right after touching it. The ends of the strip are always taken.
+
+    Values are written on `OnIdle` ticks only, at most once every
+    `MOD_WRITE_TICKS` ticks whatever the rate of the strip. Only the newest
+    value taken since the last write is written, and never when FL Studio
+    already has it, so changes made in FL Studio are kept until the strip
+    moves again.
+    """
+
+    _set: ModSetter
+    """Writes the value to the mod target of a channel"""
+
+    _target: int
+    """Channel of the value to write, -1 before the strip is touched"""
+
+    _value: int
+    """Newest touch strip value taken"""
+
+    _pending: bool
+    """Indicates whether `_value` was taken since the last write"""
+
+    _touched: bool
+    """Indicates whether the strip is touched, until `MOD_RELEASE_TICKS` ticks without a value"""
+
+    _direction: int
+    """Direction of the slide, 1 up, -1 down and 0 before it moved"""
+
+    _written: tuple[int, int]
+    """Channel and value FL Studio has, written or reported by `sync()`"""
+
+    _idle_ticks: int
+    """`OnIdle` ticks since the strip was last touched"""
+
+    _wait: int
+    """`OnIdle` ticks to wait before the next write"""
+
+    received: int
+    """Number of touch strip values received"""
+
+    writes: int
+    """Number of values written to FL Studio"""
+
+    def __init__(self, set_value: ModSetter):
+        self._set = set_value
+        self._target = -1
+        self._value = -1
+        self._pending = False
+        self._touched = False
+        self._direction = 0
+        self._written = (-1, -1)
+        self._idle_ticks = 0
+        self._wait = 0
+        self.received = 0
+        self.writes = 0
+
+    def touch(self, target: int, cc_val: int) -> None:
+        """Take a touch strip value for the mod target of channel `target`"""
+
+        self.received += 1
+        self._idle_ticks = 0
+
+        if target != self._target or not self._touched:
+            self._target = target
+            self._touched = True
+            self._direction = 0
+        elif 0 < cc_val < 100:
+            delta = cc_val - self._value
+            # small moves only continue a slide, they never start or turn one
+            if abs(delta) <= MOD_DEADBAND and delta * self._direction <= 0:
+                return
+            self._direction = 1 if delta > 0 else -1
+
+        self._value = cc_val
+        self._pending = True
+
+    def sync(self, target: int, cc_val: int) -> None:
+        """Take the value FL Studio reports for the mod target of channel `target`"""
+
+        self._written = (target, cc_val)
+
+    def tick(self) -> None:
+        """Write the newest value if the rate allows it, called on every `OnIdle` tick"""
+
+        if self._touched:
+            self._idle_ticks += 1
+            if self._idle_ticks >= MOD_RELEASE_TICKS:
+                self._touched = False
+
+        if self._wait:
+            self._wait -= 1
+        if self._wait or not self._pending:
+            return
+
+        self._pending = False
+        pending = (self._target, self._value)
+        if pending == self._written:
+            return
+
+        self._written = pending
+        self._set(*pending)
+        self._wait = MOD_WRITE_TICKS
+        self.writes += 1
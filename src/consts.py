@@ -1,18 +1,44 @@
 __all__ = [
     "CC_COUNT",
     "NOTES_COUNT",
+    "GRID_PAGE_MASK",
     "SEMITONES_IN_OCTAVE",
     "MIN_SEMI_OFFSET",
     "MAX_SEMI_OFFSET",
     "CHANNEL_VOL_STEP",
     "MIXER_TRACK_VOL_STEP",
     "SWING_STEP",
+    "MIDI_CHANNELS_COUNT",
+    "LED_SLOTS_PER_CHANNEL",
+    "LED_UNKNOWN",
+    "LED_SYSEX_FRAMES",
+    "LED_SYSEX_HEADER",
+    "LED_SYSEX_FRAME_SIZE",
+    "REFRESH_BUDGET_NS",
+    "KNOB_COALESCE_NS",
+    "FEEDBACK_HOLD_OFF_NS",
+    "ENCODER_ACCELERATION",
+    "ENCODER_WINDOW_NS",
+    "SCRUB_SEEK_TICKS",
+    "SCRUB_RELEASE_TICKS",
+    "SCRUB_GAINS",
+    "SCRUB_DEADBAND",
+    "MOD_PARAM",
+    "MOD_WRITE_TICKS",
+    "MOD_RELEASE_TICKS",
+    "MOD_DEADBAND",
+    "PROFILER",
+    "PROFILER_BUCKETS",
+    "PROFILER_REPORT_PAD",
 ]
 
 CC_COUNT = 128
 
 NOTES_COUNT = 16
 
+# Bits of a single page in a step grid bitmap
+GRID_PAGE_MASK = (1 << NOTES_COUNT) - 1
+
 MIN_OCTAVE = -5
 MAX_OCTAVE = 5
 
@@ -26,3 +52,94 @@ CHANNEL_VOL_STEP = 0.03125
 MIXER_TRACK_VOL_STEP = 0.012125
 
 SWING_STEP = 1
+
+MIDI_CHANNELS_COUNT = 16
+
+# Every MIDI channel has a slot for each CC followed by a slot for each pad note
+LED_SLOTS_PER_CHANNEL = CC_COUNT + NOTES_COUNT
+
+# Marks an LED slot whose state on the device is not known (MIDI values never exceed 127)
+LED_UNKNOWN = 0xFF
+
+# Send LED changes as one SysEx frame per flush instead of one message per LED.
+# The stock MK3 MIDI mode does not decode these frames, so only enable this
+# together with a device side handler (e.g. a MIDI translator) that does.
+LED_SYSEX_FRAMES = False
+
+# SysEx start, Native Instruments manufacturer ID and the LED frame command.
+# Each change in the frame is 3 bytes: 0x00 + channel for CC or 0x10 + channel for
+# NOTE ON, the CC/note number and the value. The frame ends with SysEx end (0xF7).
+LED_SYSEX_HEADER = (0xF0, 0x00, 0x21, 0x09, 0x7F)
+
+LED_SYSEX_FRAME_SIZE = (
+    len(LED_SYSEX_HEADER) + 3 * LED_SLOTS_PER_CHANNEL * MIDI_CHANNELS_COUNT + 1
+)
+
+# Time budget for running deferred refreshes on a single `OnIdle` tick (in nanoseconds)
+REFRESH_BUDGET_NS = 4_000_000
+
+# Longest time the latest value of a turned knob waits for an `OnIdle` tick
+# before it's written to FL Studio (in nanoseconds). 0 writes every value.
+KNOB_COALESCE_NS = 40_000_000
+
+# Time after the last touch of a knob during which the values FL Studio reports
+# for it aren't sent back to the device (in nanoseconds)
+FEEDBACK_HOLD_OFF_NS = 300_000_000
+
+# Acceleration of the 4D encoder in every `FourDEncoderMode` (JOG, VOLUME, SWING
+# and TEMPO): the gain of every detent by number of detents turned in one
+# `OnIdle` tick, the last gain applies to faster turns. A single detent per tick
+# always moves by one step.
+ENCODER_ACCELERATION = (
+    (1, 1, 2, 2, 3, 3, 4, 4, 6),
+    (1, 1, 1, 2, 2, 2, 3),
+    (1, 1, 1, 2),
+    (1, 1, 2, 2, 3, 3, 4),
+)
+
+# Longest time the detents of the 4D encoder wait for an `OnIdle` tick before
+# they're applied (in nanoseconds). 0 applies every detent without acceleration.
+ENCODER_WINDOW_NS = 40_000_000
+
+# `OnIdle` ticks between two seeks of the touch strip in TRANSPORT mode
+# (a tick is ~20 ms)
+SCRUB_SEEK_TICKS = 2
+
+# `OnIdle` ticks without a touch strip value after which the strip is released,
+# the next touch seeks to the touched position
+SCRUB_RELEASE_TICKS = 5
+
+# Steps of the song position (in 1/100) moved by every value a slide of the touch
+# strip moves, by number of values slid in one `OnIdle` tick, the last one applies
+# to faster slides
+SCRUB_GAINS = (0.25, 0.5, 1.0)
+
+# Values the touch strip must move to start or turn a slide, smaller moves are the
+# finger wobbling
+SCRUB_DEADBAND = 2
+
+# Plugin parameter of the selected channel the touch strip drives in MOD mode
+MOD_PARAM = 0
+
+# `OnIdle` ticks between two writes of the touch strip in MOD mode (a tick is
+# ~20 ms), whatever the rate the strip sends values at
+MOD_WRITE_TICKS = 1
+
+# `OnIdle` ticks without a touch strip value after which the strip is released
+# in MOD mode, the next touch takes the touched value
+MOD_RELEASE_TICKS = 5
+
+# Values the touch strip must move to start or turn a slide in MOD mode, smaller
+# moves are the finger wobbling. The ends of the strip are always taken.
+MOD_DEADBAND = 2
+
+# Records the time spent in the entry points and syncs (see `profiler.py`).
+# The build script strips the profiler unless it is run with `--profile`.
+PROFILER = False
+
+# Number of power of two buckets of a profiler histogram, the last one holds
+# everything from ~0.5 s up
+PROFILER_BUCKETS = 30
+
+# Pad that prints the profiler report when released while shifting
+PROFILER_REPORT_PAD = 3
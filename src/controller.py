@@ -6,17 +6,25 @@ import general
 import patterns
 import channels
 import transport
+from typing import Callable
 from fl_classes import FlMidiMsg
 
 from pads import *
+from leds import *
+from profiler import *
 from enums import *
 from notes import *
 from consts import *
 from controls import *
 from utilities import *
+from scheduler import *
+from coalescer import *
 
 __all__ = ["Controller"]
 
+CCHandler = Callable[[int, int], bool | None]
+"""Handles a control change `(cc_num, cc_val)`. Returns False to leave the message unhandled"""
+
 
 class Controller:
     """Represents the state of the Maschine MK3 controller"""
@@ -45,6 +53,12 @@ class Controller:
     _step_page: int
     """Current step sequence page (0-15) for STEP mode pad display"""
 
+    _grid_bits: int
+    """Step grid of the selected channel as a bitmap (bit N is step N)"""
+
+    _grid_pages: int
+    """Pages of `_grid_bits` read from FL Studio since the last invalidation (bit N is page N)"""
+
     _semi_offset: int
     """Current semitone offset"""
 
@@ -54,6 +68,24 @@ class Controller:
     _chordset_index: int
     """Current chord set index for chords mode (0-7)"""
 
+    _voice_channels: list[int]
+    """Channel the held notes of every pad were started on (-1 when the pad holds no notes)"""
+
+    _voice_notes: list[tuple[int, ...]]
+    """MIDI notes started by every pad while it is held"""
+
+    _keyboard_notes: tuple[tuple[int], ...]
+    """Final MIDI note of every pad in keyboard mode, compiled from the current scale and semitone offset"""
+
+    _keyboard_notes_key: tuple[int, int]
+    """Scale index and semitone offset `_keyboard_notes` was compiled for"""
+
+    _chord_notes: tuple[tuple[int, ...], ...]
+    """Final MIDI notes of every pad in chords mode, compiled from the current chord set and semitone offset"""
+
+    _chord_notes_key: tuple[int, int]
+    """Chord set index and semitone offset `_chord_notes` was compiled for"""
+
     _fixed_velocity: int
     """Fixed velocity value for pads when fixed velocity mode is enabled"""
 
@@ -69,6 +101,30 @@ class Controller:
     _is_selecting_channel: bool
     """Indicates whether the user is currently selecting a channel"""
 
+    _scheduler: RefreshScheduler
+    """Defers `OnRefresh` syncs to the next `OnIdle` tick"""
+
+    _knobs: KnobCoalescer
+    """Defers the values of the mixer and channel knobs to the next `OnIdle` tick"""
+
+    _encoder: EncoderAccelerator
+    """Sums the 4D encoder turns until the next `OnIdle` tick"""
+
+    _scrubber: Scrubber
+    """Seeks the song position with the touch strip in TRANSPORT mode"""
+
+    _mod: ModStreamer
+    """Writes the touch strip to the mod target of the selected channel in MOD mode"""
+
+    _deferred_ccs: frozenset[int]
+    """Controls applied on the next `OnIdle` tick, the other ones apply them first"""
+
+    _cc_handlers: list[CCHandler | None]
+    """CC handlers indexed by CC number"""
+
+    _shift_cc_handlers: list[CCHandler | None]
+    """CC handlers indexed by CC number, used while the shift button is pressed"""
+
     def __init__(self):
         self._pad_mode = PadMode.OMNI
         self._pad_mode_color = PadModeColor.OMNI
@@ -78,16 +134,63 @@ class Controller:
         self._selected_channel = 0
         self._channel_page = 0
         self._step_page = 0
+        self._grid_bits = 0
+        self._grid_pages = 0
         self._semi_offset = 0
         self._scale_index = 0
         self._chordset_index = 0
+        self._voice_channels = [-1] * NOTES_COUNT
+        self._voice_notes = [()] * NOTES_COUNT
+        self._keyboard_notes = ()
+        self._keyboard_notes_key = (-1, 0)
+        self._chord_notes = ()
+        self._chord_notes_key = (-1, 0)
         self._fixed_velocity = 100
         self._is_fixed_velocity = False
         self._shifting = False
         self._is_selecting_pattern = False
         self._is_selecting_channel = False
+        self._scheduler = RefreshScheduler(
+            (
+                (Sync.SELECTED_CHANNEL, self._sync_selected_channel),
+                (Sync.CHANNEL_CONTROLS, self._sync_channel_controls),
+                (Sync.CHANNEL_PADS, self._sync_channel_pads),
+                (Sync.GROUPS, self._sync_groups),
+                (Sync.MIXER_CONTROLS, self._sync_mixer_controls),
+                (Sync.CC_LEDS, self._sync_cc_led_states),
+                (Sync.REC_LED, self._sync_rec_led),
+                (Sync.TOUCH_STRIP, self._sync_touch_strip),
+            )
+        )
+        self._knobs = KnobCoalescer(
+            (
+                (CC.MIX_VOL, self._set_mix_vol),
+                (CC.MIX_PAN, self._set_mix_pan),
+                (CC.MIX_SS, self._set_mix_ss),
+                (CC.CHAN_VOL, self._set_chan_vol),
+                (CC.CHAN_PAN, self._set_chan_pan),
+            )
+        )
+        self._encoder = EncoderAccelerator(self._turn_encoder)
+        self._scrubber = Scrubber(transport.setSongPos)
+        self._mod = ModStreamer(self._set_mod)
+        self._deferred_ccs = frozenset(
+            (
+                CC.MIX_VOL,
+                CC.MIX_PAN,
+                CC.MIX_SS,
+                CC.CHAN_VOL,
+                CC.CHAN_PAN,
+                CC.ENCODER_TURN,
+                CC.TOUCH_STRIP,
+            )
+        )
+        self._build_cc_handlers()
 
     def on_init(self) -> None:
+        # the device may have been reset while the script was not running
+        led_buffer.invalidate()
+
         self._init_led_states()
         self._sync_cc_led_states()
         self._sync_selected_channel()
@@ -98,6 +201,8 @@ class Controller:
         self._sync_groups()
 
     def on_de_init(self) -> None:
+        self._flush_inputs()
+        self._release_all_voices()
         self._deinit_led_states()
 
     def on_refresh(self, flags: int) -> None:
@@ -112,36 +217,50 @@ class Controller:
         mixer_controls_event = flags & midi.HW_Dirty_Mixer_Controls
         leds_event = flags & midi.HW_Dirty_LEDs
 
+        if channel_event or pattern_event:
+            self._grid_pages = 0
+
+        # Syncs are only scheduled here and run once per `OnIdle` tick (see `on_idle`),
+        # so a burst of refreshes costs no more than a single one.
+        sync = 0
+
         # This `elif` block is needed because `leds_event` is triggered alongside other events
         # so we only want to run the full leds sync logic when no other events are present.
         # e.g. `leds_event` is triggered alongside `channel_event`, so we only want to sync leds
         # that are related to `channel_event` in that case.
         if channel_event:
-            self._sync_selected_channel()
-            self._sync_channel_controls()
-            self._sync_channel_pads()
-            self._sync_groups()
+            sync |= (
+                Sync.SELECTED_CHANNEL
+                | Sync.CHANNEL_CONTROLS
+                | Sync.CHANNEL_PADS
+                | Sync.GROUPS
+            )
+            if self._touch_strip_mode == TouchStripMode.MOD:
+                sync |= Sync.TOUCH_STRIP
         elif mixer_sel_event or mixer_display_event or mixer_controls_event:
-            self._sync_mixer_controls()
+            sync |= Sync.MIXER_CONTROLS
         elif leds_event:
-            self._sync_cc_led_states()
+            sync |= Sync.CC_LEDS
             if self._touch_strip_mode == TouchStripMode.TRANSPORT:
-                self._sync_song_position()
+                sync |= Sync.TOUCH_STRIP
             if not self._is_selecting_pattern:
-                self._sync_channel_pads()
+                sync |= Sync.CHANNEL_PADS
 
         # for some reason turning record on/off triggers `mixer_controls_event` alongside `leds_event`,
         # so we need to handle it separately
         if mixer_controls_event and leds_event:
-            _midi_out_msg_control_change(CC.REC, _on_off(transport.isRecording()))
+            sync |= Sync.REC_LED
 
         if pattern_event:
-            self._sync_channel_pads()
+            sync |= Sync.CHANNEL_PADS
 
         if control_values_event:
-            if self._touch_strip_mode == TouchStripMode.PITCH:
-                self._sync_touch_strip_value(self._touch_strip_mode)
-            self._sync_channel_controls()
+            if self._touch_strip_mode in (TouchStripMode.PITCH, TouchStripMode.MOD):
+                sync |= Sync.TOUCH_STRIP
+            sync |= Sync.CHANNEL_CONTROLS
+
+        if sync:
+            self._scheduler.schedule(sync)
 
         # # Debugging output for refresh flags
         # if flags & midi.HW_Dirty_Mixer_Sel:
@@ -171,321 +290,428 @@ class Controller:
         # if flags & midi.HW_ChannelEvent:
         #     print("midi.HW_ChannelEvent")
 
+    def on_idle(self) -> None:
+        # the deferred inputs first, so the syncs read them back from FL Studio
+        self._knobs.flush()
+        self._encoder.flush()
+        self._scrubber.tick()
+        self._mod.tick()
+        self._scheduler.drain()
+
     def on_control_change(self, msg: FlMidiMsg) -> None:
         cc_num, cc_val = msg.controlNum, msg.controlVal
 
-        match cc_num:
-            # -------- CONTROL BUTTONS SECTION -------- #
-            case CC.CHANNEL | CC.ARRANGER | CC.MIXER | CC.BROWSER:
-                match cc_num:
-                    case CC.CHANNEL:
-                        wid = midi.widChannelRack
-                    case CC.ARRANGER:
-                        wid = midi.widPlaylist
-                    case CC.MIXER:
-                        wid = midi.widMixer
-                    case CC.BROWSER:
-                        wid = midi.widBrowser
-                    case _:
-                        return
-
-                is_visible = ui.getVisible(wid)
-
-                if self._shifting:
-                    if not is_visible:
-                        ui.showWindow(wid)
-                    ui.setFocused(wid)
-                else:
-                    if is_visible:
-                        ui.hideWindow(wid)
-                    else:
-                        ui.showWindow(wid)
+        # the device may have changed the LED of this control by itself
+        led_buffer.forget_cc(cc_num, msg.midiChan)
 
-                is_visible = ui.getVisible(wid)
+        # e.g. pushing the encoder after turning it
+        if cc_num not in self._deferred_ccs:
+            self._flush_inputs()
 
-                _midi_out_msg_control_change(cc_num, _on_off(is_visible))
+        handlers = self._shift_cc_handlers if self._shifting else self._cc_handlers
+        handler = handlers[cc_num]
 
-            case CC.PLUGIN:
-                channels.showCSForm(self._selected_channel, -1)
+        # handlers return False when they leave the message unhandled
+        if handler is None or handler(cc_num, cc_val) is False:
+            return
 
-            case CC.FILE_SAVE:
-                transport.globalTransport(midi.FPT_Save, 1)
+        msg.handled = True
 
-            case CC.SETTINGS:
-                transport.globalTransport(midi.FPT_F10, 1)
+    def _flush_inputs(self) -> None:
+        """Applies the knob values, encoder turns and song position deferred to the next `OnIdle` tick"""
 
-            # -------- EDIT (ENCODER) SECTION -------- #
-            case CC.ENCODER_PUSH:
-                ui.enter()
-
-            case CC.ENCODER_TURN:
-                is_clockwise = cc_val == 65  # CLOCKWISE
-                multiplier = 1 if is_clockwise else -1
-
-                track_number = mixer.trackNumber()
-
-                match self._encoder_mode:
-                    case FourDEncoderMode.JOG:
-                        ui.jog(1 * multiplier)
-
-                    case FourDEncoderMode.VOLUME:
-                        if ui.getFocused(midi.widMixer):
-                            target_vol = (
-                                mixer.getTrackVolume(track_number)
-                                + MIXER_TRACK_VOL_STEP * multiplier
-                            )
-                            if 0.0 < target_vol < 1.0:
-                                mixer.setTrackVolume(track_number, target_vol)
-                        elif ui.getFocused(midi.widChannelRack):
-                            channels.setChannelVolume(
-                                self._selected_channel,
-                                channels.getChannelVolume(self._selected_channel)
-                                + CHANNEL_VOL_STEP * multiplier,
-                            )
-
-                    case FourDEncoderMode.SWING:
-                        swing = general.processRECEvent(
-                            midi.REC_MainShuffle, 0, midi.REC_GetValue
-                        )
-                        target_swing = swing + (SWING_STEP * multiplier)
-                        if 0 <= target_swing <= 128:
-                            general.processRECEvent(
-                                midi.REC_MainShuffle,
-                                target_swing,
-                                midi.REC_UpdateControl | midi.REC_Control,
-                            )
-
-                    case FourDEncoderMode.TEMPO:
-                        transport.globalTransport(midi.FPT_TempoJog, 10 * multiplier)
-
-            case CC.ENCODER_UP:
-                ui.up()
-
-            case CC.ENCODER_RIGHT:
-                ui.right()
-
-            case CC.ENCODER_DOWN:
-                ui.down()
-
-            case CC.ENCODER_LEFT:
-                ui.left()
-
-            case CC.ENCODER_VOLUME | CC.ENCODER_SWING | CC.ENCODER_TEMPO:
-                self._toggle_encoder_mode(cc_num)
+        self._knobs.flush()
+        self._encoder.flush()
+        self._scrubber.flush()
 
-            # -------- TOUCH STRIP SECTION -------- #
-            case CC.TOUCH_STRIP:
-                match self._touch_strip_mode:
-                    case TouchStripMode.TRANSPORT:
-                        transport.setSongPos(cc_val / 100)
-                        _midi_out_msg_control_change(CC.TOUCH_STRIP, cc_val)
-                    case TouchStripMode.PITCH:
-                        channels.setChannelPitch(
-                            self._selected_channel,
-                            _percent_to_bipolar(cc_val),
-                        )
-                    case TouchStripMode.MOD:
-                        pass  # TODO
-                    case TouchStripMode.PERFORM:
-                        pass  # TODO
-                    case TouchStripMode.NOTES:
-                        pass  # TODO
-
-            case (
-                CC.TOUCH_STRIP_PITCH
-                | CC.TOUCH_STRIP_MOD
-                | CC.TOUCH_STRIP_PERFORM
-                | CC.TOUCH_STRIP_NOTES
-            ):
-                self._toggle_touch_strip_mode(cc_num)
-                self._sync_touch_strip_value(self._touch_strip_mode)
+    def _build_cc_handlers(self) -> None:
+        """Builds the CC handler tables, indexed by CC number"""
 
+        handlers: list[CCHandler | None] = [None] * CC_COUNT
+
+        for cc_nums, handler in (
+            # -------- CONTROL BUTTONS SECTION -------- #
+            ((CC.CHANNEL, CC.ARRANGER, CC.MIXER, CC.BROWSER), self._on_toggle_window),
+            ((CC.PLUGIN,), self._on_plugin),
+            ((CC.FILE_SAVE,), self._on_file_save),
+            ((CC.SETTINGS,), self._on_settings),
+            # -------- EDIT (ENCODER) SECTION -------- #
+            ((CC.ENCODER_PUSH,), self._on_encoder_push),
+            ((CC.ENCODER_TURN,), self._on_encoder_turn),
+            ((CC.ENCODER_UP,), self._on_encoder_up),
+            ((CC.ENCODER_RIGHT,), self._on_encoder_right),
+            ((CC.ENCODER_DOWN,), self._on_encoder_down),
+            ((CC.ENCODER_LEFT,), self._on_encoder_left),
+            (
+                (CC.ENCODER_VOLUME, CC.ENCODER_SWING, CC.ENCODER_TEMPO),
+                self._on_encoder_mode,
+            ),
+            # -------- TOUCH STRIP SECTION -------- #
+            ((CC.TOUCH_STRIP,), self._on_touch_strip),
+            (
+                (
+                    CC.TOUCH_STRIP_PITCH,
+                    CC.TOUCH_STRIP_MOD,
+                    CC.TOUCH_STRIP_PERFORM,
+                    CC.TOUCH_STRIP_NOTES,
+                ),
+                self._on_touch_strip_mode,
+            ),
             # -------- GROUP SECTION -------- #
-            case (
-                CC.GROUP_A
-                | CC.GROUP_B
-                | CC.GROUP_C
-                | CC.GROUP_D
-                | CC.GROUP_E
-                | CC.GROUP_F
-                | CC.GROUP_G
-                | CC.GROUP_H
-            ):
-                page_idx = cc_num - 100
+            (tuple(range(CC.GROUP_A, CC.GROUP_H + 1)), self._on_group),
+            # -------- TRASPORT SECTION -------- #
+            ((CC.RESTART,), self._on_restart),
+            ((CC.ERASE,), self._on_erase),
+            ((CC.TAP,), self._on_tap),
+            ((CC.FOLLOW,), self._on_follow),
+            ((CC.PLAY,), self._on_play),
+            ((CC.STOP,), self._on_stop),
+            ((CC.REC,), self._on_rec),
+            # -------- PAD SECTION -------- #
+            ((CC.FIXED_VEL,), self._on_fixed_vel),
+            (
+                (CC.PAD_MODE, CC.KEYBOARD_MODE, CC.CHORDS_MODE, CC.STEP_MODE),
+                self._on_pad_mode,
+            ),
+            ((CC.PATTERN,), self._on_pattern),
+            ((CC.SELECT,), self._on_select),
+            ((CC.SOLO,), self._on_solo),
+            ((CC.MUTE,), self._on_mute),
+            # ---- KNOB PAGE SECTION ---- #
+            # BUTTONS
+            ((CC.PRESET_PREV, CC.PRESET_NEXT), self._on_preset),
+            # KNOBS
+            ((CC.MIX_TRACK,), self._on_mix_track),
+            ((CC.MIX_VOL, CC.MIX_PAN, CC.MIX_SS), self._on_mix_knob),
+            ((CC.CHAN_SEL,), self._on_chan_sel),
+            ((CC.CHAN_VOL, CC.CHAN_PAN), self._on_chan_knob),
+            ((CC.FIX_VEL,), self._on_fix_vel),
+            # -------- SHIFT -------- #
+            ((CC.SHIFT,), self._on_shift),
+        ):
+            for cc_num in cc_nums:
+                handlers[cc_num] = handler
 
-                match self._pad_mode:
-                    case PadMode.OMNI:
-                        self._channel_page = page_idx
-                    case PadMode.KEYBOARD:
-                        self._scale_index = page_idx
-                    case PadMode.CHORDS:
-                        self._chordset_index = page_idx
-                    case PadMode.STEP:
-                        self._step_page = page_idx
-                    case _:
-                        return
+        self._cc_handlers = handlers
 
-                self._active_group = PadGroup(cc_num)
-                self._sync_groups()
+        # the shift layer only differs for controls that have a shift function
+        shift_handlers = list(handlers)
+        for cc_num in (CC.CHANNEL, CC.ARRANGER, CC.MIXER, CC.BROWSER):
+            shift_handlers[cc_num] = self._on_focus_window
+        shift_handlers[CC.RESTART] = self._on_loop
+        shift_handlers[CC.TAP] = self._on_metronome
+        shift_handlers[CC.REC] = self._on_count_in
+        shift_handlers[CC.STOP] = self._on_panic
 
-                self._sync_channel_pads()
+        self._shift_cc_handlers = shift_handlers
 
-            # -------- TRASPORT SECTION -------- #
-            case CC.RESTART if self._shifting:  # LOOP
-                transport.setLoopMode()
-            case CC.RESTART:
-                transport.stop()
-                transport.start()
+    # -------- CONTROL BUTTONS SECTION -------- #
+    def _on_toggle_window(self, cc_num: int, cc_val: int) -> None:
+        wid = self._get_window_id(cc_num)
 
-            case CC.ERASE:
-                ui.delete()
+        if ui.getVisible(wid):
+            ui.hideWindow(wid)
+        else:
+            ui.showWindow(wid)
 
-            case CC.TAP if self._shifting:  # METRO
-                transport.globalTransport(midi.FPT_Metronome, 1)
-            case CC.TAP:
-                transport.globalTransport(midi.FPT_TapTempo, 1)
+        _midi_out_msg_control_change(cc_num, _on_off(ui.getVisible(wid)))
 
-            case CC.FOLLOW:
-                ui.snapOnOff()
+    def _on_focus_window(self, cc_num: int, cc_val: int) -> None:
+        wid = self._get_window_id(cc_num)
 
-            case CC.PLAY:
-                transport.start()
+        if not ui.getVisible(wid):
+            ui.showWindow(wid)
+        ui.setFocused(wid)
 
-            case CC.STOP:
-                transport.stop()
+        _midi_out_msg_control_change(cc_num, _on_off(ui.getVisible(wid)))
 
-            case CC.REC if self._shifting:  # Count-in
-                transport.globalTransport(midi.FPT_CountDown, 1)
-            case CC.REC:
-                transport.record()
+    def _on_plugin(self, cc_num: int, cc_val: int) -> None:
+        channels.showCSForm(self._selected_channel, -1)
 
-            # -------- PAD SECTION -------- #
-            case CC.FIXED_VEL:
-                self._is_fixed_velocity = bool(cc_val)
-
-            case CC.PAD_MODE | CC.KEYBOARD_MODE | CC.CHORDS_MODE | CC.STEP_MODE:
-                for cc in (CC.PAD_MODE, CC.KEYBOARD_MODE, CC.CHORDS_MODE, CC.STEP_MODE):
-                    _midi_out_msg_control_change(cc, 127 if cc == cc_num else 0)
-
-                active_group = PadGroup.A
-                match cc_num:
-                    case CC.PAD_MODE:
-                        self._pad_mode = PadMode.OMNI
-                        self._pad_mode_color = PadModeColor.OMNI
-                        active_group += self._channel_page
-
-                    case CC.KEYBOARD_MODE:
-                        self._pad_mode = PadMode.KEYBOARD
-                        self._pad_mode_color = PadModeColor.KEYBOARD
-                        active_group += self._scale_index
-
-                    case CC.CHORDS_MODE:
-                        self._pad_mode = PadMode.CHORDS
-                        self._pad_mode_color = PadModeColor.CHORDS
-                        active_group += self._chordset_index
-
-                    case CC.STEP_MODE:
-                        self._pad_mode = PadMode.STEP
-                        self._pad_mode_color = PadModeColor.STEP
-                        active_group += self._step_page
-
-                    case _:
-                        pass
-
-                self._active_group = PadGroup(active_group)
-                self._sync_groups()
-
-                self._sync_channel_pads()
-
-            case CC.PATTERN:
-                self._is_selecting_pattern = bool(cc_val)
-                self._sync_channel_pads()
-
-            case CC.SELECT:
-                self._is_selecting_channel = bool(cc_val)
-                self._sync_channel_pads()
-
-            case CC.SOLO:
-                if ui.getFocused(midi.widChannelRack):
-                    channels.soloChannel(self._selected_channel)
-                elif ui.getFocused(midi.widMixer):
-                    if self._shifting:
-                        mixer.soloTrack(
-                            mixer.trackNumber(), -1, midi.fxSoloModeWithSourceTracks
-                        )
-                    else:
-                        mixer.soloTrack(
-                            mixer.trackNumber(), -1, midi.fxSoloModeWithDestTracks
-                        )
-
-            case CC.MUTE:
-                if ui.getFocused(midi.widChannelRack):
-                    channels.muteChannel(self._selected_channel)
-                elif ui.getFocused(midi.widMixer):
-                    mixer.muteTrack(mixer.trackNumber())
+    def _on_file_save(self, cc_num: int, cc_val: int) -> None:
+        transport.globalTransport(midi.FPT_Save, 1)
 
-            # ---- KNOB PAGE SECTION ---- #
-            # BUTTONS
-            case CC.PRESET_PREV | CC.PRESET_NEXT if cc_val:  # TODO: add mixer logic
-                if not plugins.isValid(self._selected_channel):
-                    return
+    def _on_settings(self, cc_num: int, cc_val: int) -> None:
+        transport.globalTransport(midi.FPT_F10, 1)
 
-                if cc_num == CC.PRESET_NEXT:
-                    plugins.nextPreset(self._selected_channel)
-                else:
-                    plugins.prevPreset(self._selected_channel)
+    # -------- EDIT (ENCODER) SECTION -------- #
+    def _on_encoder_push(self, cc_num: int, cc_val: int) -> None:
+        ui.enter()
 
-            # KNOBS
-            case CC.MIX_TRACK:
-                mixer.setTrackNumber(cc_val)
+    def _on_encoder_turn(self, cc_num: int, cc_val: int) -> None:
+        is_clockwise = cc_val == 65  # CLOCKWISE
+        self._encoder.push(self._encoder_mode, 1 if is_clockwise else -1)
 
-            case CC.MIX_VOL:
-                mixer.setTrackVolume(mixer.trackNumber(), cc_val / 125)
+    def _turn_encoder(self, mode: FourDEncoderMode, steps: int) -> None:
+        """Applies `steps` accelerated detents of the 4D encoder, positive clockwise"""
 
-            case CC.MIX_PAN:
-                mixer.setTrackPan(mixer.trackNumber(), _percent_to_bipolar(cc_val))
+        match mode:
+            case FourDEncoderMode.JOG:
+                ui.jog(steps)
+
+            case FourDEncoderMode.VOLUME:
+                if ui.getFocused(midi.widMixer):
+                    track_number = mixer.trackNumber()
+                    volume = mixer.getTrackVolume(track_number)
+                    target_vol = volume + MIXER_TRACK_VOL_STEP * steps
+                    target_vol = min(max(target_vol, 0.0), 1.0)
+                    if target_vol != volume:
+                        mixer.setTrackVolume(track_number, target_vol)
+                elif ui.getFocused(midi.widChannelRack):
+                    channels.setChannelVolume(
+                        self._selected_channel,
+                        channels.getChannelVolume(self._selected_channel)
+                        + CHANNEL_VOL_STEP * steps,
+                    )
 
-            case CC.MIX_SS:
-                mixer.setTrackStereoSep(
-                    mixer.trackNumber(), _percent_to_bipolar(cc_val)
+            case FourDEncoderMode.SWING:
+                swing = general.processRECEvent(
+                    midi.REC_MainShuffle, 0, midi.REC_GetValue
                 )
+                target_swing = min(max(swing + SWING_STEP * steps, 0), 128)
+                if target_swing != swing:
+                    general.processRECEvent(
+                        midi.REC_MainShuffle,
+                        target_swing,
+                        midi.REC_UpdateControl | midi.REC_Control,
+                    )
 
-            case CC.CHAN_SEL:
-                if cc_val < channels.channelCount():
-                    channels.selectOneChannel(cc_val)
-                else:
-                    _midi_out_msg_control_change(CC.CHAN_SEL, self._selected_channel)
+            case FourDEncoderMode.TEMPO:
+                transport.globalTransport(midi.FPT_TempoJog, 10 * steps)
+
+    def _on_encoder_up(self, cc_num: int, cc_val: int) -> None:
+        ui.up()
+
+    def _on_encoder_right(self, cc_num: int, cc_val: int) -> None:
+        ui.right()
+
+    def _on_encoder_down(self, cc_num: int, cc_val: int) -> None:
+        ui.down()
 
-            case CC.CHAN_VOL:
-                channels.setChannelVolume(self._selected_channel, cc_val / 100)
-            case CC.CHAN_PAN:
-                channels.setChannelPan(
-                    self._selected_channel, _percent_to_bipolar(cc_val)
+    def _on_encoder_left(self, cc_num: int, cc_val: int) -> None:
+        ui.left()
+
+    def _on_encoder_mode(self, cc_num: int, cc_val: int) -> None:
+        self._toggle_encoder_mode(cc_num)
+
+    # -------- TOUCH STRIP SECTION -------- #
+    def _on_touch_strip(self, cc_num: int, cc_val: int) -> None:
+        match self._touch_strip_mode:
+            case TouchStripMode.TRANSPORT:
+                # the strip shows where it's touched, the song position isn't echoed
+                led_buffer.touch_cc(cc_num, cc_val)
+                self._scrubber.touch(cc_val)
+            case TouchStripMode.PITCH:
+                channels.setChannelPitch(
+                    self._selected_channel,
+                    _percent_to_bipolar(cc_val),
                 )
+            case TouchStripMode.MOD:
+                led_buffer.touch_cc(cc_num, cc_val)
+                self._mod.touch(self._selected_channel, cc_val)
+            case TouchStripMode.PERFORM:
+                pass  # TODO
+            case TouchStripMode.NOTES:
+                pass  # TODO
 
-            case CC.FIX_VEL:
-                self._fixed_velocity = cc_val
+    def _set_mod(self, channel: int, cc_val: int) -> None:
+        if _has_mod_param(channel):
+            plugins.setParamValue(min(cc_val / 100, 1.0), MOD_PARAM, channel)
 
-            # -------- SHIFT -------- #
-            case CC.SHIFT:
-                self._shifting = bool(cc_val)
-                self._sync_channel_pads()
+    def _on_touch_strip_mode(self, cc_num: int, cc_val: int) -> None:
+        self._toggle_touch_strip_mode(cc_num)
+        self._sync_touch_strip_value(self._touch_strip_mode)
+
+    # -------- GROUP SECTION -------- #
+    def _on_group(self, cc_num: int, cc_val: int) -> bool | None:
+        page_idx = cc_num - CC.GROUP_A
 
-            # -------- DEFAULT -------- #
+        match self._pad_mode:
+            case PadMode.OMNI:
+                self._channel_page = page_idx
+            case PadMode.KEYBOARD:
+                self._scale_index = page_idx
+            case PadMode.CHORDS:
+                self._chordset_index = page_idx
+            case PadMode.STEP:
+                self._step_page = page_idx
             case _:
-                return
+                return False
 
-        msg.handled = True
+        self._active_group = PadGroup(cc_num)
+        self._sync_groups()
+
+        self._sync_channel_pads()
+
+    # -------- TRASPORT SECTION -------- #
+    def _on_restart(self, cc_num: int, cc_val: int) -> None:
+        transport.stop()
+        transport.start()
+
+    def _on_loop(self, cc_num: int, cc_val: int) -> None:
+        transport.setLoopMode()
+
+    def _on_erase(self, cc_num: int, cc_val: int) -> None:
+        ui.delete()
+
+    def _on_tap(self, cc_num: int, cc_val: int) -> None:
+        transport.globalTransport(midi.FPT_TapTempo, 1)
+
+    def _on_metronome(self, cc_num: int, cc_val: int) -> None:
+        transport.globalTransport(midi.FPT_Metronome, 1)
+
+    def _on_follow(self, cc_num: int, cc_val: int) -> None:
+        ui.snapOnOff()
+
+    def _on_play(self, cc_num: int, cc_val: int) -> None:
+        transport.start()
+
+    def _on_stop(self, cc_num: int, cc_val: int) -> None:
+        transport.stop()
+
+    def _on_panic(self, cc_num: int, cc_val: int) -> None:
+        transport.stop()
+        self._release_all_voices()
+
+    def _on_rec(self, cc_num: int, cc_val: int) -> None:
+        transport.record()
+
+    def _on_count_in(self, cc_num: int, cc_val: int) -> None:
+        transport.globalTransport(midi.FPT_CountDown, 1)
+
+    # -------- PAD SECTION -------- #
+    def _on_fixed_vel(self, cc_num: int, cc_val: int) -> None:
+        self._is_fixed_velocity = bool(cc_val)
+
+    def _on_pad_mode(self, cc_num: int, cc_val: int) -> None:
+        for cc in (CC.PAD_MODE, CC.KEYBOARD_MODE, CC.CHORDS_MODE, CC.STEP_MODE):
+            _midi_out_msg_control_change(cc, 127 if cc == cc_num else 0)
+
+        active_group = PadGroup.A
+        match cc_num:
+            case CC.PAD_MODE:
+                self._pad_mode = PadMode.OMNI
+                self._pad_mode_color = PadModeColor.OMNI
+                active_group += self._channel_page
+
+            case CC.KEYBOARD_MODE:
+                self._pad_mode = PadMode.KEYBOARD
+                self._pad_mode_color = PadModeColor.KEYBOARD
+                active_group += self._scale_index
+
+            case CC.CHORDS_MODE:
+                self._pad_mode = PadMode.CHORDS
+                self._pad_mode_color = PadModeColor.CHORDS
+                active_group += self._chordset_index
+
+            case CC.STEP_MODE:
+                self._pad_mode = PadMode.STEP
+                self._pad_mode_color = PadModeColor.STEP
+                active_group += self._step_page
+
+            case _:
+                pass
+
+        self._active_group = PadGroup(active_group)
+        self._sync_groups()
+
+        self._sync_channel_pads()
+
+    def _on_pattern(self, cc_num: int, cc_val: int) -> None:
+        self._is_selecting_pattern = bool(cc_val)
+        self._sync_channel_pads()
+
+    def _on_select(self, cc_num: int, cc_val: int) -> None:
+        self._is_selecting_channel = bool(cc_val)
+        self._sync_channel_pads()
+
+    def _on_solo(self, cc_num: int, cc_val: int) -> None:
+        if ui.getFocused(midi.widChannelRack):
+            channels.soloChannel(self._selected_channel)
+        elif ui.getFocused(midi.widMixer):
+            if self._shifting:
+                mixer.soloTrack(
+                    mixer.trackNumber(), -1, midi.fxSoloModeWithSourceTracks
+                )
+            else:
+                mixer.soloTrack(mixer.trackNumber(), -1, midi.fxSoloModeWithDestTracks)
+
+    def _on_mute(self, cc_num: int, cc_val: int) -> None:
+        if ui.getFocused(midi.widChannelRack):
+            channels.muteChannel(self._selected_channel)
+        elif ui.getFocused(midi.widMixer):
+            mixer.muteTrack(mixer.trackNumber())
+
+    # ---- KNOB PAGE SECTION ---- #
+    # BUTTONS
+    def _on_preset(self, cc_num: int, cc_val: int) -> bool | None:
+        # TODO: add mixer logic
+        if not cc_val or not plugins.isValid(self._selected_channel):
+            return False
+
+        if cc_num == CC.PRESET_NEXT:
+            plugins.nextPreset(self._selected_channel)
+        else:
+            plugins.prevPreset(self._selected_channel)
+
+    # KNOBS
+    def _on_mix_track(self, cc_num: int, cc_val: int) -> None:
+        mixer.setTrackNumber(cc_val)
+
+    def _on_mix_knob(self, cc_num: int, cc_val: int) -> None:
+        led_buffer.touch_cc(cc_num, cc_val)
+        self._knobs.push(cc_num, mixer.trackNumber(), cc_val)
+
+    def _set_mix_vol(self, track: int, cc_val: int) -> None:
+        mixer.setTrackVolume(track, cc_val / 125)
+
+    def _set_mix_pan(self, track: int, cc_val: int) -> None:
+        mixer.setTrackPan(track, _percent_to_bipolar(cc_val))
+
+    def _set_mix_ss(self, track: int, cc_val: int) -> None:
+        mixer.setTrackStereoSep(track, _percent_to_bipolar(cc_val))
+
+    def _on_chan_sel(self, cc_num: int, cc_val: int) -> None:
+        if cc_val < channels.channelCount():
+            channels.selectOneChannel(cc_val)
+        else:
+            _midi_out_msg_control_change(CC.CHAN_SEL, self._selected_channel)
+
+    def _on_chan_knob(self, cc_num: int, cc_val: int) -> None:
+        led_buffer.touch_cc(cc_num, cc_val)
+        self._knobs.push(cc_num, self._selected_channel, cc_val)
+
+    def _set_chan_vol(self, channel: int, cc_val: int) -> None:
+        channels.setChannelVolume(channel, cc_val / 100)
+
+    def _set_chan_pan(self, channel: int, cc_val: int) -> None:
+        channels.setChannelPan(channel, _percent_to_bipolar(cc_val))
+
+    def _on_fix_vel(self, cc_num: int, cc_val: int) -> None:
+        self._fixed_velocity = cc_val
+
+    # -------- SHIFT -------- #
+    def _on_shift(self, cc_num: int, cc_val: int) -> None:
+        self._shifting = bool(cc_val)
+        self._sync_channel_pads()
 
     def on_note_on(self, msg: FlMidiMsg) -> None:
         note_num, note_vel = msg.note, msg.velocity
         # velocity == 0 means note off
 
+        # the device may have changed the LED of this pad by itself
+        led_buffer.forget_note(note_num, msg.midiChan)
+
+        # release exactly what the pad started, whatever changed while it was held
+        if not note_vel:
+            self._release_voices(note_num)
+
         if self._shifting:
             self._handle_shift_note_on(note_num, note_vel)
 
         if self._is_selecting_pattern and note_vel:
             patterns.jumpToPattern(note_num + 1)
+            self._grid_pages = 0
             self._sync_channel_pads()
 
         if self._is_selecting_channel and note_vel:
@@ -506,6 +732,7 @@ class Controller:
 
         if not note_vel:  # handle action on note off
             _midi_out_msg_note_on(note_num, ControllerColor.WHITE_0)
+            profiler.on_shift_pad(note_num)
             match note_num:
                 case Pad.UNDO:
                     general.undoUp()
@@ -529,70 +756,85 @@ class Controller:
             _midi_out_msg_note_on(note_num, ControllerColor.WHITE_2)
 
     def _handle_note_on(self, note_num: int, note_vel: int) -> None:
+        velocity = self._fixed_velocity if self._is_fixed_velocity else note_vel
+
         match self._pad_mode:
             case PadMode.OMNI:
-                real_note = ROOT_NOTE + self._get_semi_offset()
                 chan_idx = note_num + self._channel_page * NOTES_COUNT
                 if chan_idx >= channels.channelCount():
                     return
                 if note_vel:
-                    channels.midiNoteOn(
-                        chan_idx,
-                        real_note,
-                        self._fixed_velocity if self._is_fixed_velocity else note_vel,
-                    )
-                else:
-                    channels.midiNoteOn(chan_idx, real_note, 0)
+                    real_note = _clamp_note(ROOT_NOTE + self._get_semi_offset())
+                    self._start_voices(note_num, chan_idx, (real_note,), velocity)
                 _midi_out_msg_note_on(
                     note_num, _get_channel_color(chan_idx, bool(note_vel))
                 )
 
             case PadMode.KEYBOARD:
-                real_note = (
-                    SCALES[self._scale_index][note_num] + self._get_semi_offset()
-                )
                 if note_vel:
-                    channels.midiNoteOn(
+                    self._start_voices(
+                        note_num,
                         self._selected_channel,
-                        real_note,
-                        self._fixed_velocity if self._is_fixed_velocity else note_vel,
+                        self._get_keyboard_notes()[note_num],
+                        velocity,
                     )
                     _midi_out_msg_note_on(note_num, PadModeColor.KEYBOARD)
                 else:
-                    channels.midiNoteOn(self._selected_channel, real_note, 0)
                     _midi_out_msg_note_on(note_num, ControllerColor.BLACK_0)
 
             case PadMode.CHORDS:
-                chord_notes = CHORD_SETS[self._chordset_index][note_num]
-                for note in chord_notes:
-                    real_note = note + self._get_semi_offset()
-                    if note_vel:
-                        channels.midiNoteOn(
-                            self._selected_channel,
-                            real_note,
-                            (
-                                self._fixed_velocity
-                                if self._is_fixed_velocity
-                                else note_vel
-                            ),
-                        )
-                        _midi_out_msg_note_on(note_num, PadModeColor.CHORDS)
-                    else:
-                        channels.midiNoteOn(self._selected_channel, real_note, 0)
-                        _midi_out_msg_note_on(note_num, ControllerColor.BLACK_0)
+                if note_vel:
+                    self._start_voices(
+                        note_num,
+                        self._selected_channel,
+                        self._get_chord_notes()[note_num],
+                        velocity,
+                    )
+                    _midi_out_msg_note_on(note_num, PadModeColor.CHORDS)
+                else:
+                    _midi_out_msg_note_on(note_num, ControllerColor.BLACK_0)
 
             case PadMode.STEP if note_vel:
-                chan_idx = note_num + self._step_page * NOTES_COUNT
-                selected_channel = self._selected_channel
-                channels.setGridBit(
-                    selected_channel,
-                    chan_idx,
-                    not channels.getGridBit(selected_channel, chan_idx),
-                )
+                is_set = (self._get_grid_page(self._step_page) >> note_num) & 1
+                step = note_num + self._step_page * NOTES_COUNT
+                channels.setGridBit(self._selected_channel, step, not is_set)
+                self._grid_bits ^= 1 << step
 
             case _:
                 pass
 
+    def _start_voices(
+        self, pad: int, channel: int, notes: tuple[int, ...], velocity: int
+    ) -> None:
+        """Plays the given notes and records them as held by the pad"""
+
+        # a pad can only hold one set of notes
+        self._release_voices(pad)
+
+        for note in notes:
+            channels.midiNoteOn(channel, note, velocity)
+
+        self._voice_channels[pad] = channel
+        self._voice_notes[pad] = notes
+
+    def _release_voices(self, pad: int) -> None:
+        """Releases the notes held by the pad"""
+
+        channel = self._voice_channels[pad]
+        if channel < 0:
+            return
+
+        for note in self._voice_notes[pad]:
+            channels.midiNoteOn(channel, note, 0)
+
+        self._voice_channels[pad] = -1
+
+    def _release_all_voices(self) -> None:
+        """Releases the notes held by all pads (panic)"""
+
+        for pad in range(NOTES_COUNT):
+            self._release_voices(pad)
+
     def _init_led_states(self) -> None:
         self._deinit_led_states()
 
@@ -612,6 +854,7 @@ class Controller:
         for note in range(NOTES_COUNT):
             _midi_out_msg_note_on(note, ControllerColor.BLACK_0)
 
+    @profiled
     def _sync_cc_led_states(self) -> None:
         """Syncs the CC LED states with the current FL Studio state"""
 
@@ -628,10 +871,20 @@ class Controller:
         _midi_out_msg_control_change(CC.STOP,     _on_off(not transport.isPlaying()))
         # fmt: on
 
+    @profiled
+    def _sync_rec_led(self) -> None:
+        """Syncs the REC button LED with the FL Studio recording state"""
+
+        _midi_out_msg_control_change(CC.REC, _on_off(transport.isRecording()))
+
+    @profiled
     def _sync_selected_channel(self) -> None:
         """Syncs the selected channel index with the current FL Studio selected channel"""
 
-        self._selected_channel = channels.selectedChannel()
+        selected_channel = channels.selectedChannel()
+        if selected_channel != self._selected_channel:
+            self._grid_pages = 0
+        self._selected_channel = selected_channel
 
     def _toggle_selected_channel_highlight(self) -> None:
         """Highlights the selected channel pad on the Maschine MK3 device"""
@@ -641,6 +894,7 @@ class Controller:
             _get_channel_color(self._selected_channel, self._is_selecting_channel),
         )
 
+    @profiled
     def _sync_channel_pads(self) -> None:
         """Syncs the channel rack state with the pad LEDs on the Maschine MK3 device"""
 
@@ -675,16 +929,18 @@ class Controller:
             self._toggle_selected_channel_highlight()
         elif self._pad_mode == PadMode.STEP:
             # turn on pads for step sequencer grid bits
-            for idx, gb in enumerate(_get_grid(self._step_page)):
+            page = self._get_grid_page(self._step_page)
+            for note in range(NOTES_COUNT):
                 _midi_out_msg_note_on(
-                    idx,
+                    note,
                     (
                         PadModeColor.STEP
-                        if channels.getGridBit(self._selected_channel, gb)
+                        if (page >> note) & 1
                         else ControllerColor.BLACK_0
                     ),
                 )
 
+    @profiled
     def _sync_channel_controls(self) -> None:
         """Syncs the channel rack controls on the Maschine MK3 device with the current FL Studio channel rack state"""
 
@@ -697,6 +953,7 @@ class Controller:
         # fmt: on
 
     @staticmethod
+    @profiled
     def _sync_mixer_controls() -> None:
         """Syncs the mixer (encoders) values on the Maschine MK3 device with the current FL Studio mixer state"""
 
@@ -711,6 +968,20 @@ class Controller:
         _midi_out_msg_control_change(CC.MUTE, _on_off(mixer.isTrackMuted(track_number)))
         # fmt: on
 
+    @staticmethod
+    def _get_window_id(cc: int) -> int:
+        """Returns the FL Studio window controlled by the given control change number"""
+
+        match cc:
+            case CC.CHANNEL:
+                return midi.widChannelRack
+            case CC.ARRANGER:
+                return midi.widPlaylist
+            case CC.MIXER:
+                return midi.widMixer
+            case _:
+                return midi.widBrowser
+
     def _toggle_encoder_mode(self, cc: int) -> None:
         """Toggles the 4D encoder mode based on the given control change number"""
 
@@ -764,6 +1035,7 @@ class Controller:
 
         self._touch_strip_mode = mode
 
+    @profiled
     def _sync_touch_strip_value(self, mode: TouchStripMode) -> None:
         """Syncs the touch strip value on the Maschine MK3 device with the current FL Studio state based on the given mode"""
 
@@ -778,17 +1050,29 @@ class Controller:
                     ),
                 )
             case TouchStripMode.MOD:
-                pass  # TODO
+                channel = self._selected_channel
+                if _has_mod_param(channel):
+                    value = round(plugins.getParamValue(MOD_PARAM, channel) * 100)
+                    self._mod.sync(channel, value)
+                    _midi_out_msg_control_change(CC.TOUCH_STRIP, value)
             case TouchStripMode.PERFORM:
                 pass  # TODO
             case TouchStripMode.NOTES:
                 pass  # TODO
 
+    @profiled
+    def _sync_touch_strip(self) -> None:
+        """Syncs the touch strip value for the current touch strip mode"""
+
+        self._sync_touch_strip_value(self._touch_strip_mode)
+
+    @profiled
     def _sync_song_position(self) -> None:
         """Syncs the touch strip song position value on the Maschine MK3 device"""
 
         _midi_out_msg_control_change(CC.TOUCH_STRIP, int(transport.getSongPos() * 100))
 
+    @profiled
     def _sync_groups(self) -> None:
         """Updates the group button colors based on the current pad mode"""
 
@@ -800,19 +1084,61 @@ class Controller:
                 and channels.channelCount() > idx * NOTES_COUNT
             ):
                 color = PadModeColor.OMNI - 2
-            elif self._pad_mode == PadMode.STEP and any(
-                channels.getGridBit(self._selected_channel, gb) for gb in _get_grid(idx)
-            ):
+            elif self._pad_mode == PadMode.STEP and self._get_grid_page(idx):
                 color = PadModeColor.STEP - 2
-            elif self._pad_mode == PadMode.KEYBOARD and SCALES[idx]:
+            elif self._pad_mode == PadMode.KEYBOARD:
                 color = PadModeColor.KEYBOARD - 2
-            elif self._pad_mode == PadMode.CHORDS and CHORD_SETS[idx]:
+            elif self._pad_mode == PadMode.CHORDS:
                 color = PadModeColor.CHORDS - 2
             else:
                 color = ControllerColor.BLACK_0
 
             _midi_out_msg_control_change(cc, color)
 
+    def _get_grid_page(self, page: int) -> int:
+        """Returns the step grid bits of the given page (bit N is pad N), reading them from FL Studio if needed"""
+
+        lower_step = page * NOTES_COUNT
+
+        if not (self._grid_pages >> page) & 1:
+            bits = 0
+            for note in range(NOTES_COUNT):
+                if channels.getGridBit(self._selected_channel, lower_step + note):
+                    bits |= 1 << note
+
+            self._grid_bits &= ~(GRID_PAGE_MASK << lower_step)
+            self._grid_bits |= bits << lower_step
+            self._grid_pages |= 1 << page
+
+        return (self._grid_bits >> lower_step) & GRID_PAGE_MASK
+
+    def _get_keyboard_notes(self) -> tuple[tuple[int], ...]:
+        """Returns the keyboard mode note table, recompiling it only when the scale or offset changed"""
+
+        scale_index, semi_offset = self._keyboard_notes_key
+        if scale_index != self._scale_index or semi_offset != self._semi_offset:
+            start = self._scale_index * NOTES_COUNT
+            self._keyboard_notes = _compile_scale(
+                SCALE_TABLE[start : start + NOTES_COUNT], self._get_semi_offset()
+            )
+            self._keyboard_notes_key = (self._scale_index, self._semi_offset)
+
+        return self._keyboard_notes
+
+    def _get_chord_notes(self) -> tuple[tuple[int, ...], ...]:
+        """Returns the chords mode note table, recompiling it only when the chord set or offset changed"""
+
+        chordset_index, semi_offset = self._chord_notes_key
+        if chordset_index != self._chordset_index or semi_offset != self._semi_offset:
+            start = CHORD_OFFSETS[self._chordset_index]
+            end = CHORD_OFFSETS[self._chordset_index + 1]
+            self._chord_notes = _compile_chord_set(
+                CHORD_TABLE[start:end], self._get_semi_offset()
+            )
+            self._chord_notes_key = (self._chordset_index, self._semi_offset)
+
+        return self._chord_notes
+
     def _get_semi_offset(self) -> int:
         """Returns the current semitone offset"""
         return self._semi_offset + SEMITONES_IN_OCTAVE
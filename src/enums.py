@@ -9,6 +9,7 @@ __all__ = [
     "FourDEncoderMode",
     "TouchStripMode",
     "PadGroup",
+    "Sync",
 ]
 
 
@@ -155,3 +156,16 @@ class PadGroup(IntEnum):
     F = 105
     G = 106
     H = 107
+
+
+class Sync(IntEnum):
+    """Sync routines that can be scheduled by `OnRefresh` (bit flags, in the order they run)"""
+
+    SELECTED_CHANNEL = 1 << 0
+    CHANNEL_CONTROLS = 1 << 1
+    CHANNEL_PADS = 1 << 2
+    GROUPS = 1 << 3
+    MIXER_CONTROLS = 1 << 4
+    CC_LEDS = 1 << 5
+    REC_LED = 1 << 6
+    TOUCH_STRIP = 1 << 7
@@ -0,0 +1,212 @@
+import time
+
+import midi
+import device
+
+from consts import (
+    CC_COUNT,
+    NOTES_COUNT,
+    MIDI_CHANNELS_COUNT,
+    LED_SLOTS_PER_CHANNEL,
+    LED_UNKNOWN,
+    LED_SYSEX_FRAMES,
+    LED_SYSEX_HEADER,
+    LED_SYSEX_FRAME_SIZE,
+    FEEDBACK_HOLD_OFF_NS,
+)
+
+__all__ = ["LedBuffer", "led_buffer"]
+
+
+class LedBuffer:
+    """
+    Shadow copy of the LED state on the Maschine MK3 device.
+
+    LED writes are staged during a callback and sent on `flush()`. Only the
+    final value of each slot is sent, and only when it differs from the value
+    the device already shows.
+
+    By default every changed LED is sent as its own 3-byte message. With
+    `sysex_frames` enabled, all changes of a flush are packed into a single
+    SysEx frame instead (see `LED_SYSEX_HEADER` for the layout).
+
+    A control the user is turning is owned by the device: the values FL Studio
+    reports for it are held back until `FEEDBACK_HOLD_OFF_NS` after it was last
+    touched, so they don't fight the hand. The last held value is then sent if
+    it differs from the value the device shows.
+    """
+
+    sysex_frames: bool
+    """Indicates whether changes are sent as one SysEx frame per flush"""
+
+    _shadow: bytearray
+    """Last value sent for every CC and pad note slot on every MIDI channel"""
+
+    _pending: bytearray
+    """Value staged for every slot during the current callback"""
+
+    _dirty: list[int]
+    """Slots staged during the current callback, in order of their first write"""
+
+    _frame: bytearray
+    """SysEx frame large enough to hold a change for every slot, allocated on the first flush of the SysEx path"""
+
+    _owned: dict[int, int]
+    """Time every slot touched on the device is owned until (in nanoseconds)"""
+
+    _held: dict[int, int]
+    """Last value staged for every owned slot, sent once it's released"""
+
+    sent: int
+    """Number of messages sent to the device"""
+
+    suppressed: int
+    """Number of staged writes that were overwritten or matched the device state"""
+
+    echoes: int
+    """Number of values held back while their control was touched on the device"""
+
+    def __init__(self, sysex_frames: bool = LED_SYSEX_FRAMES):
+        slots = LED_SLOTS_PER_CHANNEL * MIDI_CHANNELS_COUNT
+        self.sysex_frames = sysex_frames
+        self._shadow = bytearray([LED_UNKNOWN]) * slots
+        self._pending = bytearray([LED_UNKNOWN]) * slots
+        self._dirty = []
+        self._frame = bytearray()
+        self._owned = {}
+        self._held = {}
+        self.sent = 0
+        self.suppressed = 0
+        self.echoes = 0
+
+    def set_cc(self, control: int, value: int, channel: int = 0) -> None:
+        """Stage a CONTROL CHANGE LED value"""
+
+        if 0 <= value <= 127:
+            self._stage(channel * LED_SLOTS_PER_CHANNEL + control, value)
+        else:
+            self._send(midi.MIDI_CONTROLCHANGE, channel, control, value)
+
+    def set_note(self, note: int, velocity: int, channel: int = 0) -> None:
+        """Stage a NOTE ON LED value. Notes outside the pad range are sent immediately"""
+
+        if 0 <= note < NOTES_COUNT and 0 <= velocity <= 127:
+            self._stage(channel * LED_SLOTS_PER_CHANNEL + CC_COUNT + note, velocity)
+        else:
+            self._send(midi.MIDI_NOTEON, channel, note, velocity)
+
+    def forget_cc(self, control: int, channel: int = 0) -> None:
+        """Mark a CC LED as unknown, e.g. after the device changed it locally"""
+
+        self._shadow[channel * LED_SLOTS_PER_CHANNEL + control] = LED_UNKNOWN
+
+    def touch_cc(self, control: int, value: int, channel: int = 0) -> None:
+        """Own a CC LED the user set to `value` on the device, e.g. a knob ring"""
+
+        slot = channel * LED_SLOTS_PER_CHANNEL + control
+        self._shadow[slot] = value
+        self._owned[slot] = time.perf_counter_ns() + FEEDBACK_HOLD_OFF_NS
+
+    def forget_note(self, note: int, channel: int = 0) -> None:
+        """Mark a pad LED as unknown, e.g. after the device changed it locally"""
+
+        if 0 <= note < NOTES_COUNT:
+            slot = channel * LED_SLOTS_PER_CHANNEL + CC_COUNT + note
+            self._shadow[slot] = LED_UNKNOWN
+
+    def invalidate(self) -> None:
+        """Mark every LED as unknown so the next write to each slot is always sent"""
+
+        shadow = self._shadow
+        shadow[:] = bytes([LED_UNKNOWN]) * len(shadow)
+        self._owned.clear()
+        self._held.clear()
+
+    def flush(self) -> None:
+        """Send the final staged value of every slot that differs from the device state"""
+
+        owned = self._owned
+        if owned:
+            self._release(owned)
+
+        shadow, pending = self._shadow, self._pending
+        frame, size = self._frame, len(LED_SYSEX_HEADER)
+        if self.sysex_frames and not frame:
+            frame = self._frame = bytearray(LED_SYSEX_FRAME_SIZE)
+            frame[:size] = bytes(LED_SYSEX_HEADER)
+
+        for slot in self._dirty:
+            value = pending[slot]
+            pending[slot] = LED_UNKNOWN
+
+            if slot in owned:
+                self._held[slot] = value
+                self.echoes += 1
+                continue
+
+            if shadow[slot] == value:
+                self.suppressed += 1
+                continue
+            shadow[slot] = value
+
+            channel, index = divmod(slot, LED_SLOTS_PER_CHANNEL)
+            if self.sysex_frames:
+                if index < CC_COUNT:
+                    frame[size] = channel
+                else:
+                    frame[size] = 0x10 | channel
+                    index -= CC_COUNT
+                frame[size + 1] = index
+                frame[size + 2] = value
+                size += 3
+            elif index < CC_COUNT:
+                self._send(midi.MIDI_CONTROLCHANGE, channel, index, value)
+            else:
+                self._send(midi.MIDI_NOTEON, channel, index - CC_COUNT, value)
+
+        self._dirty.clear()
+
+        if size > len(LED_SYSEX_HEADER):
+            self._send_frame(size)
+
+    def _release(self, owned: dict[int, int]) -> None:
+        """Release the slots not touched for `FEEDBACK_HOLD_OFF_NS`, staging their held values"""
+
+        now = time.perf_counter_ns()
+        for slot, until in list(owned.items()):
+            if now < until:
+                continue
+            del owned[slot]
+            value = self._held.pop(slot, LED_UNKNOWN)
+            # a value staged during this callback is newer
+            if value != LED_UNKNOWN and self._pending[slot] == LED_UNKNOWN:
+                self._stage(slot, value)
+
+    def _stage(self, slot: int, value: int) -> None:
+        pending = self._pending
+        if pending[slot] == LED_UNKNOWN:
+            self._dirty.append(slot)
+        else:
+            self.suppressed += 1
+        pending[slot] = value
+
+    def _send(self, status: int, channel: int, data1: int, data2: int) -> None:
+        device.midiOutMsg(status, channel, data1, data2)
+        self.sent += 1
+
+    def _send_frame(self, size: int) -> None:
+        frame = self._frame
+
+        # a single change is cheaper as a plain 3-byte message
+        if size == len(LED_SYSEX_HEADER) + 3:
+            kind, index, value = frame[size - 3 : size]
+            status = midi.MIDI_NOTEON if kind & 0x10 else midi.MIDI_CONTROLCHANGE
+            self._send(status, kind & 0x0F, index, value)
+            return
+
+        frame[size] = 0xF7
+        device.midiOutSysex(bytes(frame[: size + 1]))
+        self.sent += 1
+
+
+led_buffer = LedBuffer()
@@ -1,11 +1,14 @@
 from fl_classes import FlMidiMsg
 
+from leds import led_buffer
+from profiler import *
 from controller import Controller
 
 
 controller = Controller()
 
 
+@profiled
 def OnInit() -> None:
     """
     Called when FL Studio initializes the script.
@@ -14,6 +17,7 @@ def OnInit() -> None:
     so this function may be called more than once during the lifetime of this Python script.
     """
     controller.on_init()
+    led_buffer.flush()
 
 
 def OnDeInit() -> None:
@@ -23,8 +27,11 @@ def OnDeInit() -> None:
     This function should be used to shut down the attached device
     """
     controller.on_de_init()
+    led_buffer.flush()
+    profiler.report()
 
 
+@profiled
 def OnRefresh(flags: int) -> None:
     """
     Called when certain events occur within FL Studio.
@@ -36,8 +43,21 @@ def OnRefresh(flags: int) -> None:
         flags (int): flags to represent the changes in FL Studio's state.
     """
     controller.on_refresh(flags)
+    led_buffer.flush()
 
 
+@profiled
+def OnIdle() -> None:
+    """
+    Called frequently (roughly every 20 ms) while FL Studio is idle.
+
+    Runs the syncs deferred by `OnRefresh()`.
+    """
+    controller.on_idle()
+    led_buffer.flush()
+
+
+@profiled_cc
 def OnControlChange(msg: FlMidiMsg) -> None:
     """
     Called after `OnMidiMsg()` for control change (CC) MIDI events.
@@ -46,8 +66,10 @@ def OnControlChange(msg: FlMidiMsg) -> None:
         msg (fl_classes.FlMidiMsg): incoming control change MIDI message.
     """
     controller.on_control_change(msg)
+    led_buffer.flush()
 
 
+@profiled
 def OnNoteOn(msg: FlMidiMsg) -> None:
     """
     Called after `OnMidiMsg()` for note on MIDI events.
@@ -56,3 +78,4 @@ def OnNoteOn(msg: FlMidiMsg) -> None:
         msg (fl_classes.FlMidiMsg): incoming note on MIDI message.
     """
     controller.on_note_on(msg)
+    led_buffer.flush()
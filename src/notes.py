@@ -1,7 +1,8 @@
 __all__ = [
     "ROOT_NOTE",
-    "CHORD_SETS",
-    "SCALES",
+    "SCALE_TABLE",
+    "CHORD_TABLE",
+    "CHORD_OFFSETS",
 ]
 
 # --------------------------------------------------------------------------------
@@ -299,7 +300,7 @@ MAJ_4 = [
     [C4, C5, E5, G5],
 ]
 
-# THERE MUST BE EXACTLY 8 CHORD SETS!
+# THERE MUST BE EXACTLY 8 CHORD SETS! THE BUILD FAILS OTHERWISE.
 CHORD_SETS = [MIN_1, MIN_2, MIN_3, MIN_4, MAJ_1, MAJ_2, MAJ_3, MAJ_4]
 
 # --------------------------------------------------------------------------------
@@ -319,5 +320,28 @@ SCALE_7 = [C5, CS5, D5, DS5, E5, F5, FS5, G5, GS5, A5, AS5, B5, C6, CS6, D6, DS6
 SCALE_8 = [C5, CS5, D5, DS5, E5, F5, FS5, G5, GS5, A5, AS5, B5, C6, CS6, D6, DS6] # CUSTOM
 # fmt: on
 
-# THERE MUST BE EXACTLY 8 SCALES!
+# THERE MUST BE EXACTLY 8 SCALES! THE BUILD FAILS OTHERWISE.
 SCALES = [SCALE_1, SCALE_2, SCALE_3, SCALE_4, SCALE_5, SCALE_6, SCALE_7, SCALE_8]
+
+# --------------------------------------------------------------------------------
+# NOTE TABLES
+# --------------------------------------------------------------------------------
+# The scales and chord sets above, packed into bytes indexed by the pads.
+# The build checks them and replaces these expressions with bytes literals.
+
+# 16 notes per scale
+SCALE_TABLE = bytes(note for scale in SCALES for note in scale)
+
+# every chord as its number of notes followed by its notes
+CHORD_TABLE = bytes(
+    byte
+    for chord_set in CHORD_SETS
+    for chord in chord_set
+    for byte in (len(chord), *chord)
+)
+
+# start of every chord set in CHORD_TABLE, followed by the end of the table
+CHORD_OFFSETS = tuple(
+    sum(len(chord) + 1 for chord_set in CHORD_SETS[:index] for chord in chord_set)
+    for index in range(len(CHORD_SETS) + 1)
+)
@@ -0,0 +1,155 @@
+import time
+from typing import Callable
+
+from consts import PROFILER, PROFILER_BUCKETS, PROFILER_REPORT_PAD, CC_COUNT
+from controls import CC
+from utilities import _is_enum_value
+
+__all__ = ["Histogram", "Profiler", "profiler", "profiled", "profiled_cc"]
+
+
+class Histogram:
+    """
+    Fixed-size histogram of durations (in nanoseconds) with power of two buckets.
+
+    Bucket `i` counts the durations of `i` bits, i.e. from `2 ** (i - 1)` to
+    `2 ** i - 1` nanoseconds. Percentiles are reported as the upper bound of
+    their bucket, so they are at most 2x off.
+    """
+
+    counts: list[int]
+    """Number of samples in every bucket"""
+
+    count: int
+    """Number of samples"""
+
+    max: int
+    """Longest sample (in nanoseconds)"""
+
+    def __init__(self):
+        self.counts = [0] * PROFILER_BUCKETS
+        self.count = 0
+        self.max = 0
+
+    def add(self, duration: int) -> None:
+        """Record a sample"""
+
+        self.counts[min(duration.bit_length(), PROFILER_BUCKETS - 1)] += 1
+        self.count += 1
+        if duration > self.max:
+            self.max = duration
+
+    def percentile(self, fraction: float) -> int:
+        """Returns the upper bound of the bucket holding the given fraction of samples"""
+
+        rank = fraction * self.count
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min((1 << bucket) - 1, self.max)
+        return self.max
+
+
+class Profiler:
+    """Histograms of the time spent in the script, per handler and per CC number"""
+
+    _handlers: dict[str, Histogram]
+    """Histogram of every profiled function, by name"""
+
+    _ccs: list[Histogram | None]
+    """Histogram of `OnControlChange` by CC number, created on the first sample"""
+
+    def __init__(self):
+        self._handlers = {}
+        self._ccs = [None] * CC_COUNT
+
+    def histogram(self, name: str) -> Histogram:
+        """Returns the histogram of a handler, creating it if needed"""
+
+        histogram = self._handlers.get(name)
+        if histogram is None:
+            histogram = self._handlers[name] = Histogram()
+        return histogram
+
+    def add_cc(self, cc_num: int, duration: int) -> None:
+        """Record a sample for a CC number"""
+
+        histogram = self._ccs[cc_num]
+        if histogram is None:
+            histogram = self._ccs[cc_num] = Histogram()
+        histogram.add(duration)
+
+    def on_shift_pad(self, note_num: int) -> None:
+        """Prints the report when the report pad is released while shifting"""
+
+        if note_num == PROFILER_REPORT_PAD:
+            self.report()
+
+    def report(self) -> None:
+        """Prints p50/p95/max of every handler and CC number to the script output"""
+
+        if not PROFILER:
+            return
+
+        rows = [(name, h) for name, h in self._handlers.items() if h.count]
+        for cc_num, histogram in enumerate(self._ccs):
+            if histogram is not None and histogram.count:
+                name = CC(cc_num).name if _is_enum_value(CC, cc_num) else ""
+                rows.append((f"CC {cc_num} {name}", histogram))
+        if not rows:
+            return
+
+        print(f"{'handler':<40}{'count':>8}{'p50 µs':>10}{'p95 µs':>10}{'max µs':>10}")
+        for name, histogram in rows:
+            self._print_row(name, histogram)
+
+    @staticmethod
+    def _print_row(name: str, histogram: Histogram) -> None:
+        print(
+            f"{name:<40}{histogram.count:>8}"
+            f"{histogram.percentile(0.5) / 1000:>10.1f}"
+            f"{histogram.percentile(0.95) / 1000:>10.1f}"
+            f"{histogram.max / 1000:>10.1f}"
+        )
+
+
+profiler = Profiler()
+
+
+def profiled(fn: Callable) -> Callable:
+    """Decorator recording the duration of every call of `fn` when `PROFILER` is on"""
+
+    if not PROFILER:
+        return fn
+
+    histogram = profiler.histogram(fn.__qualname__)
+    perf_counter_ns = time.perf_counter_ns
+
+    def wrapper(*args):
+        start = perf_counter_ns()
+        result = fn(*args)
+        histogram.add(perf_counter_ns() - start)
+        return result
+
+    return wrapper
+
+
+def profiled_cc(fn: Callable) -> Callable:
+    """Like `profiled`, also recording the duration per CC number of the message argument"""
+
+    if not PROFILER:
+        return fn
+
+    histogram = profiler.histogram(fn.__qualname__)
+    perf_counter_ns = time.perf_counter_ns
+
+    def wrapper(msg):
+        start = perf_counter_ns()
+        result = fn(msg)
+        duration = perf_counter_ns() - start
+        histogram.add(duration)
+        profiler.add_cc(msg.controlNum, duration)
+        return result
+
+    return wrapper
@@ -0,0 +1,63 @@
+import time
+from typing import Callable
+
+from consts import REFRESH_BUDGET_NS
+
+__all__ = ["RefreshScheduler"]
+
+
+class RefreshScheduler:
+    """
+    Coalesces `OnRefresh` bursts into at most one run of each sync routine per `OnIdle` tick.
+
+    `schedule()` only ORs the requested routines into a pending mask. `drain()`
+    runs the pending routines in order until the tick's time budget is spent,
+    leaving the rest for the next tick.
+    """
+
+    _syncs: tuple[tuple[int, Callable[[], None]], ...]
+    """Bit flag and sync routine pairs, in the order they run"""
+
+    _pending: int
+    """Mask of routines waiting to run"""
+
+    _refreshes: int
+    """Number of refreshes scheduled since the last drain"""
+
+    merged: int
+    """Number of refreshes merged into the last drained tick"""
+
+    drain_time: int
+    """Duration of the last drain (in nanoseconds)"""
+
+    def __init__(self, syncs: tuple[tuple[int, Callable[[], None]], ...]):
+        self._syncs = syncs
+        self._pending = 0
+        self._refreshes = 0
+        self.merged = 0
+        self.drain_time = 0
+
+    def schedule(self, mask: int) -> None:
+        """Request the routines in `mask` to run on the next tick"""
+
+        self._pending |= mask
+        self._refreshes += 1
+
+    def drain(self, budget: int = REFRESH_BUDGET_NS) -> None:
+        """Run pending routines until `budget` nanoseconds are spent"""
+
+        if not self._pending:
+            return
+
+        start = time.perf_counter_ns()
+
+        for flag, sync in self._syncs:
+            if not self._pending & flag:
+                continue
+            self._pending &= ~flag
+            sync()
+            if time.perf_counter_ns() - start > budget:
+                break
+
+        self.drain_time = time.perf_counter_ns() - start
+        self.merged, self._refreshes = self._refreshes, 0
@@ -1,22 +1,24 @@
 from enum import Enum
 
-import midi
-import device
 import plugins
 
-from consts import NOTES_COUNT
+from leds import led_buffer
 from enums import PluginColor, ChannelColor
+from consts import MOD_PARAM
 
 
 __all__ = [
     "_get_channel_color",
+    "_has_mod_param",
     "_midi_out_msg_note_on",
     "_midi_out_msg_control_change",
     "_on_off",
     "_percent_to_bipolar",
     "_bipolar_to_percent",
     "_is_enum_value",
-    "_get_grid",
+    "_clamp_note",
+    "_compile_scale",
+    "_compile_chord_set",
 ]
 
 
@@ -38,6 +40,11 @@ def _get_channel_color(
     return color.HIGHLIGHTED.value if highlighted else color.DEFAULT.value  # type: ignore[attr-defined]
 
 
+def _has_mod_param(channel: int) -> bool:
+    """Return whether the plugin of a channel has the parameter driven by the touch strip in MOD mode"""
+    return plugins.isValid(channel) and MOD_PARAM < plugins.getParamCount(channel)
+
+
 def _midi_out_msg_note_on(
     note: int,
     velocity: int,
@@ -46,8 +53,8 @@ def _midi_out_msg_note_on(
     """
     Send a MIDI NOTE ON (144) message to the device.
 
-    This is a thin wrapper around `device.midiOutMsg` that sends a NOTE ON
-    message on the specified MIDI channel. A velocity of 0 is treated by
+    The message is staged in `led_buffer` and sent on the next flush, only if
+    the pad does not already show this value. A velocity of 0 is treated by
     MIDI devices as NOTE OFF.
 
     Args:
@@ -58,12 +65,7 @@ def _midi_out_msg_note_on(
     Returns:
         None
     """
-    device.midiOutMsg(
-        midi.MIDI_NOTEON,
-        channel,
-        note,
-        velocity,
-    )
+    led_buffer.set_note(note, velocity, channel)
 
 
 def _midi_out_msg_control_change(
@@ -74,8 +76,8 @@ def _midi_out_msg_control_change(
     """
     Send a MIDI CONTROL CHANGE (CC) (176) message to the device.
 
-    This is a thin wrapper around `device.midiOutMsg` that sends a Control
-    Change message on the specified MIDI channel.
+    The message is staged in `led_buffer` and sent on the next flush, only if
+    the control does not already show this value.
 
     Args:
         control (int): MIDI controller number (0–127).
@@ -85,12 +87,7 @@ def _midi_out_msg_control_change(
     Returns:
         None
     """
-    device.midiOutMsg(
-        midi.MIDI_CONTROLCHANGE,
-        channel,
-        control,
-        value,
-    )
+    led_buffer.set_cc(control, value, channel)
 
 
 def _on_off(condition: bool) -> int:
@@ -122,7 +119,55 @@ def _is_enum_value(enum_cls: type[Enum], value: object) -> bool:
         return False
 
 
-def _get_grid(page: int) -> range:
-    """Get the step grid range for a given offset (page)"""
-    lower_step = page * NOTES_COUNT
-    return range(lower_step, lower_step + NOTES_COUNT)
+def _clamp_note(note: int) -> int:
+    """Clamp a note number to the MIDI note range (0-127)"""
+    return min(max(note, 0), 127)
+
+
+def _compile_scale(scale: bytes, offset: int) -> tuple[tuple[int], ...]:
+    """
+    Compile a scale into the final MIDI note of every pad.
+
+    Every note is stored as a single note chord, so pads of the keyboard and
+    chords modes are played the same way.
+
+    Args:
+        scale (bytes): Scale notes, one per pad (a slice of `SCALE_TABLE`).
+        offset (int): Semitone offset added to every note.
+
+    Returns:
+        tuple[tuple[int], ...]: MIDI note number (0–127) of every pad.
+    """
+    return tuple((_clamp_note(note + offset),) for note in scale)
+
+
+def _compile_chord_set(
+    chord_set: bytes,
+    offset: int,
+) -> tuple[tuple[int, ...], ...]:
+    """
+    Compile a chord set into the final MIDI notes of every pad.
+
+    Notes that end up equal after clamping are only played once.
+
+    Args:
+        chord_set (bytes): Chords of every pad, each one its number of notes
+            followed by its notes (a slice of `CHORD_TABLE`).
+        offset (int): Semitone offset added to every note.
+
+    Returns:
+        tuple[tuple[int, ...], ...]: Distinct MIDI note numbers (0–127) of every pad.
+    """
+    chords: list[tuple[int, ...]] = []
+    start = 0
+    while start < len(chord_set):
+        end = start + 1 + chord_set[start]
+        chords.append(
+            tuple(
+                dict.fromkeys(
+                    _clamp_note(note + offset) for note in chord_set[start + 1 : end]
+                )
+            )
+        )
+        start = end
+    return tuple(chords)